@@ -0,0 +1,75 @@
+"""Microbenchmark for kernel activity tracking.
+
+Reports the time spent tracking the activity of a kernel emitting large
+plots (display_data messages with a base64-encoded PNG), parsing only the
+header of each message compared to deserializing it entirely, as was
+previously done.
+
+Usage::
+
+    python benchmarks/bench_activity.py [--size KiB] [--number N]
+"""
+
+import argparse
+import base64
+import os
+import timeit
+
+from jupyter_client.session import Session
+
+from jupyter_server.services.kernels.hub import KernelMessage
+
+
+def legacy_record_activity(session, msg_list):
+    idents, fed_msg_list = session.feed_identities(msg_list)
+    msg = session.deserialize(fed_msg_list)
+    msg_type = msg['header']['msg_type']
+    if msg_type == 'status':
+        return msg['content']['execution_state']
+
+
+def record_activity(session, msg_list):
+    kernel_msg = KernelMessage(session, msg_list)
+    if kernel_msg.msg_type == 'status':
+        return kernel_msg.content['execution_state']
+
+
+def plot_messages(session, size):
+    """The IOPub messages of an execution displaying a plot"""
+    png = base64.b64encode(os.urandom(size)).decode('ascii')
+    msgs = [
+        session.msg('status', {'execution_state': 'busy'}),
+        session.msg('execute_input', {'code': 'plot()', 'execution_count': 1}),
+        session.msg('display_data', {
+            'data': {'image/png': png, 'text/plain': '<Figure>'},
+            'metadata': {},
+        }),
+        session.msg('status', {'execution_state': 'idle'}),
+    ]
+    return [session.serialize(msg) for msg in msgs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=512, help="size of each plot in KiB")
+    parser.add_argument('--number', type=int, default=200, help="iterations for timing")
+    args = parser.parse_args()
+
+    session = Session(key=b'benchmark')
+    msg_lists = plot_messages(session, args.size * 1024)
+
+    baseline = None
+    for func in (legacy_record_activity, record_activity):
+        # a new session for each run, since duplicate signatures are rejected
+        def track():
+            s = Session(key=b'benchmark')
+            for msg_list in msg_lists:
+                func(s, msg_list)
+        seconds = timeit.timeit(track, number=args.number) / args.number
+        baseline = baseline or seconds
+        print("{:<24} {:8.3f} ms/execution {:6.1f}x".format(
+            func.__name__, seconds * 1e3, baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Microbenchmark for directory listings of the FileContentsManager.
+
+Lists a directory of many files with ``FileContentsManager.get``,
+which builds each child model from a single ``os.scandir`` entry,
+compared to calling ``get(content=False)`` on each child, as was
+previously done, and to listings served by the metadata cache.
+
+Usage::
+
+    python benchmarks/bench_dir_listing.py [--entries N] [--dir PATH]
+"""
+
+import argparse
+import errno
+import os
+import stat
+import tempfile
+import timeit
+
+from jupyter_core.paths import is_file_hidden
+
+from jupyter_server.services.contents.filemanager import FileContentsManager
+
+
+def legacy_list_dir(cm, path):
+    os_dir = cm._get_os_path(path)
+    contents = []
+    for name in os.listdir(os_dir):
+        os_path = os.path.join(os_dir, name)
+        try:
+            st = os.lstat(os_path)
+        except OSError:
+            continue
+        if (not stat.S_ISLNK(st.st_mode)
+                and not stat.S_ISREG(st.st_mode)
+                and not stat.S_ISDIR(st.st_mode)):
+            continue
+        try:
+            if cm.should_list(name):
+                if cm.allow_hidden or not is_file_hidden(os_path, stat_res=st):
+                    contents.append(cm.get(path='%s/%s' % (path, name), content=False))
+        except OSError as e:
+            if e.errno not in [errno.ELOOP, errno.EACCES]:
+                raise
+    return contents
+
+
+def populate(root, entries):
+    os.mkdir(os.path.join(root, 'data'))
+    for i in range(entries):
+        if i % 10 == 0:
+            name = 'dir%d' % i
+            os.mkdir(os.path.join(root, 'data', name))
+        else:
+            name = 'file%d.%s' % (i, 'ipynb' if i % 10 == 1 else 'csv')
+            with open(os.path.join(root, 'data', name), 'w') as f:
+                f.write('x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=20000, help="number of directory entries")
+    parser.add_argument('--dir', help="list an existing root directory's 'data' subdirectory instead")
+    parser.add_argument('--number', type=int, default=5, help="iterations for timing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.dir
+        if root is None:
+            root = tmp
+            populate(root, args.entries)
+        cm = FileContentsManager(root_dir=root)
+        cached_cm = FileContentsManager(root_dir=root, metadata_cache_size=2 * args.entries + 10)
+
+        def sort_key(model):
+            return model['name']
+
+        assert sorted(legacy_list_dir(cm, 'data'), key=sort_key) == \
+            sorted(cm.get('data')['content'], key=sort_key) == \
+            sorted(cached_cm.get('data')['content'], key=sort_key)
+
+        legacy = timeit.timeit(lambda: legacy_list_dir(cm, 'data'), number=args.number) / args.number
+        scandir = timeit.timeit(lambda: cm.get('data'), number=args.number) / args.number
+        cached = timeit.timeit(lambda: cached_cm.get('data'), number=args.number) / args.number
+        print("{:<10} {:8.2f} ms".format('get/child', legacy * 1e3))
+        print("{:<10} {:8.2f} ms {:6.1f}x".format('scandir', scandir * 1e3, legacy / scandir))
+        print("{:<10} {:8.2f} ms {:6.1f}x".format('cached', cached * 1e3, legacy / cached))
+        cached_cm._metadata_cache.close()
+
+
+if __name__ == '__main__':
+    main()
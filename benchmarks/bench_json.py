@@ -0,0 +1,70 @@
+"""Microbenchmark for the JSON serializers used by the API handlers.
+
+Serializes a large directory listing model, as returned by
+``GET /api/contents/<dir>``, with each available serializer.
+
+Usage::
+
+    python benchmarks/bench_json.py [--entries N]
+"""
+
+import argparse
+import timeit
+
+from jupyter_server._tz import utcnow
+from jupyter_server.base.jsonserializer import JSONSerializer, OrjsonSerializer
+
+
+def directory_model(entries):
+    now = utcnow()
+    content = [{
+        'name': 'file%d.csv' % i,
+        'path': 'data/file%d.csv' % i,
+        'last_modified': now,
+        'created': now,
+        'content': None,
+        'format': None,
+        'mimetype': 'text/csv',
+        'size': 1000 + i,
+        'writable': True,
+        'type': 'file',
+    } for i in range(entries)]
+    return {
+        'name': 'data',
+        'path': 'data',
+        'last_modified': now,
+        'created': now,
+        'content': content,
+        'format': 'json',
+        'mimetype': None,
+        'size': None,
+        'writable': True,
+        'type': 'directory',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=20000, help="number of directory entries")
+    parser.add_argument('--number', type=int, default=10, help="iterations for timing")
+    args = parser.parse_args()
+
+    model = directory_model(args.entries)
+    serializers = [JSONSerializer]
+    try:
+        OrjsonSerializer()
+    except ImportError:
+        print("orjson is not installed, skipping OrjsonSerializer")
+    else:
+        serializers.append(OrjsonSerializer)
+
+    baseline = None
+    for cls in serializers:
+        serializer = cls()
+        seconds = timeit.timeit(lambda: serializer.dumps(model), number=args.number) / args.number
+        baseline = baseline or seconds
+        print("{:<18} {:8.2f} ms {:6.1f}x".format(cls.__name__, seconds * 1e3, baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Microbenchmark for repeated gets of a large notebook from the FileContentsManager.
+
+Gets a notebook with many cells and outputs with ``FileContentsManager.get``,
+which reads, validates and checks the signature of the notebook each time,
+compared to gets served by the notebook cache, which copy the cached content
+and only check its signature against the notary's store.
+
+Usage::
+
+    python benchmarks/bench_notebook_cache.py [--cells N] [--output-size BYTES]
+"""
+
+import argparse
+import base64
+import os
+import tempfile
+import timeit
+
+from nbformat import v4, write
+
+from jupyter_server.services.contents.filemanager import FileContentsManager
+
+
+def populate(root, cells, output_size):
+    nb = v4.new_notebook()
+    for i in range(cells):
+        output = v4.new_output('display_data', {
+            'text/plain': 'figure %d' % i,
+            'image/png': base64.b64encode(os.urandom(output_size)).decode('ascii'),
+        })
+        nb.cells.append(v4.new_code_cell('plot(%d)' % i, outputs=[output]))
+        nb.cells.append(v4.new_markdown_cell('Figure %d shows the data.' % i))
+    with open(os.path.join(root, 'large.ipynb'), 'w', encoding='utf-8') as f:
+        write(nb, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cells', type=int, default=500, help="number of code cells")
+    parser.add_argument('--output-size', type=int, default=30000, help="bytes of image output per code cell")
+    parser.add_argument('--number', type=int, default=5, help="iterations for timing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        populate(root, args.cells, args.output_size)
+        size = os.stat(os.path.join(root, 'large.ipynb')).st_size
+        cm = FileContentsManager(root_dir=root)
+        cached_cm = FileContentsManager(root_dir=root, notebook_cache_size=2 * size, notary=cm.notary)
+        assert cm.get('large.ipynb') == cached_cm.get('large.ipynb')
+
+        uncached = timeit.timeit(lambda: cm.get('large.ipynb'), number=args.number) / args.number
+        cached = timeit.timeit(lambda: cached_cm.get('large.ipynb'), number=args.number) / args.number
+        print("notebook: {:.1f} MB".format(size / 1e6))
+        print("{:<10} {:8.2f} ms".format('uncached', uncached * 1e3))
+        print("{:<10} {:8.2f} ms {:6.1f}x".format('cached', cached * 1e3, uncached / cached))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Microbenchmark for the binary websocket message (de)serialization.
+
+Reports the bytes allocated (i.e. copied) and the time per message for
+``serialize_binary_message`` and ``deserialize_binary_message`` compared
+to the previous implementation, for messages with large buffers.
+
+Usage::
+
+    python benchmarks/bench_serialize.py [--size MiB] [--nbufs N]
+"""
+
+import argparse
+import json
+import os
+import struct
+import timeit
+import tracemalloc
+from array import array
+
+from jupyter_client.jsonutil import date_default, extract_dates
+from jupyter_client.session import Session
+
+from jupyter_server.base.zmqhandlers import (
+    serialize_binary_message,
+    deserialize_binary_message,
+)
+
+
+def legacy_serialize_binary_message(msg):
+    msg = msg.copy()
+    buffers = list(msg.pop('buffers'))
+    bmsg = json.dumps(msg, default=date_default).encode('utf8')
+    buffers.insert(0, bmsg)
+    nbufs = len(buffers)
+    offsets = [4 * (nbufs + 1)]
+    for buf in buffers[:-1]:
+        offsets.append(offsets[-1] + len(buf))
+    offsets_buf = struct.pack('!' + 'I' * (nbufs + 1), nbufs, *offsets)
+    buffers.insert(0, offsets_buf)
+    return b''.join(buffers)
+
+
+def legacy_deserialize_binary_message(bmsg):
+    nbufs = struct.unpack('!i', bmsg[:4])[0]
+    offsets = list(struct.unpack('!' + 'I' * nbufs, bmsg[4:4*(nbufs+1)]))
+    offsets.append(None)
+    bufs = []
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        bufs.append(bmsg[start:stop])
+    msg = json.loads(bufs[0].decode('utf8'))
+    msg['header'] = extract_dates(msg['header'])
+    msg['parent_header'] = extract_dates(msg['parent_header'])
+    msg['buffers'] = bufs[1:]
+    return msg
+
+
+def allocated(func, *args):
+    """Return the peak number of bytes allocated while calling func."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def report(name, func, arg, number, payload):
+    nbytes = allocated(func, arg)
+    seconds = timeit.timeit(lambda: func(arg), number=number) / number
+    print("{:<14} {:>12,d} bytes copied ({:5.2f}x payload) {:10.3f} ms/msg".format(
+        name, nbytes, nbytes / payload, seconds * 1e3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=float, default=8, help="size of each buffer in MiB")
+    parser.add_argument('--nbufs', type=int, default=4, help="number of buffers per message")
+    parser.add_argument('--number', type=int, default=20, help="iterations for timing")
+    args = parser.parse_args()
+
+    session = Session()
+    msg = session.msg('comm_msg', content={'data': {'method': 'update'}})
+    msg['channel'] = 'iopub'
+    nbytes = int(args.size * 1024 * 1024) // 8 * 8
+    # float64 arrays, like the ndarrays sent by widget libraries
+    msg['buffers'] = [memoryview(array('d', os.urandom(nbytes))) for i in range(args.nbufs)]
+    payload = sum(buf.nbytes for buf in msg['buffers'])
+    print("{} buffers, {:,d} bytes of payload per message".format(args.nbufs, payload))
+
+    bmsg = serialize_binary_message(msg)
+    report("serialize", serialize_binary_message, msg, args.number, payload)
+    report("deserialize", deserialize_binary_message, bmsg, args.number, payload)
+
+    print("previous implementation:")
+    # the legacy serializer miscomputes offsets of non-byte buffers; cast them to bytes
+    legacy_msg = dict(msg, buffers=[buf.cast('B') for buf in msg['buffers']])
+    report("serialize", legacy_serialize_binary_message, legacy_msg, args.number, payload)
+    report("deserialize", legacy_deserialize_binary_message, bmsg, args.number, payload)
+
+
+if __name__ == '__main__':
+    main()
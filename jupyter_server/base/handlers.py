@@ -19,6 +19,7 @@ from http.cookies import Morsel
 from urllib.parse import urlparse
 from jinja2 import TemplateNotFound
 from tornado import web, gen, escape, httputil
+from tornado.concurrent import Future
 from tornado.log import app_log
 import prometheus_client
 
@@ -33,6 +34,7 @@ from jupyter_server._tz import utcnow
 from jupyter_server.i18n import combine_translations
 from jupyter_server.utils import ensure_async, url_path_join, url_is_absolute, url_escape
 from jupyter_server.services.security import csp_report_uri
+from jupyter_server.base.jsonserializer import default_json_serializer
 
 #-----------------------------------------------------------------------------
 # Top-level handlers
@@ -205,6 +207,11 @@ class JupyterHandler(AuthenticatedHandler):
         """User-supplied values to supply to jinja templates."""
         return self.settings.get('jinja_template_vars', {})
 
+    @property
+    def json_serializer(self):
+        """The serializer to use for JSON API models."""
+        return self.settings.get('json_serializer', None) or default_json_serializer
+
     #---------------------------------------------------------------
     # URLs
     #---------------------------------------------------------------
@@ -526,7 +533,7 @@ class JupyterHandler(AuthenticatedHandler):
         # Do we need to call body.decode('utf-8') here?
         body = self.request.body.strip().decode(u'utf-8')
         try:
-            model = json.loads(body)
+            model = self.json_serializer.loads(body)
         except Exception as e:
             self.log.debug("Bad JSON: %r", body)
             self.log.error("Couldn't parse JSON", exc_info=True)
@@ -591,6 +598,8 @@ class APIHandler(JupyterHandler):
             if isinstance(e, HTTPError):
                 reply['message'] = e.log_message or message
                 reply['reason'] = e.reason
+                if getattr(e, 'retry_after', None):
+                    self.set_header('Retry-After', str(e.retry_after))
             else:
                 reply['message'] = 'Unhandled error'
                 reply['reason'] = None
@@ -635,6 +644,54 @@ class APIHandler(JupyterHandler):
         ):
             self.settings['api_last_activity'] = utcnow()
 
+    # (sec) maximum ?wait= duration of list requests, see check_list_version
+    max_list_wait = 60
+
+    async def check_list_version(self, manager, *emitters):
+        """Answer a conditional GET of a list from the version of its manager
+
+        The version returned by ``manager.list_version()`` is sent as the ETag
+        of the response. If it matches the If-None-Match header of the request,
+        the request is answered with 304 Not Modified, after waiting for up to
+        ``?wait=`` seconds for a change notified by one of the ``emitters``.
+
+        Returns True if the request was answered, False if the list should be sent.
+        """
+        version = manager.list_version()
+        if version is None:
+            return False
+        self.set_header('ETag', '"%s"' % version)
+        if not self.check_etag_header():
+            return False
+
+        try:
+            wait = min(float(self.get_argument('wait', 0)), self.max_list_wait)
+        except ValueError as e:
+            raise web.HTTPError(400, "Invalid wait argument: %s" % self.get_argument('wait')) from e
+        if wait > 0:
+            changed = Future()
+
+            def on_change(event):
+                if not changed.done():
+                    changed.set_result(None)
+
+            for emitter in emitters:
+                emitter.subscribe(on_change)
+            try:
+                await gen.with_timeout(datetime.timedelta(seconds=wait), changed)
+            except gen.TimeoutError:
+                pass
+            finally:
+                for emitter in emitters:
+                    emitter.unsubscribe(on_change)
+            self.set_header('ETag', '"%s"' % manager.list_version())
+            if not self.check_etag_header():
+                return False
+
+        self.set_status(304)
+        self.finish()
+        return True
+
     def finish(self, *args, **kwargs):
         self.update_api_activity()
         self.set_header('Content-Type', 'application/json')
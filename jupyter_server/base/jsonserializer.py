@@ -0,0 +1,66 @@
+"""Pluggable JSON serialization for API handlers and kernel websockets."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import json
+
+from jupyter_client.jsonutil import date_default
+from traitlets.config import LoggingConfigurable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONSerializer(LoggingConfigurable):
+    """Serializes API models and kernel messages using the standard library.
+
+    Datetimes are encoded as ISO8601 strings.
+    Set ServerApp.json_serializer_class to a subclass to use another JSON library.
+    """
+
+    def dumps(self, obj):
+        """Serialize obj to a JSON str."""
+        return json.dumps(obj, default=date_default)
+
+    def dumpb(self, obj):
+        """Serialize obj to utf8-encoded JSON bytes."""
+        return self.dumps(obj).encode('utf8')
+
+    def loads(self, s):
+        """Deserialize a JSON str or bytes."""
+        return json.loads(s)
+
+
+class OrjsonSerializer(JSONSerializer):
+    """Serializes API models and kernel messages using orjson.
+
+    orjson encodes datetimes natively, without a Python callback per value.
+    Objects orjson cannot encode (e.g. dicts with non-str keys or integers
+    that do not fit in 64 bits) fall back on the standard library.
+
+    Unlike the standard library, NaN and Infinity are encoded as null.
+    """
+
+    def __init__(self, **kwargs):
+        if orjson is None:
+            raise ImportError("OrjsonSerializer requires the orjson package")
+        super(OrjsonSerializer, self).__init__(**kwargs)
+
+    def dumpb(self, obj):
+        try:
+            return orjson.dumps(obj, default=date_default, option=orjson.OPT_UTC_Z)
+        except TypeError:
+            return JSONSerializer.dumps(self, obj).encode('utf8')
+
+    def dumps(self, obj):
+        return self.dumpb(obj).decode('utf8')
+
+    def loads(self, s):
+        return orjson.loads(s)
+
+
+# used by handlers running in applications without a configured serializer
+default_json_serializer = JSONSerializer()
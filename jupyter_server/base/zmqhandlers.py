@@ -4,23 +4,32 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 
+import asyncio
 import json
 import struct
-import sys
+import time
 import tornado
 
 from urllib.parse import urlparse
 from tornado import ioloop, web
-from tornado.websocket import WebSocketHandler
+from tornado.escape import utf8
+from tornado.iostream import StreamClosedError
+from tornado.websocket import WebSocketHandler, WebSocketClosedError, WebSocketProtocol13
 
 from jupyter_client.session import Session
 from jupyter_client.jsonutil import date_default, extract_dates
 from ipython_genutils.py3compat import cast_unicode
 
 from .handlers import JupyterHandler
+from .jsonserializer import default_json_serializer
+from ..prometheus.metrics import (
+    WEBSOCKET_COMPRESSION_MESSAGES_TOTAL,
+    WEBSOCKET_COMPRESSION_SAVED_BYTES_TOTAL,
+    WEBSOCKET_COMPRESSION_CPU_SECONDS_TOTAL,
+)
 
 
-def serialize_binary_message(msg):
+def serialize_binary_message(msg, packer=None):
     """serialize a message as a binary blob
 
     Header:
@@ -30,6 +39,18 @@ def serialize_binary_message(msg):
 
     Offsets are from the start of the buffer, including the header.
 
+    This is not zero-copy: each buffer is copied once, into the returned bytes.
+    It is not copied before that, but websocket messages are written as
+    a single bytes object, so this copy can not be avoided here.
+
+    Parameters
+    ----------
+    msg : dict
+        The message, with its buffers in msg['buffers'].
+    packer : callable, optional
+        Serializes the message without its buffers to JSON bytes.
+        Defaults to the standard library json module.
+
     Returns
     -------
     The message serialized to bytes.
@@ -37,18 +58,18 @@ def serialize_binary_message(msg):
     """
     # don't modify msg or buffer list in-place
     msg = msg.copy()
-    buffers = list(msg.pop('buffers'))
-    if sys.version_info < (3, 4):
-        buffers = [x.tobytes() for x in buffers]
-    bmsg = json.dumps(msg, default=date_default).encode('utf8')
-    buffers.insert(0, bmsg)
-    nbufs = len(buffers)
-    offsets = [4 * (nbufs + 1)]
+    buffers = [memoryview(buf) for buf in msg.pop('buffers')]
+    if packer is None:
+        bmsg = json.dumps(msg, default=date_default).encode('utf8')
+    else:
+        bmsg = packer(msg)
+    nbufs = len(buffers) + 1
+    offsets = [4 * (nbufs + 1), 4 * (nbufs + 1) + len(bmsg)]
     for buf in buffers[:-1]:
-        offsets.append(offsets[-1] + len(buf))
-    offsets_buf = struct.pack('!' + 'I' * (nbufs + 1), nbufs, *offsets)
-    buffers.insert(0, offsets_buf)
-    return b''.join(buffers)
+        # nbytes, not len, which counts items for non-byte formats
+        offsets.append(offsets[-1] + buf.nbytes)
+    offsets_buf = struct.pack('!' + 'I' * (nbufs + 1), nbufs, *offsets[:nbufs])
+    return b''.join([offsets_buf, bmsg] + buffers)
 
 
 def deserialize_binary_message(bmsg):
@@ -61,26 +82,155 @@ def deserialize_binary_message(bmsg):
 
     Offsets are from the start of the buffer, including the header.
 
+    The buffers of the returned message are memoryviews into bmsg,
+    so no buffer data is copied.
+
     Returns
     -------
     message dictionary
     """
-    nbufs = struct.unpack('!i', bmsg[:4])[0]
-    offsets = list(struct.unpack('!' + 'I' * nbufs, bmsg[4:4*(nbufs+1)]))
+    view = memoryview(bmsg)
+    nbufs = struct.unpack_from('!i', view)[0]
+    offsets = list(struct.unpack_from('!' + 'I' * nbufs, view, 4))
     offsets.append(None)
     bufs = []
     for start, stop in zip(offsets[:-1], offsets[1:]):
-        bufs.append(bmsg[start:stop])
-    msg = json.loads(bufs[0].decode('utf8'))
+        bufs.append(view[start:stop])
+    msg = json.loads(bytes(bufs[0]).decode('utf8'))
     msg['header'] = extract_dates(msg['header'])
     msg['parent_header'] = extract_dates(msg['parent_header'])
     msg['buffers'] = bufs[1:]
     return msg
 
+# websocket subprotocol forwarding the kernel's message frames almost verbatim
+KERNEL_WS_PROTOCOL_V1 = 'v1.kernel.websocket.jupyter.org'
+
+
+def serialize_msg_to_ws_v1(msg_list, channel):
+    """serialize the parts of a kernel message for the v1 kernel websocket protocol
+
+    msg_list is the list of message parts following the signature of a zmq
+    message: header, parent_header, metadata, content and buffers.
+
+    Layout:
+
+    8 bytes: number of offsets (n) as 64b little-endian int
+    8 * n bytes: offsets as 64b little-endian ints
+    channel name, then each message part
+
+    Offsets are from the start of the message, including the header.
+    The first offset is the start of the channel name and the last is
+    the end of the message.
+
+    Returns
+    -------
+    The message serialized to bytes.
+    """
+    bchannel = channel.encode('utf8')
+    noffsets = len(msg_list) + 2
+    offsets = [8 * (noffsets + 1), 8 * (noffsets + 1) + len(bchannel)]
+    for part in msg_list:
+        offsets.append(offsets[-1] + memoryview(part).nbytes)
+    header = struct.pack('<' + 'Q' * (noffsets + 1), noffsets, *offsets)
+    return b''.join([header, bchannel] + list(msg_list))
+
+
+def deserialize_msg_from_ws_v1(ws_msg):
+    """deserialize a message of the v1 kernel websocket protocol
+
+    See serialize_msg_to_ws_v1 for the layout.
+
+    Returns
+    -------
+    (channel, msg_list) where msg_list holds the header, parent_header,
+    metadata and content as bytes, which Session.unpack accepts,
+    and the buffers as memoryviews into ws_msg.
+    """
+    view = memoryview(ws_msg)
+    noffsets = struct.unpack_from('<Q', view)[0]
+    offsets = struct.unpack_from('<' + 'Q' * noffsets, view, 8)
+    channel = bytes(view[offsets[0]:offsets[1]]).decode('utf8')
+    msg_list = [view[start:stop] for start, stop in zip(offsets[1:-1], offsets[2:])]
+    # the JSON parts are small, only the buffers are worth not copying
+    msg_list[:4] = [bytes(part) for part in msg_list[:4]]
+    return channel, msg_list
+
 # ping interval for keeping websockets alive (30 seconds)
 WS_PING_INTERVAL = 30000
 
 
+class AdaptiveCompressionProtocol(WebSocketProtocol13):
+    """A websocket protocol deciding whether to compress each message.
+
+    When permessage-deflate is negotiated, tornado compresses every message.
+    Compressing small messages costs more CPU time than it saves bandwidth,
+    so only messages of at least ``threshold`` bytes are compressed,
+    unless the sender decides otherwise.
+    Uncompressed messages are sent without the RSV1 bit, as permitted by RFC 7692.
+
+    Tornado has no public API for this, so the private attributes of
+    WebSocketProtocol13 listed in ``tornado_internals`` are used. If they are
+    missing, e.g. in a later tornado version, every message is compressed
+    by tornado as usual.
+
+    Only kernel websockets (ZMQChannelsHandler) use this protocol. Terminal
+    websockets do not: they are not compressed, as before, since
+    websocket_compression_options only applies to kernel websockets.
+    """
+
+    tornado_internals = ('_compressor', '_message_bytes_out', '_write_frame')
+
+    def __init__(self, handler, mask_outgoing, params, threshold=0):
+        super(AdaptiveCompressionProtocol, self).__init__(handler, mask_outgoing, params)
+        self.threshold = threshold
+        self.adaptive = all(hasattr(self, name) for name in self.tornado_internals)
+
+    @property
+    def compressing(self):
+        """Whether compression was negotiated with the client, and is decided per message"""
+        return self.adaptive and self._compressor is not None
+
+    def write_message(self, message, binary=False, compress=None):
+        """Send a message, compressed if ``compress`` is True.
+
+        If ``compress`` is None, the message is compressed if it is
+        at least as large as the threshold.
+        """
+        if not self.compressing:
+            return super(AdaptiveCompressionProtocol, self).write_message(message, binary=binary)
+        opcode = 0x2 if binary else 0x1
+        message = utf8(message)
+        self._message_bytes_out += len(message)
+        if compress is None:
+            compress = len(message) >= self.threshold
+        handler = type(self.handler).__name__
+        flags = 0
+        if compress:
+            start = time.thread_time()
+            compressed = self._compressor.compress(message)
+            WEBSOCKET_COMPRESSION_CPU_SECONDS_TOTAL.labels(handler=handler).inc(time.thread_time() - start)
+            WEBSOCKET_COMPRESSION_SAVED_BYTES_TOTAL.labels(handler=handler).inc(
+                max(len(message) - len(compressed), 0))
+            WEBSOCKET_COMPRESSION_MESSAGES_TOTAL.labels(handler=handler, result='compressed').inc()
+            message = compressed
+            flags |= self.RSV1
+        else:
+            WEBSOCKET_COMPRESSION_MESSAGES_TOTAL.labels(handler=handler, result='raw').inc()
+        # same semi-synchronous error handling as WebSocketProtocol13.write_message
+        try:
+            fut = self._write_frame(True, opcode, message, flags=flags)
+        except StreamClosedError:
+            raise WebSocketClosedError()
+
+        async def wrapper():
+            try:
+                await fut
+            except StreamClosedError:
+                raise WebSocketClosedError()
+
+        return asyncio.ensure_future(wrapper())
+
+
 class WebSocketMixin(object):
     """Mixin for common websocket options"""
     ping_callback = None
@@ -201,17 +351,44 @@ class ZMQStreamHandler(WebSocketMixin, WebSocketHandler):
                 self.stream.close()
 
 
+    # the websocket subprotocol selected during the handshake, if any
+    ws_protocol = None
+
+    @property
+    def json_serializer(self):
+        """The serializer to use for JSON messages."""
+        return self.settings.get('json_serializer', None) or default_json_serializer
+
     def _reserialize_reply(self, msg_or_list, channel=None):
         """Reserialize a reply message using JSON.
 
         msg_or_list can be an already-deserialized msg dict or the zmq buffer list.
         If it is the zmq list, it will be deserialized with self.session.
 
+        With the v1 kernel websocket protocol, msg_or_list can also be the list of
+        message parts following the signature (header, parent_header, metadata,
+        content and buffers), which are forwarded without being deserialized.
+
         This takes the msg list from the ZMQ socket and serializes the result for the websocket.
         This method should be used by self._on_zmq_reply to build messages that can
         be sent back to the browser.
 
         """
+        if self.ws_protocol == KERNEL_WS_PROTOCOL_V1:
+            if isinstance(msg_or_list, dict):
+                msg = msg_or_list
+                channel = channel or msg.get('channel')
+                pack = self.session.pack
+                msg_list = [
+                    pack(msg['header']),
+                    pack(msg['parent_header']),
+                    pack(msg['metadata']),
+                    pack(msg['content']),
+                ] + list(msg.get('buffers') or [])
+            else:
+                msg_list = msg_or_list
+            return serialize_msg_to_ws_v1(msg_list, channel or '')
+
         if isinstance(msg_or_list, dict):
             # already unpacked
             msg = msg_or_list
@@ -221,13 +398,13 @@ class ZMQStreamHandler(WebSocketMixin, WebSocketHandler):
         if channel:
             msg['channel'] = channel
         if msg['buffers']:
-            buf = serialize_binary_message(msg)
+            buf = serialize_binary_message(msg, self.json_serializer.dumpb)
             return buf
         else:
-            smsg = json.dumps(msg, default=date_default)
+            smsg = self.json_serializer.dumps(msg)
             return cast_unicode(smsg)
 
-    def _on_zmq_reply(self, stream, msg_list):
+    def _on_zmq_reply(self, stream, msg_list, compress=None):
         # Sometimes this gets triggered when the on_close method is scheduled in the
         # eventloop but hasn't been called.
         if self.ws_connection is None or stream.closed():
@@ -240,7 +417,11 @@ class ZMQStreamHandler(WebSocketMixin, WebSocketHandler):
         except Exception:
             self.log.critical("Malformed message: %r" % msg_list, exc_info=True)
         else:
-            self.write_message(msg, binary=isinstance(msg, bytes))
+            if compress is None:
+                self.write_message(msg, binary=isinstance(msg, bytes))
+            else:
+                # only supported by handlers using AdaptiveCompressionProtocol
+                self.write_message(msg, binary=isinstance(msg, bytes), compress=compress)
 
 
 class AuthenticatedZMQStreamHandler(ZMQStreamHandler, JupyterHandler):
@@ -0,0 +1,218 @@
+"""Culling of inactive kernels and terminals."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import heapq
+import itertools
+import time
+
+from tornado.ioloop import IOLoop
+
+from jupyter_server.utils import ensure_async
+
+
+class IdleCuller(object):
+    """Culls objects that have been inactive for longer than a timeout.
+
+    Objects are indexed in a heap by the time at which they may become
+    idle (their last activity plus the timeout). The culler wakes up when
+    the next object may have expired, instead of scanning every object at
+    a fixed interval, and only evaluates the objects whose time has come.
+
+    Activity is not tracked by the index: the last activity of an object
+    is read again when it reaches the top of the heap, and the object is
+    re-queued if it has been active since.
+
+    Parameters
+    ----------
+    timeout : float
+        Seconds of inactivity after which an object is considered idle.
+    interval : float
+        Minimum number of seconds between two checks. Expired objects
+        that are not culled (e.g. busy kernels) are checked again after
+        this interval.
+    get_last_activity : callable
+        Returns the last activity (a datetime or None) of an object,
+        and raises KeyError for objects that no longer exist.
+    cull : callable
+        Called with each object that may be idle, checks the remaining
+        criteria and culls it. Can be a coroutine function.
+    callback : callable, optional
+        Called when the culler wakes up, defaults to :meth:`cull_expired`.
+        Overridden by managers that need to do some work before culling.
+    concurrency : int
+        Maximum number of objects culled concurrently. 0 disables the limit.
+    log : logging.Logger
+    """
+
+    def __init__(self, timeout, interval, get_last_activity, cull, callback=None,
+                 concurrency=0, log=None):
+        self.timeout = timeout
+        self.interval = interval
+        self.get_last_activity = get_last_activity
+        self.cull = cull
+        self.callback = callback or self.cull_expired
+        self.concurrency = concurrency
+        self.log = log
+
+        # heap of (deadline, seq, key), with stale entries removed lazily
+        self._heap = []
+        self._deadlines = {}
+        self._counter = itertools.count()
+        self._started = False
+        self._checking = False
+        self._last_check = 0
+        self._timeout_handle = None
+        self._wake_at = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def start(self):
+        """Start waking up when objects may have expired."""
+        self._started = True
+        self._schedule()
+
+    def stop(self):
+        self._started = False
+        self._cancel()
+
+    def add(self, key, not_before=0):
+        """Add an object to the index, or update its position.
+
+        Parameters
+        ----------
+        key : hashable
+            The name or id of the object.
+        not_before : float
+            The object is not evaluated before this time (in seconds since the epoch).
+        """
+        try:
+            last_activity = self.get_last_activity(key)
+        except KeyError:
+            self.discard(key)
+            return
+        if last_activity is None:
+            # activity not known yet, check again later
+            deadline = time.time() + self.interval
+        else:
+            deadline = last_activity.timestamp() + self.timeout
+        deadline = max(deadline, not_before)
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+        self._schedule()
+
+    def discard(self, key):
+        """Remove an object from the index."""
+        self._deadlines.pop(key, None)
+
+    def next_deadline(self):
+        """The next time at which an object may become idle, if any."""
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        if heap:
+            return heap[0][0]
+
+    def pop_expired(self, now=None):
+        """Remove and return the objects which may be idle at the time ``now``.
+
+        Objects which have been active since they were indexed are re-queued.
+        """
+        if now is None:
+            now = time.time()
+        heap = self._heap
+        expired = []
+        while heap and heap[0][0] <= now:
+            deadline, seq, key = heapq.heappop(heap)
+            if self._deadlines.get(key) != deadline:
+                # stale entry
+                continue
+            del self._deadlines[key]
+            try:
+                last_activity = self.get_last_activity(key)
+            except KeyError:
+                continue
+            if last_activity is not None and last_activity.timestamp() + self.timeout > now:
+                self.add(key)
+            else:
+                expired.append(key)
+        return expired
+
+    async def cull_expired(self):
+        """Cull the objects whose inactivity may have exceeded the timeout.
+
+        The culls run concurrently, up to the concurrency limit.
+        Objects which were not culled are checked again after the interval.
+        """
+        if self._checking:
+            return
+        self._checking = True
+        try:
+            self._last_check = time.time()
+            expired = self.pop_expired(self._last_check)
+            if not expired:
+                return
+            if self.log:
+                self.log.debug("Checking %s possibly idle objects", len(expired))
+            if self.concurrency > 0:
+                semaphore = asyncio.Semaphore(self.concurrency)
+            else:
+                semaphore = None
+            await asyncio.gather(*[self._cull(key, semaphore) for key in expired])
+        finally:
+            self._checking = False
+            self._schedule()
+
+    async def _cull(self, key, semaphore):
+        try:
+            if semaphore is None:
+                await ensure_async(self.cull(key))
+            else:
+                async with semaphore:
+                    await ensure_async(self.cull(key))
+        except Exception as e:
+            if self.log:
+                self.log.exception("The following exception was encountered while culling %s: %s", key, e)
+        self.add(key, not_before=time.time() + self.interval)
+
+    def _schedule(self):
+        """Schedule a wake up for the next deadline."""
+        if not self._started:
+            return
+        deadline = self.next_deadline()
+        if deadline is None:
+            self._cancel()
+            return
+        wake_at = max(deadline, self._last_check + self.interval)
+        if self._timeout_handle is not None:
+            if self._wake_at <= wake_at:
+                return
+            self._cancel()
+        self._wake_at = wake_at
+        self._timeout_handle = IOLoop.current().call_later(
+            max(wake_at - time.time(), 0), self._wakeup,
+        )
+
+    def _cancel(self):
+        if self._timeout_handle is not None:
+            IOLoop.current().remove_timeout(self._timeout_handle)
+            self._timeout_handle = None
+
+    async def _wakeup(self):
+        self._timeout_handle = None
+        if self._checking:
+            # rescheduled once the current check is done
+            return
+        try:
+            await ensure_async(self.callback())
+        except Exception as e:
+            if self.log:
+                self.log.exception("The following exception was encountered while culling: %s", e)
+        finally:
+            self._schedule()
@@ -23,7 +23,7 @@ from typing import Dict
 from .gateway_client import GatewayClient, gateway_request
 from ..services.kernels.kernelmanager import AsyncMappingKernelManager
 from ..services.sessions.sessionmanager import SessionManager
-from ..utils import url_path_join, ensure_async
+from ..utils import url_path_join, ensure_async, shutdown_concurrently
 from .._tz import UTC
 
 
@@ -48,9 +48,11 @@ class GatewayMappingKernelManager(AsyncMappingKernelManager):
     def remove_kernel(self, kernel_id):
         """Complete override since we want to be more tolerant of missing keys """
         try:
-            return self._kernels.pop(kernel_id)
+            km = self._kernels.pop(kernel_id)
         except KeyError:
-            pass
+            return
+        self.events.emit('removed', kernel_id)
+        return km
 
     async def start_kernel(self, kernel_id=None, path=None, **kwargs):
         """Start a kernel for a session and return its kernel_id.
@@ -75,10 +77,13 @@ class GatewayMappingKernelManager(AsyncMappingKernelManager):
         await km.start_kernel(**kwargs)
         kernel_id = km.kernel_id
         self._kernels[kernel_id] = km
+        self.events.emit('added', kernel_id, await self.kernel_model(kernel_id))
 
         # Initialize culling if not already
         if not self._initialized_culler:
             self.initialize_culler()
+        if self._culler is not None:
+            self._culler.add(kernel_id)
 
         return kernel_id
 
@@ -120,10 +125,14 @@ class GatewayMappingKernelManager(AsyncMappingKernelManager):
         for kid, km in our_kernels.items():
             if kid not in kernel_models:
                 self.log.warn(f"Kernel {kid} no longer active - probably culled on Gateway server.")
-                self._kernels.pop(kid, None)
+                self.remove_kernel(kid)
                 culled_ids.append(kid)  # TODO: Figure out what do with these.
         return list(kernel_models.values())
 
+    def list_version(self):
+        """Kernels may change on the Gateway server without notice, the version is not known."""
+        return None
+
     async def shutdown_kernel(self, kernel_id, now=False, restart=False):
         """Shutdown a kernel by its kernel uuid.
 
@@ -162,13 +171,27 @@ class GatewayMappingKernelManager(AsyncMappingKernelManager):
         km = self.get_kernel(kernel_id)
         await km.interrupt_kernel()
 
+    def fill_kernel_pool(self):
+        """Kernels are not pooled on the Gateway server."""
+        if self.kernel_pool:
+            self.log.warning("kernel_pool is not supported with a Gateway server, ignoring it.")
+
     async def shutdown_all(self, now=False):
-        """Shutdown all kernels."""
-        for kernel_id in self._kernels:
+        """Shutdown all kernels, concurrently."""
+        async def shutdown(kernel_id, past_deadline):
             km = self.get_kernel(kernel_id)
-            await km.shutdown_kernel(now=now)
+            await km.shutdown_kernel(now=now or past_deadline)
             self.remove_kernel(kernel_id)
 
+        await shutdown_concurrently(
+            list(self._kernels),
+            shutdown=shutdown,
+            concurrency=self.shutdown_all_concurrency,
+            timeout=self.shutdown_all_timeout,
+            log=self.log,
+            kind='kernel',
+        )
+
     async def cull_kernels(self):
         """Override cull_kernels so we can be sure their state is current. """
         await self.list_kernels()
@@ -31,3 +31,146 @@ except ImportError:
         'counter for how many kernels are running labeled by type',
         ['type']
     )
+
+# The metrics below are specific to Jupyter Server and are not defined by Notebook.
+
+from prometheus_client import Counter, Gauge, Histogram
+
+KERNEL_MESSAGE_BUFFER_BYTES = Gauge(
+    'kernel_message_buffer_bytes',
+    'bytes held in offline message buffers of disconnected kernels, labeled by location',
+    ['location']
+)
+
+KERNEL_MESSAGE_BUFFER_DROPPED_TOTAL = Counter(
+    'kernel_message_buffer_dropped_total',
+    'counter for how many buffered kernel messages were dropped due to buffer limits',
+)
+
+KERNEL_IOPUB_DROPPED_MESSAGES_TOTAL = Counter(
+    'kernel_iopub_dropped_messages_total',
+    'counter for how many IOPub messages were not sent due to rate limits, labeled by type',
+    ['type']
+)
+
+KERNEL_IOPUB_DROPPED_BYTES_TOTAL = Counter(
+    'kernel_iopub_dropped_bytes_total',
+    'counter for how many bytes of IOPub messages were not sent due to rate limits, labeled by type',
+    ['type']
+)
+
+KERNEL_IOPUB_THROTTLED_SECONDS_TOTAL = Counter(
+    'kernel_iopub_throttled_seconds_total',
+    'counter for how long IOPub output was throttled due to rate limits, labeled by type',
+    ['type']
+)
+
+KERNEL_POOL_REQUESTS_TOTAL = Counter(
+    'kernel_pool_requests_total',
+    'counter for how many kernel starts were served by the warm kernel pool, labeled by type and result (hit or miss)',
+    ['type', 'result']
+)
+
+KERNEL_POOL_READY_TOTAL = Gauge(
+    'kernel_pool_ready_total',
+    'counter for how many started kernels are ready in the warm kernel pool, labeled by type',
+    ['type']
+)
+
+KERNEL_POOL_REFILL_DURATION_SECONDS = Histogram(
+    'kernel_pool_refill_duration_seconds',
+    'duration in seconds for starting a kernel of the warm kernel pool until it is ready, labeled by type',
+    ['type']
+)
+
+KERNEL_START_DURATION_SECONDS = Histogram(
+    'kernel_start_duration_seconds',
+    'duration in seconds from the start of a kernel until each startup phase is complete, labeled by type and phase'
+    ' (launch: process started, heartbeat: first heartbeat, kernel_info: first kernel_info reply, pool: taken from the kernel pool)',
+    ['type', 'phase'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 60, float('inf')),
+)
+
+KERNEL_RESTART_DURATION_SECONDS = Histogram(
+    'kernel_restart_duration_seconds',
+    'duration in seconds for restarting a kernel until it replies to kernel_info, labeled by type',
+    ['type'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 60, float('inf')),
+)
+
+KERNEL_INTERRUPT_DURATION_SECONDS = Histogram(
+    'kernel_interrupt_duration_seconds',
+    'duration in seconds for interrupting a kernel, labeled by type',
+    ['type'],
+)
+
+KERNEL_SHUTDOWN_DURATION_SECONDS = Histogram(
+    'kernel_shutdown_duration_seconds',
+    'duration in seconds for shutting down a kernel, labeled by type',
+    ['type'],
+)
+
+KERNEL_NUDGE_DURATION_SECONDS = Histogram(
+    'kernel_nudge_duration_seconds',
+    'duration in seconds of the kernel_info handshake when a websocket connects to a kernel, labeled by type',
+    ['type'],
+)
+
+KERNEL_NUDGES_SKIPPED_TOTAL = Counter(
+    'kernel_nudges_skipped_total',
+    'counter for how many websocket connections to a kernel skipped the kernel_info handshake, labeled by type and reason (receiving or busy)',
+    ['type', 'reason']
+)
+
+KERNEL_STARTS_IN_FLIGHT = Gauge(
+    'kernel_starts_in_flight',
+    'counter for how many kernels are being started',
+)
+
+KERNEL_START_QUEUE_DEPTH = Gauge(
+    'kernel_start_queue_depth',
+    'counter for how many kernel starts are waiting for admission',
+)
+
+KERNEL_START_QUEUE_WAIT_SECONDS = Histogram(
+    'kernel_start_queue_wait_seconds',
+    'duration in seconds kernel starts waited for admission, labeled by type and result (admitted or timeout)',
+    ['type', 'result'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 60, float('inf')),
+)
+
+KERNEL_START_REJECTED_TOTAL = Counter(
+    'kernel_start_rejected_total',
+    'counter for how many kernel starts were rejected, labeled by type and reason (queue_full or timeout)',
+    ['type', 'reason']
+)
+
+WEBSOCKET_COMPRESSION_MESSAGES_TOTAL = Counter(
+    'websocket_compression_messages_total',
+    'counter for how many websocket messages were sent with compression enabled, labeled by handler and result (compressed or raw)',
+    ['handler', 'result']
+)
+
+WEBSOCKET_COMPRESSION_SAVED_BYTES_TOTAL = Counter(
+    'websocket_compression_saved_bytes_total',
+    'counter for how many bytes were saved by compressing websocket messages, labeled by handler',
+    ['handler']
+)
+
+WEBSOCKET_COMPRESSION_CPU_SECONDS_TOTAL = Counter(
+    'websocket_compression_cpu_seconds_total',
+    'counter for the CPU time spent compressing websocket messages, labeled by handler',
+    ['handler']
+)
+
+KERNEL_WS_BACKPRESSURE_EVENTS_TOTAL = Counter(
+    'kernel_ws_backpressure_events_total',
+    'counter for how many times kernel websockets were paused, resumed or closed because the client was not reading fast enough, labeled by event',
+    ['event']
+)
+
+KERNEL_WS_BACKPRESSURE_DROPPED_MESSAGES_TOTAL = Counter(
+    'kernel_ws_backpressure_dropped_messages_total',
+    'counter for how many IOPub messages were not sent to slow websocket clients, labeled by type',
+    ['type']
+)
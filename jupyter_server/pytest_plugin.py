@@ -374,7 +374,7 @@ def jp_ws_fetch(jp_serverapp, jp_auth_header, jp_http_port, jp_base_url):
             headers=jp_auth_header,
             connect_timeout=120
         )
-        return tornado.websocket.websocket_connect(req)
+        return tornado.websocket.websocket_connect(req, **kwargs)
     return client_fetch
 
 
@@ -80,6 +80,7 @@ from jupyter_server.gateway.managers import GatewayMappingKernelManager, Gateway
 from jupyter_server.auth.login import LoginHandler
 from jupyter_server.auth.logout import LogoutHandler
 from jupyter_server.base.handlers import FileFindHandler
+from jupyter_server.base.jsonserializer import JSONSerializer
 
 from traitlets.config import Config
 from traitlets.config.application import catch_config_error, boolean_flag
@@ -134,6 +135,7 @@ JUPYTER_SERVICE_HANDLERS = dict(
     api=['jupyter_server.services.api.handlers'],
     config=['jupyter_server.services.config.handlers'],
     contents=['jupyter_server.services.contents.handlers'],
+    events=['jupyter_server.services.events.handlers'],
     files=['jupyter_server.files.handlers'],
     kernels=['jupyter_server.services.kernels.handlers'],
     kernelspecs=[
@@ -254,6 +256,12 @@ class ServerWebApplication(web.Application):
             iopub_data_rate_limit=jupyter_app.iopub_data_rate_limit,
             rate_limit_window=jupyter_app.rate_limit_window,
 
+            # kernel websocket protocol
+            kernel_ws_protocol=jupyter_app.kernel_ws_protocol,
+            kernel_ws_pending_messages_limit=jupyter_app.kernel_ws_pending_messages_limit,
+            kernel_ws_high_watermark=jupyter_app.kernel_ws_high_watermark,
+            kernel_ws_max_buffer_size=jupyter_app.kernel_ws_max_buffer_size,
+
             # authentication
             cookie_secret=jupyter_app.cookie_secret,
             login_url=url_path_join(base_url, '/login'),
@@ -272,6 +280,7 @@ class ServerWebApplication(web.Application):
             session_manager=session_manager,
             kernel_spec_manager=kernel_spec_manager,
             config_manager=config_manager,
+            json_serializer=jupyter_app.json_serializer,
 
             # handlers
             extra_services=extra_services,
@@ -612,6 +621,7 @@ class ServerApp(JupyterApp):
         'auth',
         'config',
         'contents',
+        'events',
         'files',
         'kernels',
         'kernelspecs',
@@ -1035,6 +1045,16 @@ class ServerApp(JupyterApp):
         A dict (even an empty one) will enable compression.
 
         See the tornado docs for WebSocketHandler.get_compression_options for details.
+        The compression level can be set with the 'compression_level' key.
+        """)
+    )
+
+    websocket_compression_threshold = Integer(1024, config=True,
+        help=_i18n("""(bytes) Websocket messages smaller than this are sent uncompressed.
+
+        Only used if compression is enabled by websocket_compression_options.
+        Outputs of already compressed data, such as PNG images, are not
+        compressed either.
         """)
     )
     terminado_settings = Dict(config=True,
@@ -1194,6 +1214,16 @@ class ServerApp(JupyterApp):
         """
     )
 
+    json_serializer_class = Type(
+        default_value=JSONSerializer,
+        klass=JSONSerializer,
+        config=True,
+        help=_i18n("""The JSON serializer class to use for API models and kernel messages.
+
+        Set to jupyter_server.base.jsonserializer.OrjsonSerializer to use orjson,
+        if installed, which serializes large models several times faster.""")
+    )
+
     login_handler_class = Type(
         default_value=LoginHandler,
         klass=web.RequestHandler,
@@ -1329,6 +1359,46 @@ class ServerApp(JupyterApp):
     rate_limit_window = Float(3, config=True, help=_i18n("""(sec) Time window used to
         check the message and data rate limits."""))
 
+    kernel_ws_protocol = Unicode(None, allow_none=True, config=True,
+        help=_i18n("""Preferred kernel message protocol over websocket.
+
+        The v1.kernel.websocket.jupyter.org protocol forwards the kernel's message
+        frames to the client without deserializing and re-encoding them as JSON.
+        It is only used if the client requests it via Sec-WebSocket-Protocol.
+
+        None (the default) negotiates the protocol with the client, and
+        '' always uses the legacy JSON protocol.
+        """))
+
+    kernel_ws_pending_messages_limit = Integer(0, config=True,
+        help=_i18n("""Open kernel websockets without waiting for the kernel to be ready.
+
+        By default (0), the websocket upgrade waits for the kernel's kernel_info
+        reply, up to kernel_info_timeout. If greater than 0, the upgrade completes
+        at once, a 'starting' status message is sent to the client, and up to
+        this many client messages are queued until the kernel is ready.
+        Further messages are dropped.
+        """))
+
+    kernel_ws_high_watermark = Integer(0, config=True,
+        help=_i18n("""(bytes) Amount of unsent data above which a kernel websocket client is considered slow.
+
+        While more data than this is waiting to be sent to a client, the shell,
+        control and stdin messages of its connection are not read from the kernel,
+        and its stream and display outputs are dropped, with a notice.
+        Reading resumes when less than half of it is waiting.
+        0 (default) disables the limit.
+        """))
+
+    kernel_ws_max_buffer_size = Integer(0, config=True,
+        help=_i18n("""(bytes) Amount of unsent data above which a kernel websocket connection is closed.
+
+        Messages that are not dropped when the client is slow (see kernel_ws_high_watermark)
+        can still accumulate: this closes the connection of clients that stopped reading.
+        The client can then reconnect, and missed messages are replayed if possible.
+        0 (default) disables the limit.
+        """))
+
     shutdown_no_activity_timeout = Integer(0, config=True,
         help=("Shut down the server after N seconds with no kernels or "
               "terminals running and no activity. "
@@ -1432,6 +1502,10 @@ class ServerApp(JupyterApp):
             parent=self,
             log=self.log,
         )
+        self.json_serializer = self.json_serializer_class(
+            parent=self,
+            log=self.log,
+        )
 
     def init_logging(self):
         # This prevents double log messages because tornado use a root logger that
@@ -1452,6 +1526,7 @@ class ServerApp(JupyterApp):
         """initialize tornado webapp"""
         self.tornado_settings['allow_origin'] = self.allow_origin
         self.tornado_settings['websocket_compression_options'] = self.websocket_compression_options
+        self.tornado_settings['websocket_compression_threshold'] = self.websocket_compression_threshold
         if self.allow_origin_pat:
             self.tornado_settings['allow_origin_pat'] = re.compile(self.allow_origin_pat)
         self.tornado_settings['allow_credentials'] = self.allow_credentials
@@ -1883,6 +1958,15 @@ class ServerApp(JupyterApp):
         self.log.info(kernel_msg % n_kernels)
         run_sync(self.kernel_manager.shutdown_all())
 
+    def cleanup_contents_manager(self):
+        """Release the resources of the contents manager, such as inotify watches.
+
+        Only done for contents managers with a close method, like FileContentsManager.
+        """
+        close = getattr(self.contents_manager, 'close', None)
+        if close is not None:
+            close()
+
     def cleanup_terminals(self):
         """Shutdown all terminals.
 
@@ -2106,6 +2190,9 @@ class ServerApp(JupyterApp):
         self.write_server_info_file()
         self.write_browser_open_files()
 
+        # Start the kernel pool once the loop is running
+        ioloop.IOLoop.current().add_callback(self.kernel_manager.fill_kernel_pool)
+
         # Handle the browser opening.
         if self.open_browser:
             self.launch_browser()
@@ -2129,6 +2216,7 @@ class ServerApp(JupyterApp):
         self.remove_browser_open_files()
         self.cleanup_kernels()
         self.cleanup_terminals()
+        self.cleanup_contents_manager()
 
     def start_ioloop(self):
         """Start the IO Loop."""
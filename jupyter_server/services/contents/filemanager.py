@@ -4,6 +4,7 @@
 # Distributed under the terms of the Modified BSD License.
 
 from datetime import datetime
+from functools import partial
 import errno
 import os
 import shutil
@@ -17,16 +18,20 @@ try:
 except ImportError:
     # fallback on anyio v2 for python version < 3.7
     from anyio import run_sync_in_worker_thread as run_sync
-    
+from anyio import CapacityLimiter
+
 from send2trash import send2trash
 from tornado import web
 
 from .filecheckpoints import AsyncFileCheckpoints, FileCheckpoints
+from .listing import listing_requested, paginate, parse_child_types
+from .metadatacache import ContentsMetadataCache
+from .notebookcache import NotebookCache
 from .fileio import AsyncFileManagerMixin, FileManagerMixin
 from .manager import AsyncContentsManager, ContentsManager
 
 from ipython_genutils.importstring import import_item
-from traitlets import Any, Unicode, Bool, TraitError, observe, default, validate
+from traitlets import Any, Unicode, Bool, Float, Integer, TraitError, observe, default, validate
 
 from jupyter_core.paths import exists, is_hidden, is_file_hidden
 from jupyter_server import _tz as tz
@@ -111,6 +116,95 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
         platform's trash/recycle bin, where they can be recovered. If False,
         deleting files really deletes them.""")
 
+    metadata_cache_size = Integer(0, config=True,
+        help="""The maximum number of entries in a cache of the models without
+        content of files and directories, and of directory listings.
+
+        A model counts as one entry, and a listing as one entry per listed file.
+        Repeated browsing of the same directories then does not stat, check
+        hidden status and build models again, which matters on networked filesystems.
+        Values of 0 or lower disable the cache.""")
+
+    metadata_cache_max_age = Float(30, config=True,
+        help="""The maximum age, in seconds, of the entries of the metadata cache.
+
+        Cached entries are invalidated by inotify on Linux, and otherwise checked
+        against the stat results of their path. Changes that are not noticed this way,
+        like changes made by other hosts on a networked filesystem, or changes to the
+        listed files of a directory without inotify, are noticed after this delay.
+        Values of 0 or lower disable the limit.""")
+
+    metadata_cache_inotify = Bool(True, config=True,
+        help="""Whether to invalidate the metadata cache with inotify, when available.""")
+
+    _metadata_cache = Any()
+
+    @default('_metadata_cache')
+    def _default_metadata_cache(self):
+        if self.metadata_cache_size <= 0:
+            return None
+        return ContentsMetadataCache(
+            max_size=self.metadata_cache_size,
+            max_age=self.metadata_cache_max_age,
+            use_inotify=self.metadata_cache_inotify,
+            log=self.log,
+        )
+
+    notebook_cache_size = Integer(0, config=True,
+        help="""The maximum total size, in bytes, of the notebook files whose
+        parsed, validated and signature-checked content is cached.
+
+        Getting a cached notebook again, as long as its file is unchanged, skips
+        reading, validating and hashing it; only its trust is checked again.
+        Each request gets its own copy of the content.
+        Values of 0 or lower disable the cache.""")
+
+    _notebook_cache = Any()
+
+    @default('_notebook_cache')
+    def _default_notebook_cache(self):
+        if self.notebook_cache_size <= 0:
+            return None
+        return NotebookCache(max_size=self.notebook_cache_size, log=self.log)
+
+    def close(self):
+        """Release the metadata cache, which stops watching directories with inotify
+
+        Called when the server stops.
+        """
+        # not created if it was never used
+        cache = self._trait_values.get('_metadata_cache')
+        if cache is not None:
+            cache.close()
+
+    def _invalidate_caches(self, os_path):
+        """Forget the cached metadata and notebook affected by a change of os_path"""
+        if self._metadata_cache is not None:
+            self._metadata_cache.invalidate(os_path)
+        if self._notebook_cache is not None:
+            self._notebook_cache.discard(os_path)
+
+    def _cache_notebook(self, key, nb):
+        """Compute the signature and validation message of a notebook just read, and cache them
+
+        Returns the (notebook, signature, validation message) to give to _finish_notebook_model.
+        """
+        signature = self.notary.compute_signature(nb)
+        message = self.validate_notebook_model({'content': nb}).get('message')
+        self._notebook_cache.set(key, nb, signature, message)
+        return nb, signature, message
+
+    def _finish_notebook_model(self, model, path, nb, signature, message=None):
+        """Set the content of a notebook model from a cached notebook, marking its trusted cells"""
+        trusted = self.notary.store.check_signature(signature, self.notary.algorithm)
+        if not trusted:
+            self.log.warning("Notebook %s is not trusted", path)
+        self.notary.mark_cells(nb, trusted)
+        model['content'] = nb
+        model['format'] = 'json'
+        if message:
+            model['message'] = message
+
     @default('files_handler_class')
     def _files_handler_class_default(self):
         return AuthenticatedFileHandler
@@ -195,10 +289,15 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
         os_path = self._get_os_path(path=path)
         return exists(os_path)
 
-    def _base_model(self, path):
-        """Build the common base of a contents model"""
-        os_path = self._get_os_path(path)
-        info = os.lstat(os_path)
+    def _base_model(self, path, os_path=None, info=None):
+        """Build the common base of a contents model
+
+        The OS path and lstat result of the path can be given if already known.
+        """
+        if os_path is None:
+            os_path = self._get_os_path(path)
+        if info is None:
+            info = os.lstat(os_path)
 
         try:
             # size of file
@@ -241,13 +340,33 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
             model['writable'] = False
         return model
 
-    def _dir_model(self, path, content=True):
+    def _dir_model(self, path, content=True, **listing):
         """Build a model for a directory
 
-        if content is requested, will include a listing of the directory
+        if content is requested, will include a listing of the directory,
+        or one page of it if listing arguments are given (see get)
         """
         os_path = self._get_os_path(path)
+        cache = self._metadata_cache
+        if cache is None:
+            model = self._dir_base_model(path, os_path)
+        else:
+            model = cache.get_model(os_path)
+            if model is None or model['type'] != 'directory':
+                with cache.fill_model(os_path) as fill:
+                    model = fill.set(self._dir_base_model(path, os_path))
+        if content and listing_requested(**listing):
+            model['content'], model['total'], model['next_cursor'] = \
+                self._list_dir_page(path, os_path, **listing)
+            model['format'] = 'json'
+        elif content:
+            model['content'] = self._list_dir(path, os_path)
+            model['format'] = 'json'
+
+        return model
 
+    def _dir_base_model(self, path, os_path):
+        """Build the model of a directory, without content"""
         four_o_four = u'directory does not exist: %r' % path
 
         if not os.path.isdir(os_path):
@@ -258,53 +377,171 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
             )
             raise web.HTTPError(404, four_o_four)
 
-        model = self._base_model(path)
+        model = self._base_model(path, os_path=os_path)
         model['type'] = 'directory'
         model['size'] = None
-        if content:
-            model['content'] = contents = []
-            os_dir = self._get_os_path(path)
-            for name in os.listdir(os_dir):
-                try:
-                    os_path = os.path.join(os_dir, name)
-                except UnicodeDecodeError as e:
-                    self.log.warning(
-                        "failed to decode filename '%s': %s", name, e)
-                    continue
-
-                try:
-                    st = os.lstat(os_path)
-                except OSError as e:
-                    # skip over broken symlinks in listing
-                    if e.errno == errno.ENOENT:
-                        self.log.warning("%s doesn't exist", os_path)
-                    elif e.errno != errno.EACCES:  # Don't provide clues about protected files
-                        self.log.warning("Error stat-ing %s: %s", os_path, e)
-                    continue
-
-                if (not stat.S_ISLNK(st.st_mode)
-                        and not stat.S_ISREG(st.st_mode)
-                        and not stat.S_ISDIR(st.st_mode)):
-                    self.log.debug("%s not a regular file", os_path)
-                    continue
-
-                try:
-                    if self.should_list(name):
-                        if self.allow_hidden or not is_file_hidden(os_path, stat_res=st):
-                            contents.append(
-                                self.get(path='%s/%s' % (path, name), content=False)
-                            )
-                except OSError as e:
-                    # ELOOP: recursive symlink, also don't show failure due to permissions
-                    if e.errno not in [errno.ELOOP, errno.EACCES]:
-                        self.log.warning(
-                            "Unknown error checking if file %r is hidden",
-                            os_path,
-                            exc_info=True,
-                        )
+        return model
 
-            model['format'] = 'json'
+    def _list_dir(self, path, os_dir):
+        """Build the models, without content, of the entries of a directory
 
+        The directory is read with os.scandir, and the model of each entry
+        is built from a single lstat. The hidden status of the directory
+        itself must have been checked by the caller.
+        """
+        if self._metadata_cache is not None:
+            return [dict(model) for _, _, model in self._cached_dir_listing(path, os_dir)]
+        return [
+            self._dir_entry_model(path, entry, info=info)
+            for entry, info in self._scan_dir(os_dir)
+        ]
+
+    def _scan_dir(self, os_dir):
+        """Read the listed os.DirEntry of a directory, with their _dir_entry_info"""
+        entries = []
+        with os.scandir(os_dir) as it:
+            for entry in it:
+                info = self._dir_entry_info(entry)
+                if info is not None:
+                    entries.append((entry, info))
+        return entries
+
+    def _cached_dir_listing(self, path, os_dir):
+        """Get the listing of a directory from the metadata cache, or build and cache it
+
+        The listing is a list of (lstat result, is_dir, model) tuples,
+        of which the models must be copied before being modified.
+        """
+        cache = self._metadata_cache
+        listing = cache.get_listing(os_dir)
+        if listing is None:
+            with cache.fill_listing(os_dir) as fill:
+                listing = [
+                    (st, is_dir, self._dir_entry_model(path, entry, info=(st, is_dir)))
+                    for entry, (st, is_dir) in self._scan_dir(os_dir)
+                ]
+                fill.set(listing, subdirs=[
+                    os.path.join(os_dir, model['name']) for _, is_dir, model in listing if is_dir
+                ])
+        return listing
+
+    def _list_dir_page(self, path, os_dir, limit=None, cursor=None, offset=None,
+                       sort=None, child_type=None):
+        """Build the models of one page of the entries of a directory
+
+        Entries are filtered and sorted from their lstat results alone,
+        and models are only built for the entries of the page, unless the
+        listing is cached.
+        Returns a (models, total, next_cursor) tuple, see listing.paginate.
+        """
+        child_types = parse_child_types(child_type)
+        if self._metadata_cache is not None:
+            records = [
+                (model['name'], st, is_dir, model)
+                for st, is_dir, model in self._cached_dir_listing(path, os_dir)
+            ]
+        else:
+            records = [
+                (entry.name, st, is_dir, entry)
+                for entry, (st, is_dir) in self._scan_dir(os_dir)
+            ]
+        if child_types is not None:
+            records = [
+                record for record in records
+                if self._dir_entry_type(record[0], record[2]) in child_types
+            ]
+
+        def sort_key(record, field):
+            name, st, is_dir, _ = record
+            if field == 'last_modified':
+                return (st.st_mtime, name)
+            if field == 'size':
+                return (-1 if is_dir else st.st_size, name)
+            return (name,)
+
+        page, total, next_cursor = paginate(
+            records, sort_key, limit=limit, cursor=cursor, offset=offset, sort=sort,
+        )
+        models = [
+            dict(item) if isinstance(item, dict)
+            else self._dir_entry_model(path, item, info=(st, is_dir))
+            for _, st, is_dir, item in page
+        ]
+        return models, total, next_cursor
+
+    def _dir_entry_type(self, name, is_dir):
+        """The model type of a directory entry"""
+        if is_dir:
+            return 'directory'
+        elif name.endswith('.ipynb'):
+            return 'notebook'
+        return 'file'
+
+    def _dir_entry_info(self, entry):
+        """Check whether an os.DirEntry is listed
+
+        Returns its (lstat result, is_dir) tuple, or None if the entry is not listed.
+        """
+        name = entry.name
+        os_path = entry.path
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError as e:
+            # skip over entries removed since the directory was read
+            if e.errno == errno.ENOENT:
+                self.log.warning("%s doesn't exist", os_path)
+            elif e.errno != errno.EACCES:  # Don't provide clues about protected files
+                self.log.warning("Error stat-ing %s: %s", os_path, e)
+            return None
+
+        if (not stat.S_ISLNK(st.st_mode)
+                and not stat.S_ISREG(st.st_mode)
+                and not stat.S_ISDIR(st.st_mode)):
+            self.log.debug("%s not a regular file", os_path)
+            return None
+
+        try:
+            if not self.should_list(name):
+                return None
+            if not self.allow_hidden and is_file_hidden(os_path, stat_res=st):
+                return None
+        except OSError as e:
+            # ELOOP: recursive symlink, also don't show failure due to permissions
+            if e.errno not in [errno.ELOOP, errno.EACCES]:
+                self.log.warning(
+                    "Unknown error checking if file %r is hidden",
+                    os_path,
+                    exc_info=True,
+                )
+            return None
+
+        try:
+            # follows symlinks, like os.path.isdir
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        return st, is_dir
+
+    def _dir_entry_model(self, path, entry, info=None):
+        """Build the model, without content, of an os.DirEntry of the directory at path
+
+        The model is the same as the one returned by get(content=False).
+        The result of _dir_entry_info can be given if already known.
+        Returns None if the entry is not listed.
+        """
+        if info is None:
+            info = self._dir_entry_info(entry)
+            if info is None:
+                return None
+        st, is_dir = info
+
+        child_path = ('%s/%s' % (path, entry.name)).strip('/')
+        model = self._base_model(child_path, os_path=entry.path, info=st)
+        model['type'] = self._dir_entry_type(entry.name, is_dir)
+        if is_dir:
+            model['size'] = None
+        elif model['type'] == 'file':
+            model['mimetype'] = mimetypes.guess_type(entry.path)[0]
         return model
 
     def _file_model(self, path, content=True, format=None):
@@ -343,22 +580,47 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
         """Build a notebook model
 
         if content is requested, the notebook content will be populated
-        as a JSON structure (not double-serialized)
+        as a JSON structure (not double-serialized), from the notebook
+        cache if it holds the current version of the file
         """
         model = self._base_model(path)
         model['type'] = 'notebook'
         os_path = self._get_os_path(path)
 
         if content:
-            nb = self._read_notebook(os_path, as_version=4)
-            self.mark_trusted_cells(nb, path)
-            model['content'] = nb
-            model['format'] = 'json'
-            self.validate_notebook_model(model)
+            cache = self._notebook_cache
+            key = cache.key(os_path) if cache is not None else None
+            cached = cache.get(key) if key is not None else None
+            if cached is not None:
+                self._finish_notebook_model(model, path, *cached)
+            elif key is not None:
+                nb = self._read_notebook(os_path, as_version=4)
+                self._finish_notebook_model(model, path, *self._cache_notebook(key, nb))
+            else:
+                nb = self._read_notebook(os_path, as_version=4)
+                self.mark_trusted_cells(nb, path)
+                model['content'] = nb
+                model['format'] = 'json'
+                self.validate_notebook_model(model)
 
         return model
 
-    def get(self, path, content=True, type=None, format=None):
+    def _cached_model(self, path):
+        """Get the model without content of a path from the metadata cache, or build and cache it"""
+        cache = self._metadata_cache
+        os_path = self._get_os_path(path)
+        model = cache.get_model(os_path)
+        if model is not None:
+            return model
+        if os.path.isdir(os_path):
+            # cached by _dir_model
+            return self._dir_model(path, content=False)
+        with cache.fill_model(os_path) as fill:
+            type = 'notebook' if path.endswith('.ipynb') else 'file'
+            return fill.set(self.get(path, content=False, type=type))
+
+    def get(self, path, content=True, type=None, format=None,
+            limit=None, cursor=None, offset=None, sort=None, child_type=None):
         """ Takes a path for an entity and returns its model
 
         Parameters
@@ -373,14 +635,30 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
         format : str, optional
             The requested format for file contents. 'text' or 'base64'.
             Ignored if this returns a notebook or directory model.
+        limit : int, optional
+            The maximum number of entries in the listing of a directory.
+        cursor : str, optional
+            The 'next_cursor' of the previous page of the listing.
+        offset : int, optional
+            The number of entries to skip in the listing, instead of a cursor.
+        sort : str, optional
+            The sort order of the listing: 'name', 'last_modified' or 'size',
+            prefixed with '-' for a descending order.
+        child_type : str, optional
+            The comma-separated types of the entries to list.
 
         Returns
         -------
         model : dict
             the contents model. If content=True, returns the contents
-            of the file or directory as well.
+            of the file or directory as well. If listing arguments are given,
+            a directory model contains one page of the listing, the 'total'
+            number of entries and the 'next_cursor' of the next page.
         """
+        listing = dict(limit=limit, cursor=cursor, offset=offset, sort=sort, child_type=child_type)
         path = path.strip('/')
+        if self._metadata_cache is not None and not content and type is None:
+            return self._cached_model(path)
 
         if not self.exists(path):
             raise web.HTTPError(404, u'No such file or directory: %s' % path)
@@ -390,7 +668,7 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
             if type not in (None, 'directory'):
                 raise web.HTTPError(400,
                                 u'%s is a directory, not a %s' % (path, type), reason='bad type')
-            model = self._dir_model(path, content=content)
+            model = self._dir_model(path, content=content, **listing)
         elif type == 'notebook' or (type is None and path.endswith('.ipynb')):
             model = self._notebook_model(path, content=content)
         else:
@@ -447,6 +725,8 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
             self.log.error(u'Error while saving file: %s %s', path, e, exc_info=True)
             raise web.HTTPError(500, u'Unexpected error while saving file: %s %s'
                                 % (path, e)) from e
+        finally:
+            self._invalidate_caches(os_path)
 
         validation_message = None
         if model['type'] == 'notebook':
@@ -501,6 +781,7 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
                 # raises let us distinguish permission errors from other errors in
                 # code. So for now, just let them all get logged as server errors.
                 send2trash(os_path)
+                self._invalidate_caches(os_path)
                 return
             else:
                 self.log.warning("Skipping trash for %s, on different device "
@@ -517,6 +798,7 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
             self.log.debug("Unlinking file %s", os_path)
             with self.perm_to_403():
                 rm(os_path)
+        self._invalidate_caches(os_path)
 
     def rename_file(self, old_path, new_path):
         """Rename a file."""
@@ -541,6 +823,9 @@ class FileContentsManager(FileManagerMixin, ContentsManager):
         except Exception as e:
             raise web.HTTPError(500, u'Unknown error renaming file: %s %s' %
                                 (old_path, e)) from e
+        finally:
+            self._invalidate_caches(old_os_path)
+            self._invalidate_caches(new_os_path)
 
     def info_string(self):
         return _i18n("Serving notebooks from local directory: %s") % self.root_dir
@@ -560,72 +845,28 @@ class AsyncFileContentsManager(FileContentsManager, AsyncFileManagerMixin, Async
     def _checkpoints_class_default(self):
         return AsyncFileCheckpoints
 
-    async def _dir_model(self, path, content=True):
-        """Build a model for a directory
-
-        if content is requested, will include a listing of the directory
-        """
-        os_path = self._get_os_path(path)
+    dir_listing_threads = Integer(4, config=True,
+        help="""The maximum number of directories listed at once.
 
-        four_o_four = u'directory does not exist: %r' % path
-
-        if not os.path.isdir(os_path):
-            raise web.HTTPError(404, four_o_four)
-        elif is_hidden(os_path, self.root_dir) and not self.allow_hidden:
-            self.log.info("Refusing to serve hidden directory %r, via 404 Error",
-                os_path
-            )
-            raise web.HTTPError(404, four_o_four)
+        Each directory is listed in a single worker thread, and these threads
+        are limited separately from the other file operations, so that large
+        listings neither block the event loop nor exhaust the default thread pool.""")
 
-        model = self._base_model(path)
-        model['type'] = 'directory'
-        model['size'] = None
-        if content:
-            model['content'] = contents = []
-            os_dir = self._get_os_path(path)
-            dir_contents = await run_sync(os.listdir, os_dir)
-            for name in dir_contents:
-                try:
-                    os_path = os.path.join(os_dir, name)
-                except UnicodeDecodeError as e:
-                    self.log.warning(
-                        "failed to decode filename '%s': %s", name, e)
-                    continue
-
-                try:
-                    st = await run_sync(os.lstat, os_path)
-                except OSError as e:
-                    # skip over broken symlinks in listing
-                    if e.errno == errno.ENOENT:
-                        self.log.warning("%s doesn't exist", os_path)
-                    elif e.errno != errno.EACCES:  # Don't provide clues about protected files
-                        self.log.warning("Error stat-ing %s: %s", os_path, e)
-                    continue
-
-                if (not stat.S_ISLNK(st.st_mode)
-                        and not stat.S_ISREG(st.st_mode)
-                        and not stat.S_ISDIR(st.st_mode)):
-                    self.log.debug("%s not a regular file", os_path)
-                    continue
-
-                try:
-                    if self.should_list(name):
-                        if self.allow_hidden or not is_file_hidden(os_path, stat_res=st):
-                            contents.append(
-                                    await self.get(path='%s/%s' % (path, name), content=False)
-                        )
-                except OSError as e:
-                    # ELOOP: recursive symlink, also don't show failure due to permissions
-                    if e.errno not in [errno.ELOOP, errno.EACCES]:
-                        self.log.warning(
-                            "Unknown error checking if file %r is hidden",
-                            os_path,
-                            exc_info=True,
-                        )
+    _dir_listing_limiter = None
 
-            model['format'] = 'json'
+    async def _dir_model(self, path, content=True, **listing):
+        """Build a model for a directory
 
-        return model
+        if content is requested, will include a listing of the directory,
+        or one page of it if listing arguments are given (see get).
+        The whole model is built in a single worker thread.
+        """
+        if self._dir_listing_limiter is None:
+            self._dir_listing_limiter = CapacityLimiter(max(self.dir_listing_threads, 1))
+        return await run_sync(
+            partial(FileContentsManager._dir_model, self, path, content=content, **listing),
+            limiter=self._dir_listing_limiter,
+        )
 
     async def _file_model(self, path, content=True, format=None):
         """Build a model for a file
@@ -663,22 +904,47 @@ class AsyncFileContentsManager(FileContentsManager, AsyncFileManagerMixin, Async
         """Build a notebook model
 
         if content is requested, the notebook content will be populated
-        as a JSON structure (not double-serialized)
+        as a JSON structure (not double-serialized), from the notebook
+        cache if it holds the current version of the file
         """
         model = self._base_model(path)
         model['type'] = 'notebook'
         os_path = self._get_os_path(path)
 
         if content:
-            nb = await self._read_notebook(os_path, as_version=4)
-            self.mark_trusted_cells(nb, path)
-            model['content'] = nb
-            model['format'] = 'json'
-            self.validate_notebook_model(model)
+            cache = self._notebook_cache
+            key = cache.key(os_path) if cache is not None else None
+            cached = cache.get(key) if key is not None else None
+            if cached is not None:
+                self._finish_notebook_model(model, path, *cached)
+            elif key is not None:
+                nb = await self._read_notebook(os_path, as_version=4)
+                self._finish_notebook_model(model, path, *self._cache_notebook(key, nb))
+            else:
+                nb = await self._read_notebook(os_path, as_version=4)
+                self.mark_trusted_cells(nb, path)
+                model['content'] = nb
+                model['format'] = 'json'
+                self.validate_notebook_model(model)
 
         return model
 
-    async def get(self, path, content=True, type=None, format=None):
+    async def _cached_model(self, path):
+        """Get the model without content of a path from the metadata cache, or build and cache it"""
+        cache = self._metadata_cache
+        os_path = self._get_os_path(path)
+        model = cache.get_model(os_path)
+        if model is not None:
+            return model
+        if os.path.isdir(os_path):
+            # cached by _dir_model
+            return await self._dir_model(path, content=False)
+        with cache.fill_model(os_path) as fill:
+            type = 'notebook' if path.endswith('.ipynb') else 'file'
+            return fill.set(await self.get(path, content=False, type=type))
+
+    async def get(self, path, content=True, type=None, format=None,
+            limit=None, cursor=None, offset=None, sort=None, child_type=None):
         """ Takes a path for an entity and returns its model
 
         Parameters
@@ -693,14 +959,30 @@ class AsyncFileContentsManager(FileContentsManager, AsyncFileManagerMixin, Async
         format : str, optional
             The requested format for file contents. 'text' or 'base64'.
             Ignored if this returns a notebook or directory model.
+        limit : int, optional
+            The maximum number of entries in the listing of a directory.
+        cursor : str, optional
+            The 'next_cursor' of the previous page of the listing.
+        offset : int, optional
+            The number of entries to skip in the listing, instead of a cursor.
+        sort : str, optional
+            The sort order of the listing: 'name', 'last_modified' or 'size',
+            prefixed with '-' for a descending order.
+        child_type : str, optional
+            The comma-separated types of the entries to list.
 
         Returns
         -------
         model : dict
             the contents model. If content=True, returns the contents
-            of the file or directory as well.
+            of the file or directory as well. If listing arguments are given,
+            a directory model contains one page of the listing, the 'total'
+            number of entries and the 'next_cursor' of the next page.
         """
+        listing = dict(limit=limit, cursor=cursor, offset=offset, sort=sort, child_type=child_type)
         path = path.strip('/')
+        if self._metadata_cache is not None and not content and type is None:
+            return await self._cached_model(path)
 
         if not self.exists(path):
             raise web.HTTPError(404, u'No such file or directory: %s' % path)
@@ -710,7 +992,7 @@ class AsyncFileContentsManager(FileContentsManager, AsyncFileManagerMixin, Async
             if type not in (None, 'directory'):
                 raise web.HTTPError(400,
                                 u'%s is a directory, not a %s' % (path, type), reason='bad type')
-            model = await self._dir_model(path, content=content)
+            model = await self._dir_model(path, content=content, **listing)
         elif type == 'notebook' or (type is None and path.endswith('.ipynb')):
             model = await self._notebook_model(path, content=content)
         else:
@@ -767,6 +1049,8 @@ class AsyncFileContentsManager(FileContentsManager, AsyncFileManagerMixin, Async
             self.log.error(u'Error while saving file: %s %s', path, e, exc_info=True)
             raise web.HTTPError(500, u'Unexpected error while saving file: %s %s'
                                 % (path, e)) from e
+        finally:
+            self._invalidate_caches(os_path)
 
         validation_message = None
         if model['type'] == 'notebook':
@@ -822,6 +1106,7 @@ class AsyncFileContentsManager(FileContentsManager, AsyncFileManagerMixin, Async
                 # raises let us distinguish permission errors from other errors in
                 # code. So for now, just let them all get logged as server errors.
                 send2trash(os_path)
+                self._invalidate_caches(os_path)
                 return
             else:
                 self.log.warning("Skipping trash for %s, on different device "
@@ -838,6 +1123,7 @@ class AsyncFileContentsManager(FileContentsManager, AsyncFileManagerMixin, Async
             self.log.debug("Unlinking file %s", os_path)
             with self.perm_to_403():
                 await run_sync(rm, os_path)
+        self._invalidate_caches(os_path)
 
     async def rename_file(self, old_path, new_path):
         """Rename a file."""
@@ -862,3 +1148,6 @@ class AsyncFileContentsManager(FileContentsManager, AsyncFileManagerMixin, Async
         except Exception as e:
             raise web.HTTPError(500, u'Unknown error renaming file: %s %s' %
                                 (old_path, e)) from e
+        finally:
+            self._invalidate_caches(old_os_path)
+            self._invalidate_caches(new_os_path)
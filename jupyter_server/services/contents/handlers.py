@@ -6,12 +6,9 @@ Preliminary documentation at https://github.com/ipython/ipython/wiki/IPEP-27%3A-
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 
-import json
-
 from tornado import web
 
 from jupyter_server.utils import url_path_join, url_escape, ensure_async
-from jupyter_client.jsonutil import date_default
 
 from jupyter_server.base.handlers import (
     JupyterHandler, APIHandler, path_regex,
@@ -85,14 +82,15 @@ class ContentsHandler(APIHandler):
             self.set_header('Location', location)
         self.set_header('Last-Modified', model['last_modified'])
         self.set_header('Content-Type', 'application/json')
-        self.finish(json.dumps(model, default=date_default))
+        self.finish(self.json_serializer.dumps(model))
 
     @web.authenticated
     async def get(self, path=''):
         """Return a model for a file or directory.
 
         A directory model contains a list of models (without content)
-        of the files and directories it contains.
+        of the files and directories it contains. The limit, cursor, offset,
+        sort and child_type arguments select one page of this list.
         """
         path = path or ''
         type = self.get_query_argument('type', default=None)
@@ -107,8 +105,23 @@ class ContentsHandler(APIHandler):
             raise web.HTTPError(400, u'Content %r is invalid' % content)
         content = int(content)
 
+        # only given to the contents manager when requested,
+        # so that contents managers without listing pages keep working
+        listing = {}
+        for name in ('limit', 'offset'):
+            value = self.get_query_argument(name, default=None)
+            if value is not None:
+                try:
+                    listing[name] = int(value)
+                except ValueError:
+                    raise web.HTTPError(400, u'%s %r is invalid' % (name.capitalize(), value))
+        for name in ('cursor', 'sort', 'child_type'):
+            value = self.get_query_argument(name, default=None)
+            if value is not None:
+                listing[name] = value
+
         model = await ensure_async(self.contents_manager.get(
-            path=path, type=type, format=format, content=content,
+            path=path, type=type, format=format, content=content, **listing
         ))
         validate_model(model, expect_content=content)
         self._finish_model(model, location=False)
@@ -238,7 +251,7 @@ class CheckpointsHandler(APIHandler):
         """get lists checkpoints for a file"""
         cm = self.contents_manager
         checkpoints = await ensure_async(cm.list_checkpoints(path))
-        data = json.dumps(checkpoints, default=date_default)
+        data = self.json_serializer.dumps(checkpoints)
         self.finish(data)
 
     @web.authenticated
@@ -246,7 +259,7 @@ class CheckpointsHandler(APIHandler):
         """post creates a new checkpoint"""
         cm = self.contents_manager
         checkpoint = await ensure_async(cm.create_checkpoint(path))
-        data = json.dumps(checkpoint, default=date_default)
+        data = self.json_serializer.dumps(checkpoint)
         location = url_path_join(self.base_url, 'api/contents',
             url_escape(path), 'checkpoints', url_escape(checkpoint['id']))
         self.set_header('Location', location)
@@ -42,6 +42,8 @@ class LargeFileManager(FileContentsManager):
                 self.log.error(u'Error while saving file: %s %s', path, e, exc_info=True)
                 raise web.HTTPError(500, u'Unexpected error while saving file: %s %s' %
                                     (path, e)) from e
+            finally:
+                self._invalidate_caches(os_path)
 
             model = self.get(path, content=False)
 
@@ -108,6 +110,8 @@ class AsyncLargeFileManager(AsyncFileContentsManager):
                 self.log.error(u'Error while saving file: %s %s', path, e, exc_info=True)
                 raise web.HTTPError(500, u'Unexpected error while saving file: %s %s' %
                                     (path, e)) from e
+            finally:
+                self._invalidate_caches(os_path)
 
             model = await self.get(path, content=False)
 
@@ -0,0 +1,124 @@
+"""Paging, sorting and filtering of directory listings."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import base64
+import json
+from operator import itemgetter
+
+from tornado.web import HTTPError
+
+
+SORT_FIELDS = ('name', 'last_modified', 'size')
+
+CHILD_TYPES = ('directory', 'file', 'notebook')
+
+
+def listing_requested(limit=None, cursor=None, offset=None, sort=None, child_type=None):
+    """Whether any of the listing arguments of ContentsManager.get is given"""
+    return any(arg is not None for arg in (limit, cursor, offset, sort, child_type))
+
+
+def parse_sort(sort):
+    """Parse a sort argument into a (field, reverse) tuple
+
+    The argument is one of SORT_FIELDS, prefixed with '-' for a descending order.
+    Listings are sorted by name by default.
+    """
+    if sort is None:
+        return 'name', False
+    reverse = sort.startswith('-')
+    field = sort[1:] if reverse else sort
+    if field not in SORT_FIELDS:
+        raise HTTPError(400, u'Sort %r is invalid' % sort)
+    return field, reverse
+
+
+def parse_child_types(child_type):
+    """Parse a comma-separated child_type argument into a set of types, or None for all"""
+    if child_type is None:
+        return None
+    types = set(t.strip() for t in child_type.split(','))
+    invalid = types.difference(CHILD_TYPES)
+    if invalid:
+        raise HTTPError(400, u'Child type %r is invalid' % ','.join(sorted(invalid)))
+    return types
+
+
+def encode_cursor(sort, key):
+    """Encode the sort key of the last entry of a page as an opaque cursor"""
+    data = json.dumps({'sort': sort, 'key': list(key)}).encode('utf8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(sort, cursor):
+    """Decode a cursor made by encode_cursor for the same sort argument"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf8'))
+        key = tuple(data['key'])
+        cursor_sort = data['sort']
+    except Exception:
+        raise HTTPError(400, u'Cursor %r is invalid' % cursor)
+    if cursor_sort != sort:
+        raise HTTPError(400, u'Cursor %r was not made for sort %r' % (cursor, sort))
+    return key
+
+
+def paginate(items, sort_key, limit=None, cursor=None, offset=None, sort=None):
+    """Sort a list of directory entries and return one page of it
+
+    Parameters
+    ----------
+    items : list
+        The entries of the directory, already filtered.
+    sort_key : callable
+        Called as sort_key(item, field) with a field of SORT_FIELDS. Must return
+        a JSON-serializable tuple, unique in the directory (e.g. ending with the name).
+    limit : int, optional
+        The maximum number of entries in the page.
+    cursor : str, optional
+        The next_cursor of the previous page. The page starts after the entry
+        the cursor was made for, even if entries were added or removed since.
+    offset : int, optional
+        The number of entries to skip. Can not be combined with a cursor.
+    sort : str, optional
+        The sort argument, see parse_sort.
+
+    Returns
+    -------
+    (page, total, next_cursor) : tuple
+        The entries of the page, the number of entries in the whole listing,
+        and the cursor of the next page, or None on the last page.
+    """
+    field, reverse = parse_sort(sort)
+    if limit is not None and limit < 1:
+        raise HTTPError(400, u'Limit %r is invalid' % limit)
+    if offset is not None and offset < 0:
+        raise HTTPError(400, u'Offset %r is invalid' % offset)
+    if cursor is not None and offset is not None:
+        raise HTTPError(400, u'Cursor and offset can not be combined')
+
+    keyed = sorted(
+        ((sort_key(item, field), item) for item in items),
+        key=itemgetter(0), reverse=reverse,
+    )
+    total = len(keyed)
+
+    start = offset or 0
+    if cursor is not None:
+        after = decode_cursor(sort, cursor)
+        try:
+            if reverse:
+                start = next((i for i, (key, _) in enumerate(keyed) if key < after), total)
+            else:
+                start = next((i for i, (key, _) in enumerate(keyed) if key > after), total)
+        except TypeError:
+            raise HTTPError(400, u'Cursor %r is invalid' % cursor)
+
+    end = total if limit is None else min(start + limit, total)
+    page = keyed[start:end]
+    next_cursor = None
+    if page and end < total:
+        next_cursor = encode_cursor(sort, page[-1][0])
+    return [item for _, item in page], total, next_cursor
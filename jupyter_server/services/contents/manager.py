@@ -251,8 +251,17 @@ class ContentsManager(LoggingConfigurable):
         """
         return self.file_exists(path) or self.dir_exists(path)
 
-    def get(self, path, content=True, type=None, format=None):
-        """Get a file or directory model."""
+    def get(self, path, content=True, type=None, format=None,
+            limit=None, cursor=None, offset=None, sort=None, child_type=None):
+        """Get a file or directory model.
+
+        The listing arguments (limit, cursor, offset, sort and child_type)
+        only apply to directory models with content. When any of them is given,
+        the content of the model is one page of the listing, and the model
+        has two additional keys: 'total', the number of entries in the whole
+        listing, and 'next_cursor', the cursor of the next page or None.
+        See jupyter_server.services.contents.listing.
+        """
         raise NotImplementedError('must be implemented in a subclass')
 
     def save(self, model, path):
@@ -630,8 +639,17 @@ class AsyncContentsManager(ContentsManager):
         """
         return await (ensure_async(self.file_exists(path)) or ensure_async(self.dir_exists(path)))
 
-    async def get(self, path, content=True, type=None, format=None):
-        """Get a file or directory model."""
+    async def get(self, path, content=True, type=None, format=None,
+            limit=None, cursor=None, offset=None, sort=None, child_type=None):
+        """Get a file or directory model.
+
+        The listing arguments (limit, cursor, offset, sort and child_type)
+        only apply to directory models with content. When any of them is given,
+        the content of the model is one page of the listing, and the model
+        has two additional keys: 'total', the number of entries in the whole
+        listing, and 'next_cursor', the cursor of the next page or None.
+        See jupyter_server.services.contents.listing.
+        """
         raise NotImplementedError('must be implemented in a subclass')
 
     async def save(self, model, path):
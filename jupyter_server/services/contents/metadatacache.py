@@ -0,0 +1,407 @@
+"""A cache of contents models without content and of directory listings.
+
+Cached entries are invalidated by inotify on Linux, and otherwise checked
+against the stat results of their path when they are used.
+"""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+import time
+
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# events changing the entries, and thus the mtime, of a directory
+IN_ENTRIES = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# events after which a watched directory is gone
+IN_GONE = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_ENTRIES | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+_event_header = struct.Struct('iIII')
+
+
+class Inotify(object):
+    """A non-blocking inotify instance, watching directories"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, os_dir):
+        """Watch a directory, and return its watch descriptor"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(os_dir), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), os_dir)
+        return wd
+
+    def rm_watch(self, wd):
+        """Stop watching a directory. Errors are ignored, the watch may be gone already."""
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Read the pending events, as a list of (wd, mask, name) tuples"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _event_header.unpack_from(data, offset)
+                offset += _event_header.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _stamp(st):
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+class _Entry(object):
+    __slots__ = ('value', 'size', 'dirs', 'stamp', 'watched', 'time')
+
+
+class _Fill(object):
+    """The value being built for a cache key, see ContentsMetadataCache.fill_model"""
+
+    def __init__(self, key, os_path, stat, dirs, generations, watched):
+        self.key = key
+        self.os_path = os_path
+        self.stat = stat
+        self.dirs = dirs
+        self.generations = generations
+        self.watched = watched
+        self.stamp = None
+        self.value = None
+        self.subdirs = ()
+
+    def set(self, value, subdirs=()):
+        """Set the built value, and return it"""
+        self.value = value
+        self.subdirs = tuple(subdirs)
+        return value
+
+
+class ContentsMetadataCache(object):
+    """An LRU cache of contents models and directory listings, by OS path
+
+    Models are the models without content of files and directories, and are
+    returned as copies. Listings are lists built by the contents manager,
+    which must not be modified.
+
+    On Linux, the parent directory of each cached path, and each cached
+    directory with its subdirectories, is watched with inotify: any change
+    reported there invalidates the affected models and listings. Where
+    inotify is not available, models are checked against the lstat result
+    of their path, and listings against the stat result of their directory,
+    which does not show changes to the listed files themselves.
+    max_age bounds the time during which such changes can go unnoticed.
+
+    The contents manager calls invalidate after changing a path itself.
+    """
+
+    def __init__(self, max_size, max_age=0, use_inotify=True, log=None):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.log = log
+        self.size = 0
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        # directories used by cached entries or fills, with their reference
+        # counts and a generation, increased on each change of the directory
+        self._refs = {}
+        self._generations = {}
+        self._watches = {}
+        self._watched_dirs = {}
+        self._inotify = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self._inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                if log:
+                    log.warning("inotify is not available, checking cached contents by stat: %s", e)
+
+    @property
+    def uses_inotify(self):
+        return self._inotify is not None
+
+    def get_model(self, os_path):
+        """Return a copy of the cached model of a path, or None"""
+        model = self._get(('model', os_path), os.lstat)
+        return None if model is None else dict(model)
+
+    def get_listing(self, os_dir):
+        """Return the cached listing of a directory, or None"""
+        return self._get(('listing', os_dir), os.stat)
+
+    @contextmanager
+    def fill_model(self, os_path):
+        """Build the model of a path, and cache it on exit
+
+        The model is given to the set method of the yielded object,
+        and a copy of it is cached, unless the path was changed meanwhile.
+        The directories the model depends on are watched before it is built.
+        """
+        fill = self._begin(('model', os_path), os_path, os.lstat, (os.path.dirname(os_path),))
+        try:
+            yield fill
+        except BaseException:
+            fill.value = None
+            raise
+        finally:
+            with self._lock:
+                if fill.value is not None:
+                    if fill.value.get('type') == 'directory':
+                        fill.subdirs = (os_path,)
+                    fill.value = dict(fill.value)
+                self._end(fill)
+
+    @contextmanager
+    def fill_listing(self, os_dir):
+        """Build the listing of a directory, and cache it on exit
+
+        The listing and the OS paths of the listed directories are given
+        to the set method of the yielded object. The listing is cached
+        as it is, unless the directory was changed meanwhile.
+        """
+        fill = self._begin(('listing', os_dir), os_dir, os.stat, (os_dir,))
+        try:
+            yield fill
+        except BaseException:
+            fill.value = None
+            raise
+        finally:
+            with self._lock:
+                self._end(fill)
+
+    def invalidate(self, os_path):
+        """Forget the cached models and listings affected by a change of a path
+
+        This is the path itself with its subtree, its parent directory,
+        and the listing of its grandparent directory.
+        """
+        parent = os.path.dirname(os_path)
+        grandparent = os.path.dirname(parent)
+        with self._lock:
+            self._read_events()
+            self._remove_tree(os_path)
+            self._remove(('model', parent))
+            self._remove(('listing', parent))
+            self._remove(('listing', grandparent))
+            # so that models being built meanwhile are not cached
+            for os_dir in self._generations:
+                if (os_dir in (parent, grandparent, os_path)
+                        or os_dir.startswith(os_path + os.sep)):
+                    self._generations[os_dir] += 1
+
+    def clear(self):
+        """Forget all the cached models and listings"""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def close(self):
+        """Forget all the cached models and listings, and stop watching directories"""
+        with self._lock:
+            self.clear()
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+                self._watches.clear()
+                self._watched_dirs.clear()
+
+    def _get(self, key, stat):
+        with self._lock:
+            self._read_events()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._is_valid(entry, key[1], stat):
+                self._entries.move_to_end(key)
+                return entry.value
+            self._remove(key)
+            return None
+
+    def _is_valid(self, entry, os_path, stat):
+        if self.max_age > 0 and time.monotonic() - entry.time > self.max_age:
+            return False
+        if entry.watched:
+            return True
+        try:
+            return _stamp(stat(os_path)) == entry.stamp
+        except OSError:
+            return False
+
+    def _begin(self, key, os_path, stat, dirs):
+        with self._lock:
+            self._read_events()
+            watched = self._pin(dirs)
+            generations = [self._generations[os_dir] for os_dir in dirs]
+        fill = _Fill(key, os_path, stat, dirs, generations, watched)
+        try:
+            # taken before the value is built, so that changes made meanwhile show
+            fill.stamp = _stamp(stat(os_path))
+        except OSError:
+            pass
+        return fill
+
+    def _end(self, fill):
+        self._read_events()
+        dirs = fill.dirs + tuple(d for d in fill.subdirs if d not in fill.dirs)
+        watched = self._pin(dirs[len(fill.dirs):]) and fill.watched
+        changed = [self._generations[os_dir] for os_dir in fill.dirs] != fill.generations
+        size = 1 + (len(fill.value) if fill.key[0] == 'listing' and fill.value else 0)
+        if fill.value is None or fill.stamp is None or changed or size > self.max_size:
+            self._unpin(dirs)
+            return
+        if fill.key[0] == 'model' and fill.subdirs:
+            # a directory changed before it was watched
+            try:
+                current = _stamp(fill.stat(fill.os_path))
+            except OSError:
+                current = None
+            if current != fill.stamp:
+                self._unpin(dirs)
+                return
+
+        self._remove(fill.key)
+        entry = _Entry()
+        entry.value = fill.value
+        entry.size = size
+        entry.dirs = dirs
+        entry.stamp = fill.stamp
+        entry.watched = watched
+        entry.time = time.monotonic()
+        self._entries[fill.key] = entry
+        self.size += size
+        while self.size > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+            self._unpin(entry.dirs)
+
+    def _remove_tree(self, os_path):
+        prefix = os_path + os.sep
+        for key in list(self._entries):
+            if key[1] == os_path or key[1].startswith(prefix):
+                self._remove(key)
+
+    def _pin(self, dirs):
+        """Reference directories, and watch them. Return whether they are all watched."""
+        watched = self._inotify is not None
+        for os_dir in dirs:
+            if os_dir not in self._refs:
+                self._refs[os_dir] = 0
+                self._generations[os_dir] = 0
+            self._refs[os_dir] += 1
+            if self._inotify is None:
+                continue
+            if os_dir not in self._watches:
+                try:
+                    wd = self._inotify.add_watch(os_dir)
+                except OSError as e:
+                    # e.g. ENOSPC when out of watches, or a directory removed meanwhile
+                    if self.log:
+                        self.log.debug("Not watching %s: %s", os_dir, e)
+                    watched = False
+                    continue
+                self._watches[os_dir] = wd
+                self._watched_dirs.setdefault(wd, set()).add(os_dir)
+        return watched
+
+    def _unpin(self, dirs):
+        for os_dir in dirs:
+            self._refs[os_dir] -= 1
+            if self._refs[os_dir] > 0:
+                continue
+            del self._refs[os_dir]
+            del self._generations[os_dir]
+            self._unwatch(os_dir)
+
+    def _unwatch(self, os_dir, removed=False):
+        wd = self._watches.pop(os_dir, None)
+        if wd is None:
+            return
+        # a directory can be watched by several paths, e.g. through symlinks
+        others = self._watched_dirs[wd]
+        others.discard(os_dir)
+        if not others:
+            del self._watched_dirs[wd]
+            if not removed:
+                self._inotify.rm_watch(wd)
+
+    def _read_events(self):
+        if self._inotify is None:
+            return
+        for wd, mask, name in self._inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                if self.log:
+                    self.log.debug("inotify queue overflow, clearing the contents cache")
+                self.clear()
+                for os_dir in self._generations:
+                    self._generations[os_dir] += 1
+                continue
+            for os_dir in list(self._watched_dirs.get(wd, ())):
+                self._changed(os_dir, name, mask)
+                if mask & IN_IGNORED:
+                    self._unwatch(os_dir, removed=True)
+
+    def _changed(self, os_dir, name, mask):
+        """Forget the cached models and listings affected by an inotify event in a directory"""
+        if os_dir in self._generations:
+            self._generations[os_dir] += 1
+        if name:
+            os_path = os.path.join(os_dir, name)
+            self._remove(('model', os_path))
+            self._remove(('listing', os_dir))
+            if mask & IN_ENTRIES:
+                if mask & IN_ISDIR:
+                    self._remove_tree(os_path)
+                # the mtime of the directory changed
+                self._remove(('model', os_dir))
+                self._remove(('listing', os.path.dirname(os_dir)))
+        else:
+            if mask & IN_GONE:
+                self._remove_tree(os_dir)
+                if os_dir in self._watches and not mask & IN_IGNORED:
+                    # the watch follows the moved directory, not its former path
+                    self._inotify.rm_watch(self._watches[os_dir])
+            self._remove(('model', os_dir))
+            self._remove(('listing', os.path.dirname(os_dir)))
@@ -0,0 +1,93 @@
+"""A cache of parsed and validated notebooks."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from collections import OrderedDict
+import os
+import threading
+
+
+def copy_notebook(obj):
+    """Copy a notebook, copying its dicts and lists but sharing their immutable leaves
+
+    Much faster than copy.deepcopy for the JSON structure of notebooks.
+    NotebookNode.__setitem__ is bypassed, its values are NotebookNodes already.
+    """
+    if isinstance(obj, dict):
+        new = obj.__class__()
+        dict.update(new, ((key, copy_notebook(value)) for key, value in obj.items()))
+        return new
+    if isinstance(obj, list):
+        return [copy_notebook(value) for value in obj]
+    return obj
+
+
+class NotebookCache(object):
+    """An LRU cache of notebooks read from files, with their signature and validation message
+
+    Entries are keyed by the OS path, inode, size and mtime of the notebook
+    file, so that a changed file is read again. Only the latest version of
+    each path is kept, and the total size of the cached notebook files is
+    bounded by max_size bytes.
+
+    The signature is cached rather than the trust of the notebook, which
+    must still be checked against the notary's signature store, as notebooks
+    can be trusted without being changed.
+    """
+
+    def __init__(self, max_size, log=None):
+        self.max_size = max_size
+        self.log = log
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys = {}
+
+    def key(self, os_path):
+        """The cache key of the current version of a notebook file, or None if it can't be stat-ed
+
+        The key must be taken before reading the file, so that a change made
+        while it is read can't be cached under the key of the new version.
+        """
+        try:
+            st = os.stat(os_path)
+        except OSError:
+            return None
+        return (os_path, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def get(self, key):
+        """Return a copy of the cached (notebook, signature, validation message), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        nb, signature, message = entry
+        return copy_notebook(nb), signature, message
+
+    def set(self, key, nb, signature, message=None):
+        """Cache a copy of a notebook read from the version of its file given by key"""
+        size = key[2]
+        if size > self.max_size:
+            self.discard(key[0])
+            return
+        nb = copy_notebook(nb)
+        with self._lock:
+            self._discard(key[0])
+            self._entries[key] = (nb, signature, message)
+            self._keys[key[0]] = key
+            self.size += size
+            while self.size > self.max_size:
+                self._discard(next(iter(self._entries))[0])
+
+    def discard(self, os_path):
+        """Forget the cached notebook of a path, e.g. after it was changed"""
+        with self._lock:
+            self._discard(os_path)
+
+    def _discard(self, os_path):
+        key = self._keys.pop(os_path, None)
+        if key is not None:
+            del self._entries[key]
+            self.size -= key[2]
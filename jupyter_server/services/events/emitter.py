@@ -0,0 +1,64 @@
+"""Notifications of the state changes of kernels, sessions and terminals."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+
+class EventEmitter(object):
+    """Dispatches the state changes of the items of a manager to subscribers.
+
+    Each change increments :attr:`version`, so that consumers can tell
+    whether anything changed since they last looked.
+
+    Parameters
+    ----------
+    source : str
+        The kind of items whose changes are emitted, e.g. 'kernels'.
+    log : logging.Logger, optional
+    """
+
+    def __init__(self, source, log=None):
+        self.source = source
+        self.log = log
+        self.version = 0
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call ``callback(event)`` for each change."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Stop calling a subscribed callback."""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def emit(self, event, id, model=None):
+        """Record a change and notify the subscribers.
+
+        Parameters
+        ----------
+        event : str
+            What changed, e.g. 'added', 'removed' or 'execution_state'.
+        id : str
+            The id of the item that changed.
+        model : dict, optional
+            The model of the item after the change, if it still exists.
+        """
+        self.version += 1
+        if not self._subscribers:
+            return
+        event = {
+            'source': self.source,
+            'event': event,
+            'id': id,
+            'model': model,
+            'version': self.version,
+        }
+        # copy, since subscribers may unsubscribe while handling the event
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                if self.log:
+                    self.log.error("Error handling %s event", self.source, exc_info=True)
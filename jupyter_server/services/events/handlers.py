@@ -0,0 +1,111 @@
+"""Tornado handlers for the stream of kernel, session and terminal events."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from datetime import timedelta
+
+from tornado import gen, web
+from tornado.concurrent import Future
+
+from jupyter_server.utils import ensure_async
+from ...base.handlers import APIHandler
+
+
+class EventStreamHandler(APIHandler):
+    """Streams the changes of kernels, sessions and terminals as server-sent events.
+
+    A ``snapshot`` of the kernels, sessions and terminals is sent first,
+    then each change as it happens, so that clients can subscribe once
+    instead of polling the list endpoints. The SSE event name is the
+    source of the change ('kernels', 'sessions' or 'terminals').
+    """
+
+    # an open stream is not activity
+    _track_activity = False
+
+    # (sec) interval of the comments keeping the connection open
+    keepalive_interval = 15
+
+    _closed = None
+    _queued_events = None
+
+    def _sources(self):
+        """The managers whose changes are streamed, by source"""
+        sources = {
+            'kernels': self.kernel_manager,
+            'sessions': self.session_manager,
+        }
+        terminal_manager = self.settings.get('terminal_manager')
+        if terminal_manager is not None:
+            sources['terminals'] = terminal_manager
+        return sources
+
+    async def _list(self, source, manager):
+        if source == 'kernels':
+            return await ensure_async(manager.list_kernels())
+        if source == 'sessions':
+            return await manager.list_sessions()
+        return manager.list()
+
+    @web.authenticated
+    async def get(self):
+        self.set_header('Content-Type', 'text/event-stream')
+        self.set_header('Cache-Control', 'no-cache')
+        self._closed = Future()
+        # events received while the snapshot is built are sent after it
+        self._queued_events = []
+        sources = self._sources()
+        for manager in sources.values():
+            manager.events.subscribe(self._on_event)
+        try:
+            for source, manager in sources.items():
+                version = manager.events.version
+                models = await self._list(source, manager)
+                self._send(source, {
+                    'source': source,
+                    'event': 'snapshot',
+                    'models': models,
+                    'version': version,
+                })
+            queued, self._queued_events = self._queued_events, None
+            for event in queued:
+                self._on_event(event)
+
+            while not self._closed.done():
+                try:
+                    await gen.with_timeout(timedelta(seconds=self.keepalive_interval), self._closed)
+                except gen.TimeoutError:
+                    self._write_chunk(': keepalive\n\n')
+        finally:
+            for manager in sources.values():
+                manager.events.unsubscribe(self._on_event)
+
+    def _on_event(self, event):
+        if self._queued_events is not None:
+            self._queued_events.append(event)
+        else:
+            self._send(event['source'], event)
+
+    def _send(self, name, data):
+        self._write_chunk('event: %s\ndata: %s\n\n' % (name, self.json_serializer.dumps(data)))
+
+    def _write_chunk(self, chunk):
+        if self._closed.done():
+            return
+        self.write(chunk)
+        self.flush().add_done_callback(self._on_flushed)
+
+    def _on_flushed(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            # the connection is closed, which is handled in on_connection_close
+            self.on_connection_close()
+
+    def on_connection_close(self):
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+
+
+default_handlers = [
+    (r"/api/events", EventStreamHandler),
+]
@@ -0,0 +1,184 @@
+"""Admission control of kernel starts."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import time
+from collections import Counter, deque
+from datetime import timedelta
+
+from tornado import gen, web
+from tornado.concurrent import Future
+
+from jupyter_server.prometheus.metrics import (
+    KERNEL_STARTS_IN_FLIGHT,
+    KERNEL_START_QUEUE_DEPTH,
+    KERNEL_START_QUEUE_WAIT_SECONDS,
+    KERNEL_START_REJECTED_TOTAL,
+)
+
+
+class KernelStartRejected(web.HTTPError):
+    """A kernel start rejected because the server is at capacity.
+
+    Answered with 503 Service Unavailable and a Retry-After header.
+    """
+
+    def __init__(self, log_message, retry_after):
+        super(KernelStartRejected, self).__init__(503, log_message)
+        self.retry_after = retry_after
+
+
+class _Waiter(object):
+    """A start waiting for admission"""
+
+    __slots__ = ('name', 'future', 'admitted')
+
+    def __init__(self, name):
+        self.name = name
+        self.future = Future()
+        self.admitted = False
+
+
+class KernelAdmission(object):
+    """Limits the number of running kernels and of kernels being started.
+
+    Starts exceeding the limits wait in a FIFO queue until a kernel
+    start completes or a kernel is shut down. Waiting starts of kernels
+    that are at their per-name limit do not block the others.
+
+    Parameters
+    ----------
+    count_kernels : callable
+        ``count_kernels()`` returns a Counter of the running kernels by kernel name.
+    max_kernels : int
+        Maximum number of kernels, including the ones being started. 0 disables the limit.
+    max_kernels_per_name : dict
+        Maximum number of kernels by kernel name, including the ones being started.
+    max_starts : int
+        Maximum number of kernels being started at once. 0 disables the limit.
+    max_queued : int
+        Maximum number of starts waiting for admission, further starts are rejected.
+        0 disables the limit.
+    timeout : float
+        Seconds after which waiting starts are rejected. 0 disables the timeout.
+    retry_after : int
+        Seconds after which rejected starts should be retried, sent to clients.
+    log : logging.Logger, optional
+    """
+
+    def __init__(self, count_kernels, max_kernels=0, max_kernels_per_name=None, max_starts=0,
+                 max_queued=0, timeout=0, retry_after=10, log=None):
+        self.count_kernels = count_kernels
+        self.max_kernels = max_kernels
+        self.max_kernels_per_name = {
+            name: limit for name, limit in (max_kernels_per_name or {}).items() if limit > 0
+        }
+        self.max_starts = max_starts
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.log = log
+        # kernels being started, by name
+        self._starting = Counter()
+        # the _Waiters of the starts waiting for admission
+        self._queue = deque()
+
+    @property
+    def enabled(self):
+        return bool(self.max_kernels > 0 or self.max_kernels_per_name or self.max_starts > 0)
+
+    def _admissible(self, name, kernels, starting):
+        if 0 < self.max_starts <= sum(starting.values()):
+            return False
+        if 0 < self.max_kernels <= sum(kernels.values()) + sum(starting.values()):
+            return False
+        limit = self.max_kernels_per_name.get(name, 0)
+        if 0 < limit <= kernels[name] + starting[name]:
+            return False
+        return True
+
+    async def acquire(self, name):
+        """Wait until a kernel named ``name`` can be started.
+
+        Raises KernelStartRejected if the queue is full or the wait times out.
+        Each successful call must be followed by a call to ``release(name)``
+        once the start has completed or failed.
+        """
+        # admits the waiting starts first, which keeps the queue FIFO
+        self.wake()
+        # starts waiting for other kernel names do not block this one
+        if self._admissible(name, self.count_kernels(), self._starting):
+            self._admit(name)
+            return
+
+        if 0 < self.max_queued <= len(self._queue):
+            KERNEL_START_REJECTED_TOTAL.labels(type=name, reason='queue_full').inc()
+            raise KernelStartRejected(
+                "Too many kernels are being started, try again later", self.retry_after,
+            )
+
+        waiter = _Waiter(name)
+        self._queue.append(waiter)
+        KERNEL_START_QUEUE_DEPTH.inc()
+        if self.log:
+            self.log.info("Waiting to start a %s kernel, %i starts queued", name, len(self._queue))
+        started = time.monotonic()
+        try:
+            if self.timeout > 0:
+                await gen.with_timeout(timedelta(seconds=self.timeout), waiter.future)
+            else:
+                await waiter.future
+        except gen.TimeoutError:
+            if not waiter.admitted:
+                self._remove(waiter)
+                KERNEL_START_QUEUE_WAIT_SECONDS.labels(
+                    type=name, result='timeout').observe(time.monotonic() - started)
+                KERNEL_START_REJECTED_TOTAL.labels(type=name, reason='timeout').inc()
+                raise KernelStartRejected(
+                    "Timeout waiting to start a %s kernel, try again later" % name, self.retry_after,
+                ) from None
+            # admitted just as the timeout expired
+        except BaseException:
+            # cancelled
+            if waiter.admitted:
+                self.release(name)
+            else:
+                self._remove(waiter)
+            raise
+        KERNEL_START_QUEUE_WAIT_SECONDS.labels(
+            type=name, result='admitted').observe(time.monotonic() - started)
+
+    def release(self, name):
+        """Record the end of a kernel start, and admit the waiting starts that can proceed."""
+        self._starting[name] -= 1
+        if self._starting[name] <= 0:
+            del self._starting[name]
+        KERNEL_STARTS_IN_FLIGHT.dec()
+        self.wake()
+
+    def wake(self):
+        """Admit the waiting starts that can proceed, e.g. after a kernel was shut down."""
+        if not self._queue:
+            return
+        kernels = self.count_kernels()
+        for waiter in list(self._queue):
+            if waiter.future.done():
+                # cancelled, and removed once its acquire call resumes
+                continue
+            if self._admissible(waiter.name, kernels, self._starting):
+                self._remove(waiter)
+                self._admit(waiter.name)
+                waiter.admitted = True
+                waiter.future.set_result(None)
+            elif 0 < self.max_starts <= sum(self._starting.values()):
+                break
+
+    def _admit(self, name):
+        self._starting[name] += 1
+        KERNEL_STARTS_IN_FLIGHT.inc()
+
+    def _remove(self, waiter):
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+            KERNEL_START_QUEUE_DEPTH.dec()
@@ -0,0 +1,211 @@
+"""A memory-bounded buffer for messages of disconnected kernels.
+
+Messages are kept in their raw (zmq multipart) form so they can be replayed
+verbatim when a client reconnects.
+"""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import heapq
+import json
+import struct
+import tempfile
+from collections import deque
+
+from jupyter_server.prometheus.metrics import (
+    KERNEL_MESSAGE_BUFFER_BYTES,
+    KERNEL_MESSAGE_BUFFER_DROPPED_TOTAL,
+)
+
+DELIM = b'<IDS|MSG>'
+
+# seq, length of the channel name, number of message parts
+_ENTRY_HEADER = struct.Struct('!QHI')
+_PART_HEADER = struct.Struct('!Q')
+
+
+def msg_type_from_parts(msg_parts):
+    """Return the msg_type of a raw zmq message by parsing only its header frame.
+
+    Returns None if the message cannot be parsed.
+    """
+    try:
+        idx = msg_parts.index(DELIM)
+        header = json.loads(bytes(msg_parts[idx + 2]))
+        return header['msg_type']
+    except (ValueError, IndexError, KeyError, TypeError):
+        return None
+
+
+class MessageBuffer(object):
+    """A bounded, ordered buffer of ``(channel, msg_parts)`` pairs.
+
+    When the in-memory limits are exceeded, the oldest messages are written
+    to a spill file (if ``spill_dir`` is set and the spill file has room).
+    Otherwise the oldest message whose type is in ``drop_msg_types`` is
+    dropped, so that messages like ``status`` and ``execute_reply`` survive
+    as long as possible.  If only such messages remain, the oldest is dropped.
+
+    Iterating over the buffer yields every message still held, spilled
+    messages first, in the order they were appended.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Maximum number of bytes to hold in memory. 0 means unlimited.
+    max_messages : int
+        Maximum number of messages to hold in memory. 0 means unlimited.
+    drop_msg_types : set
+        Message types that may be dropped first on overflow.
+    spill_dir : str
+        Directory in which to create the spill file. Empty disables spilling.
+    spill_max_bytes : int
+        Maximum number of bytes to write to the spill file. 0 means unlimited.
+    log : logging.Logger, optional
+    """
+
+    def __init__(self, max_bytes=0, max_messages=0, drop_msg_types=(),
+                 spill_dir='', spill_max_bytes=0, log=None):
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.drop_msg_types = set(drop_msg_types)
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.log = log
+
+        # entries are (seq, channel, msg_parts, nbytes)
+        self._droppable = deque()
+        self._kept = deque()
+        self._seq = 0
+        self.nbytes = 0
+        self.dropped = 0
+
+        self._spill_file = None
+        self.spilled = 0
+        self.spilled_bytes = 0
+
+    def __len__(self):
+        return len(self._droppable) + len(self._kept) + self.spilled
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def _in_memory(self):
+        return len(self._droppable) + len(self._kept)
+
+    def _over_limits(self):
+        if self.max_bytes and self.nbytes > self.max_bytes:
+            return True
+        if self.max_messages and self._in_memory() > self.max_messages:
+            return True
+        return False
+
+    def append(self, channel, msg_parts):
+        """Add a message to the buffer, enforcing the limits."""
+        nbytes = sum(len(part) for part in msg_parts)
+        entry = (self._seq, channel, msg_parts, nbytes)
+        self._seq += 1
+        if channel == 'iopub' and msg_type_from_parts(msg_parts) in self.drop_msg_types:
+            self._droppable.append(entry)
+        else:
+            self._kept.append(entry)
+        self._add_bytes(nbytes)
+
+        while self._over_limits() and self._in_memory() > 1:
+            if not self._spill_oldest():
+                self._drop_oldest()
+
+    def _add_bytes(self, nbytes):
+        self.nbytes += nbytes
+        KERNEL_MESSAGE_BUFFER_BYTES.labels(location='memory').inc(nbytes)
+
+    def _pop_oldest(self, prefer_droppable=False):
+        """Remove and return the oldest in-memory entry."""
+        if prefer_droppable and self._droppable:
+            queue = self._droppable
+        elif not self._droppable:
+            queue = self._kept
+        elif not self._kept:
+            queue = self._droppable
+        else:
+            queue = self._droppable if self._droppable[0][0] < self._kept[0][0] else self._kept
+        entry = queue.popleft()
+        self._add_bytes(-entry[3])
+        return entry
+
+    def _drop_oldest(self):
+        seq, channel, msg_parts, nbytes = self._pop_oldest(prefer_droppable=True)
+        self.dropped += 1
+        KERNEL_MESSAGE_BUFFER_DROPPED_TOTAL.inc()
+        if self.log and self.dropped == 1:
+            self.log.warning("Message buffer limit reached, dropping buffered messages")
+
+    def _spill_oldest(self):
+        """Write the oldest in-memory message to the spill file.
+
+        Returns False if spilling is disabled or the spill file is full.
+        """
+        if not self.spill_dir:
+            return False
+        oldest = min(
+            (q[0] for q in (self._droppable, self._kept) if q),
+            key=lambda entry: entry[0],
+        )
+        if self.spill_max_bytes and self.spilled_bytes + oldest[3] > self.spill_max_bytes:
+            return False
+        if self._spill_file is None:
+            try:
+                self._spill_file = tempfile.TemporaryFile(
+                    prefix='kernel-buffer-', dir=self.spill_dir)
+            except OSError:
+                if self.log:
+                    self.log.warning("Could not create message spill file in %s",
+                        self.spill_dir, exc_info=True)
+                self.spill_dir = ''
+                return False
+
+        seq, channel, msg_parts, nbytes = self._pop_oldest()
+        f = self._spill_file
+        bchannel = channel.encode('utf8')
+        f.write(_ENTRY_HEADER.pack(seq, len(bchannel), len(msg_parts)))
+        f.write(bchannel)
+        for part in msg_parts:
+            f.write(_PART_HEADER.pack(len(part)))
+            f.write(part)
+        self.spilled += 1
+        self.spilled_bytes += nbytes
+        KERNEL_MESSAGE_BUFFER_BYTES.labels(location='disk').inc(nbytes)
+        return True
+
+    def _read_spilled(self):
+        f = self._spill_file
+        f.flush()
+        f.seek(0)
+        for _ in range(self.spilled):
+            seq, nchannel, nparts = _ENTRY_HEADER.unpack(f.read(_ENTRY_HEADER.size))
+            channel = f.read(nchannel).decode('utf8')
+            msg_parts = []
+            for _ in range(nparts):
+                (size,) = _PART_HEADER.unpack(f.read(_PART_HEADER.size))
+                msg_parts.append(f.read(size))
+            yield channel, msg_parts
+
+    def __iter__(self):
+        if self.spilled:
+            yield from self._read_spilled()
+        for seq, channel, msg_parts, nbytes in heapq.merge(
+                self._droppable, self._kept, key=lambda entry: entry[0]):
+            yield channel, msg_parts
+
+    def close(self):
+        """Discard all buffered messages and remove the spill file."""
+        self._add_bytes(-self.nbytes)
+        self._droppable.clear()
+        self._kept.clear()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        KERNEL_MESSAGE_BUFFER_BYTES.labels(location='disk').dec(self.spilled_bytes)
+        self.spilled = 0
+        self.spilled_bytes = 0
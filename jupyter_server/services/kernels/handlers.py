@@ -6,21 +6,40 @@ Preliminary documentation at https://github.com/ipython/ipython/wiki/IPEP-16%3A-
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 
-import json
+import asyncio
 import logging
-from textwrap import dedent
+import time
 
 from tornado import web, gen
 from tornado.concurrent import Future
+from tornado.escape import json_encode, utf8
 from tornado.ioloop import IOLoop
+from tornado.websocket import WebSocketProtocol13
 
 from jupyter_client import protocol_version as client_protocol_version
-from jupyter_client.jsonutil import date_default
 from ipython_genutils.py3compat import cast_unicode
 from jupyter_server.utils import url_path_join, url_escape, ensure_async
+from jupyter_server.prometheus.metrics import (
+    KERNEL_NUDGE_DURATION_SECONDS,
+    KERNEL_NUDGES_SKIPPED_TOTAL,
+    KERNEL_WS_BACKPRESSURE_EVENTS_TOTAL,
+    KERNEL_WS_BACKPRESSURE_DROPPED_MESSAGES_TOTAL,
+)
 
 from ...base.handlers import APIHandler
-from ...base.zmqhandlers import AuthenticatedZMQStreamHandler, deserialize_binary_message
+from ...base.zmqhandlers import (
+    AdaptiveCompressionProtocol,
+    AuthenticatedZMQStreamHandler,
+    deserialize_binary_message,
+    deserialize_msg_from_ws_v1,
+    KERNEL_WS_PROTOCOL_V1,
+)
+from .hub import KernelMessage
+
+# mimetypes of already compressed data, not worth compressing again
+INCOMPRESSIBLE_MIMETYPES = {
+    'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'application/pdf',
+}
 
 
 
@@ -29,8 +48,10 @@ class MainKernelHandler(APIHandler):
     @web.authenticated
     async def get(self):
         km = self.kernel_manager
+        if await self.check_list_version(km, km.events):
+            return
         kernels = await ensure_async(km.list_kernels())
-        self.finish(json.dumps(kernels, default=date_default))
+        self.finish(self.json_serializer.dumps(kernels))
 
     @web.authenticated
     async def post(self):
@@ -49,7 +70,7 @@ class MainKernelHandler(APIHandler):
         location = url_path_join(self.base_url, 'api', 'kernels', url_escape(kernel_id))
         self.set_header('Location', location)
         self.set_status(201)
-        self.finish(json.dumps(model, default=date_default))
+        self.finish(self.json_serializer.dumps(model))
 
 
 class KernelHandler(APIHandler):
@@ -58,7 +79,7 @@ class KernelHandler(APIHandler):
     async def get(self, kernel_id):
         km = self.kernel_manager
         model = await ensure_async(km.kernel_model(kernel_id))
-        self.finish(json.dumps(model, default=date_default))
+        self.finish(self.json_serializer.dumps(model))
 
     @web.authenticated
     async def delete(self, kernel_id):
@@ -85,10 +106,83 @@ class KernelActionHandler(APIHandler):
                 self.set_status(500)
             else:
                 model = await ensure_async(km.kernel_model(kernel_id))
-                self.write(json.dumps(model, default=date_default))
+                self.write(self.json_serializer.dumps(model))
         self.finish()
 
 
+class KernelBatchHandler(APIHandler):
+    """Runs a list of kernel operations concurrently
+
+    The body is a list of operations, e.g.
+    ``[{"action": "start", "name": "python3", "path": "foo"}, {"action": "shutdown", "id": ...}]``,
+    where the action is one of start, interrupt, restart and shutdown.
+    At most ``batch_concurrency`` operations of the kernel manager run at once.
+    The reply lists the result of each operation, in the same order,
+    with the status code and the model or error message of the
+    equivalent single-kernel request, and its duration in seconds.
+    """
+
+    @web.authenticated
+    async def post(self):
+        km = self.kernel_manager
+        operations = self.get_json_body()
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            raise web.HTTPError(400, "Expected a list of kernel operations")
+        if 0 < km.batch_max_operations < len(operations):
+            raise web.HTTPError(400, "Too many kernel operations: %i > %i" % (
+                len(operations), km.batch_max_operations))
+
+        concurrency = km.batch_concurrency
+        semaphore = asyncio.Semaphore(concurrency if concurrency > 0 else max(len(operations), 1))
+
+        async def run(operation):
+            async with semaphore:
+                return await self._run_operation(operation)
+
+        results = await asyncio.gather(*[run(op) for op in operations])
+        self.finish(self.json_serializer.dumps(results))
+
+    async def _run_operation(self, operation):
+        km = self.kernel_manager
+        action = operation.get('action')
+        kernel_id = operation.get('id')
+        result = {'action': action, 'id': kernel_id}
+        started = time.monotonic()
+        try:
+            if action == 'start':
+                kernel_id = await km.start_kernel(
+                    kernel_name=operation.get('name') or km.default_kernel_name,
+                    path=operation.get('path'),
+                )
+                result['id'] = kernel_id
+                result['model'] = await ensure_async(km.kernel_model(kernel_id))
+                status = 201
+            elif action not in ('interrupt', 'restart', 'shutdown'):
+                raise web.HTTPError(400, "Unknown kernel action: %s" % action)
+            elif not kernel_id:
+                raise web.HTTPError(400, "Missing kernel id")
+            elif action == 'interrupt':
+                await ensure_async(km.interrupt_kernel(kernel_id))
+                status = 204
+            elif action == 'restart':
+                await km.restart_kernel(kernel_id)
+                result['model'] = await ensure_async(km.kernel_model(kernel_id))
+                status = 200
+            else:
+                await ensure_async(km.shutdown_kernel(kernel_id))
+                status = 204
+        except web.HTTPError as e:
+            status = e.status_code
+            result['message'] = e.log_message or e.reason
+        except Exception as e:
+            self.log.error("Exception running kernel operation %s", action, exc_info=True)
+            status = 500
+            result['message'] = str(e)
+        result['status'] = status
+        result['duration'] = time.monotonic() - started
+        return result
+
+
 class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
     '''There is one ZMQChannelsHandler per running kernel and it oversees all
     the sessions.
@@ -116,13 +210,74 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
     def rate_limit_window(self):
         return self.settings.get('rate_limit_window', 1.0)
 
+    @property
+    def kernel_ws_protocol(self):
+        return self.settings.get('kernel_ws_protocol', None)
+
+    @property
+    def pending_messages_limit(self):
+        return self.settings.get('kernel_ws_pending_messages_limit', 0)
+
+    @property
+    def high_watermark(self):
+        return self.settings.get('kernel_ws_high_watermark', 0)
+
+    @property
+    def max_buffer_size(self):
+        return self.settings.get('kernel_ws_max_buffer_size', 0)
+
+    @property
+    def compression_threshold(self):
+        """Messages smaller than this are not compressed, see websocket_compression_threshold"""
+        return self.settings.get('websocket_compression_threshold', 0)
+
+    # IOPub messages dropped while the client is slow
+    slow_client_drop_msg_types = {'stream', 'display_data', 'update_display_data'}
+
+    def get_websocket_protocol(self):
+        protocol = super(ZMQChannelsHandler, self).get_websocket_protocol()
+        if isinstance(protocol, WebSocketProtocol13):
+            protocol = AdaptiveCompressionProtocol(
+                self, protocol.mask_outgoing, protocol.params,
+                threshold=self.compression_threshold,
+            )
+        return protocol
+
+    def select_subprotocol(self, subprotocols):
+        """Select the v1 kernel websocket protocol if the client asks for it.
+
+        Only done if it is allowed by the kernel_ws_protocol setting and the
+        kernel speaks the current protocol version, since forwarded
+        messages are not adapted.
+        """
+        preferred = self.kernel_ws_protocol
+        if preferred is None:
+            preferred = KERNEL_WS_PROTOCOL_V1
+        # adaptation between minor versions does not change messages
+        adapt_version = getattr(self.session, 'adapt_version', None)
+        needs_adaptation = bool(adapt_version) and (
+            adapt_version != int(client_protocol_version.split('.')[0]))
+        if not self._kernel_info_future.done():
+            # opened before the kernel is ready, the protocol version is not known yet
+            needs_adaptation = True
+        if (preferred == KERNEL_WS_PROTOCOL_V1 and preferred in subprotocols
+                and not needs_adaptation):
+            self.ws_protocol = preferred
+        else:
+            self.ws_protocol = None
+        return self.ws_protocol
+
     def __repr__(self):
         return "%s(%s)" % (self.__class__.__name__, getattr(self, 'kernel_id', 'uninitialized'))
 
     def create_stream(self):
+        """Connect the channels to the kernel.
+
+        IOPub messages are received by the kernel's hub, shared by all connections.
+        """
         km = self.kernel_manager
         identity = self.session.bsession
-        for channel in ('iopub', 'shell', 'control', 'stdin'):
+        for channel in ('shell', 'control', 'stdin'):
             meth = getattr(km, 'connect_' + channel)
             self.channels[channel] = stream = meth(self.kernel_id, identity=identity)
             stream.channel = channel
@@ -133,10 +288,20 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
         a shell reply and at least one iopub message,
         ensuring that zmq subscriptions are established,
         sockets are fully connected, and kernel is responsive.
-        Keeps retrying kernel_info_request until these are both received.
+        Keeps retrying kernel_info_request until these are both received,
+        with an exponential backoff.
         """
         kernel = self.kernel_manager.get_kernel(self.kernel_id)
 
+        # The IOPub hub is shared by all connections to the kernel:
+        # once it has received a message, its subscription is established.
+        if self._iopub_hub.receiving:
+            self.log.debug("Nudge: IOPub already receiving from kernel %s", self.kernel_id)
+            KERNEL_NUDGES_SKIPPED_TOTAL.labels(type=kernel.kernel_name, reason='receiving').inc()
+            f = Future()
+            f.set_result(None)
+            return f
+
         # Do not nudge busy kernels as kernel info requests sent to shell are
         # queued behind execution requests.
         # nudging in this case would cause a potentially very long wait
@@ -145,15 +310,17 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
         # establishing its zmq subscriptions before processing the next request.
         if getattr(kernel, "execution_state") == "busy":
             self.log.debug("Nudge: not nudging busy kernel %s", self.kernel_id)
+            KERNEL_NUDGES_SKIPPED_TOTAL.labels(type=kernel.kernel_name, reason='busy').inc()
             f = Future()
             f.set_result(None)
             return f
 
+        started = time.monotonic()
         # Use a transient shell channel to prevent leaking
         # shell responses to the front-end.
         shell_channel = kernel.connect_shell()
-        # The IOPub used by the client, whose subscriptions we are verifying.
-        iopub_channel = self.channels["iopub"]
+        # The IOPub hub used by the client, whose subscriptions we are verifying.
+        iopub_hub = self._iopub_hub
 
         info_future = Future()
         iopub_future = Future()
@@ -169,8 +336,11 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
 
         def cleanup(_=None):
             """Common cleanup"""
+            KERNEL_NUDGE_DURATION_SECONDS.labels(
+                type=kernel.kernel_name,
+            ).observe(time.monotonic() - started)
             loop.remove_timeout(nudge_handle)
-            iopub_channel.stop_on_recv()
+            iopub_hub.unsubscribe(on_iopub)
             if not shell_channel.closed():
                 shell_channel.close()
 
@@ -186,16 +356,17 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
         def on_iopub(msg):
             self.log.debug("Nudge: IOPub received: %s", self.kernel_id)
             if not iopub_future.done():
-                iopub_channel.stop_on_recv()
+                iopub_hub.unsubscribe(on_iopub)
                 self.log.debug("Nudge: resolving iopub future: %s", self.kernel_id)
                 iopub_future.set_result(None)
 
-        iopub_channel.on_recv(on_iopub)
+        iopub_hub.subscribe(on_iopub)
         shell_channel.on_recv(on_shell_reply)
         loop = IOLoop.current()
 
-        # Nudge the kernel with kernel info requests until we get an IOPub message
-        def nudge(count):
+        # Nudge the kernel with kernel info requests until we get an IOPub message,
+        # doubling the delay between requests, from 0.05s up to 2s
+        def nudge(count, delay):
             count += 1
 
             # NOTE: this close check appears to never be True during on_open,
@@ -228,9 +399,9 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
                 log("Nudge: attempt %s on kernel %s" % (count, self.kernel_id))
                 self.session.send(shell_channel, "kernel_info_request")
                 nonlocal nudge_handle
-                nudge_handle = loop.call_later(0.5, nudge, count)
+                nudge_handle = loop.call_later(delay, nudge, count, min(2 * delay, 2))
 
-        nudge_handle = loop.call_later(0, nudge, count=0)
+        nudge_handle = loop.call_later(0, nudge, 0, 0.05)
 
         # resolve with a timeout if we get no response
         future = gen.with_timeout(loop.time() + self.kernel_info_timeout, both_done)
@@ -239,52 +410,14 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
         return future
 
     def request_kernel_info(self):
-        """send a request for kernel_info"""
-        km = self.kernel_manager
-        kernel = km.get_kernel(self.kernel_id)
-        try:
-            # check for previous request
-            future = kernel._kernel_info_future
-        except AttributeError:
-            self.log.debug("Requesting kernel info from %s", self.kernel_id)
-            # Create a kernel_info channel to query the kernel protocol version.
-            # This channel will be closed after the kernel_info reply is received.
-            if self.kernel_info_channel is None:
-                self.kernel_info_channel = km.connect_shell(self.kernel_id)
-            self.kernel_info_channel.on_recv(self._handle_kernel_info_reply)
-            self.session.send(self.kernel_info_channel, "kernel_info_request")
-            # store the future on the kernel, so only one request is sent
-            kernel._kernel_info_future = self._kernel_info_future
-        else:
-            if not future.done():
-                self.log.debug("Waiting for pending kernel_info request")
-            future.add_done_callback(lambda f: self._finish_kernel_info(f.result()))
-        return self._kernel_info_future
+        """Request the kernel_info reply of the kernel
 
-    def _handle_kernel_info_reply(self, msg):
-        """process the kernel_info_reply
-
-        enabling msg spec adaptation, if necessary
+        The reply is cached by the kernel manager,
+        and shared by all connections to the kernel.
         """
-        idents,msg = self.session.feed_identities(msg)
-        try:
-            msg = self.session.deserialize(msg)
-        except:
-            self.log.error("Bad kernel_info reply", exc_info=True)
-            self._kernel_info_future.set_result({})
-            return
-        else:
-            info = msg['content']
-            self.log.debug("Received kernel info: %s", info)
-            if msg['msg_type'] != 'kernel_info_reply' or 'protocol_version' not in info:
-                self.log.error("Kernel info request failed, assuming current %s", info)
-                info = {}
-            self._finish_kernel_info(info)
-
-        # close the kernel_info channel, we don't need it anymore
-        if self.kernel_info_channel:
-            self.kernel_info_channel.close()
-        self.kernel_info_channel = None
+        future = self.kernel_manager.request_kernel_info(self.kernel_id)
+        future.add_done_callback(lambda f: self._finish_kernel_info(f.result()))
+        return self._kernel_info_future
 
     def _finish_kernel_info(self, info):
         """Finish handling kernel_info reply
@@ -304,20 +437,24 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
         self.zmq_stream = None
         self.channels = {}
         self.kernel_id = None
-        self.kernel_info_channel = None
         self._kernel_info_future = Future()
+        self._kernel_info_timeout = None
         self._close_future = Future()
         self.session_key = ''
 
-        # Rate limiting code
-        self._iopub_window_msg_count = 0
-        self._iopub_window_byte_count = 0
-        self._iopub_msgs_exceeded = False
-        self._iopub_data_exceeded = False
-        # Queue of (time stamp, byte count)
-        # Allows you to specify that the byte count should be lowered
-        # by a delta amount at some point in the future.
-        self._iopub_window_byte_queue = []
+        # IOPub hub and rate limiter, shared by all connections to the kernel
+        self._iopub_hub = None
+        self._iopub_rate_limiter = None
+        # IOPub messages received while the connection is opened, see open
+        self._held_iopub_msgs = None
+
+        # client messages received before the kernel is ready, see pending_messages_limit
+        self._pending_messages = None
+
+        # bytes written to the websocket and not sent yet, see high_watermark
+        self._unsent_bytes = 0
+        self._paused = False
+        self._subscribed = False
 
     async def pre_get(self):
         # authenticate first
@@ -338,10 +475,22 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
             self.log.warning("Timeout waiting for kernel_info reply from %s", self.kernel_id)
             future.set_result({})
         loop = IOLoop.current()
-        loop.add_timeout(loop.time() + self.kernel_info_timeout, give_up)
+        self._kernel_info_timeout = loop.add_timeout(loop.time() + self.kernel_info_timeout, give_up)
+        # removed once the kernel is ready, or when the connection closes
+        future.add_done_callback(lambda f: self._remove_kernel_info_timeout())
+        if self.pending_messages_limit > 0:
+            if not future.done():
+                # open at once, and queue client messages until the kernel is ready
+                self._pending_messages = []
+            return
         # actually wait for it
         await future
 
+    def _remove_kernel_info_timeout(self):
+        if self._kernel_info_timeout is not None:
+            IOLoop.current().remove_timeout(self._kernel_info_timeout)
+            self._kernel_info_timeout = None
+
     async def get(self, kernel_id):
         self.kernel_id = cast_unicode(kernel_id, 'ascii')
         await super(ZMQChannelsHandler, self).get(kernel_id=kernel_id)
@@ -364,6 +513,17 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
         super(ZMQChannelsHandler, self).open()
         km = self.kernel_manager
         km.notify_connect(kernel_id)
+        self._iopub_hub = km.get_iopub_hub(kernel_id)
+        # subscribed at once, in the same tick as the buffer is handed over below,
+        # so that no IOPub message is lost; they are held until the kernel was nudged
+        self._held_iopub_msgs = []
+        self._iopub_hub.subscribe(self._on_iopub_msg)
+        self._iopub_rate_limiter = km.get_iopub_rate_limiter(
+            kernel_id,
+            msg_rate_limit=self.iopub_msg_rate_limit,
+            data_rate_limit=self.iopub_data_rate_limit,
+            window=self.rate_limit_window,
+        )
 
         # on new connections, flush the message buffer
         buffer_info = km.get_buffer(kernel_id, self.session_key)
@@ -384,8 +544,13 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
                 if replay_buffer:
                     self.log.info("Replaying %s buffered messages", len(replay_buffer))
                     for channel, msg_list in replay_buffer:
-                        stream = self.channels[channel]
+                        if channel == 'iopub':
+                            stream = self._iopub_hub.stream
+                        else:
+                            stream = self.channels[channel]
                         self._on_zmq_reply(stream, msg_list)
+                    # release the memory and spill file held by the buffer
+                    replay_buffer.close()
 
             connected.add_done_callback(replay)
         else:
@@ -405,151 +570,235 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
         km.add_restart_callback(self.kernel_id, self.on_kernel_restarted)
         km.add_restart_callback(self.kernel_id, self.on_restart_failed, 'dead')
 
+        if self._pending_messages is not None:
+            self._send_status_message('starting')
+            self._kernel_info_future.add_done_callback(self._send_pending_messages)
+
         def subscribe(value):
-            for channel, stream in self.channels.items():
-                stream.on_recv_stream(self._on_zmq_reply)
+            self._subscribed = True
+            if not self._paused:
+                for channel, stream in self.channels.items():
+                    stream.on_recv_stream(self._on_zmq_reply)
+            # after the replay of the buffered messages
+            held, self._held_iopub_msgs = self._held_iopub_msgs, None
+            if self.ws_connection is not None:
+                for kernel_msg in held:
+                    self._on_iopub_msg(kernel_msg)
 
         connected.add_done_callback(subscribe)
 
         return connected
 
 
+    def _send_pending_messages(self, future):
+        """Send the client messages queued until the kernel was ready"""
+        pending, self._pending_messages = self._pending_messages, None
+        if self.ws_connection is None:
+            return
+        kernel = self.kernel_manager._kernels.get(self.kernel_id)
+        if kernel is not None:
+            self._send_status_message(kernel.execution_state)
+        if pending:
+            self.log.debug("Sending %s queued messages to kernel %s", len(pending), self.kernel_id)
+        for msg in pending:
+            self.on_message(msg)
+
     def on_message(self, msg):
         if not self.channels:
             # already closed, ignore the message
             self.log.debug("Received message on closed websocket %r", msg)
             return
-        if isinstance(msg, bytes):
-            msg = deserialize_binary_message(msg)
+        if self._pending_messages is not None:
+            # the kernel is not ready yet
+            if len(self._pending_messages) < self.pending_messages_limit:
+                self._pending_messages.append(msg)
+            else:
+                self.log.warning("Dropping message to kernel %s, too many messages queued", self.kernel_id)
+            return
+        if self.ws_protocol == KERNEL_WS_PROTOCOL_V1:
+            channel, msg_list = deserialize_msg_from_ws_v1(msg)
+            if len(msg_list) < 4:
+                self.log.warning("Malformed message on channel %r", channel)
+                return
+            msg = None
         else:
-            msg = json.loads(msg)
-        channel = msg.pop('channel', None)
-        if channel is None:
-            self.log.warning("No channel specified, assuming shell: %s", msg)
-            channel = 'shell'
+            if isinstance(msg, bytes):
+                msg = deserialize_binary_message(msg)
+            else:
+                msg = self.json_serializer.loads(msg)
+            channel = msg.pop('channel', None)
+            if channel is None:
+                self.log.warning("No channel specified, assuming shell: %s", msg)
+                channel = 'shell'
         if channel not in self.channels:
             self.log.warning("No such channel: %r", channel)
             return
         am = self.kernel_manager.allowed_message_types
-        mt = msg['header']['msg_type']
-        if am and mt not in am:
-            self.log.warning('Received message of type "%s", which is not allowed. Ignoring.' % mt)
+        if am:
+            header = msg['header'] if msg is not None else self.session.unpack(msg_list[0])
+            mt = header['msg_type']
+            if mt not in am:
+                self.log.warning('Received message of type "%s", which is not allowed. Ignoring.' % mt)
+                return
+        stream = self.channels[channel]
+        if msg is None:
+            # sign and forward the frames as they are
+            self.session.send_raw(stream, msg_list)
         else:
-            stream = self.channels[channel]
             self.session.send(stream, msg)
 
     def _on_zmq_reply(self, stream, msg_list):
-        idents, fed_msg_list = self.session.feed_identities(msg_list)
-        msg = self.session.deserialize(fed_msg_list)
-        parent = msg['parent_header']
+        self._on_kernel_msg(stream, KernelMessage(self.session, msg_list))
+
+    def _on_iopub_msg(self, kernel_msg):
+        """Handle a message received by the kernel's IOPub hub."""
+        if self._held_iopub_msgs is not None:
+            # the connection is not ready yet, see open
+            self._held_iopub_msgs.append(kernel_msg)
+            return
+        self._on_kernel_msg(self._iopub_hub.stream, kernel_msg)
+
+    def _on_kernel_msg(self, stream, kernel_msg):
+        channel = getattr(stream, 'channel', None)
+        msg_type = kernel_msg.msg_type
+        if self.ws_protocol == KERNEL_WS_PROTOCOL_V1:
+            # the frames are forwarded as they are,
+            # only the parts needed for rate limiting and error masking are parsed
+            msg = None
+            parts = kernel_msg.parts
+        else:
+            # parsed once, and shared with the other consumers of IOPub messages:
+            # copied before the changes made for this connection (channel, error masking)
+            msg = dict(kernel_msg.msg)
+
         def write_stderr(error_message):
             self.log.warning(error_message)
-            msg = self.session.msg("stream",
+            err_msg = self.session.msg("stream",
                 content={"text": error_message + '\n', "name": "stderr"},
-                parent=parent
+                parent=kernel_msg.parent_header
             )
-            msg['channel'] = 'iopub'
-            self.write_message(json.dumps(msg, default=date_default))
-        channel = getattr(stream, 'channel', None)
-        msg_type = msg['header']['msg_type']
+            self._write_msg(err_msg, 'iopub')
 
         if channel == 'iopub' and msg_type == 'error':
-            self._on_error(msg)
-
-
-        if channel == 'iopub' and msg_type == 'status' and msg['content'].get('execution_state') == 'idle':
-            # reset rate limit counter on status=idle,
-            # to avoid 'Run All' hitting limits prematurely.
-            self._iopub_window_byte_queue = []
-            self._iopub_window_msg_count = 0
-            self._iopub_window_byte_count = 0
-            self._iopub_msgs_exceeded = False
-            self._iopub_data_exceeded = False
-
-        if channel == 'iopub' and msg_type not in {'status', 'comm_open', 'execute_input'}:
-
-            # Remove the counts queued for removal.
-            now = IOLoop.current().time()
-            while len(self._iopub_window_byte_queue) > 0:
-                queued = self._iopub_window_byte_queue[0]
-                if (now >= queued[0]):
-                    self._iopub_window_byte_count -= queued[1]
-                    self._iopub_window_msg_count -= 1
-                    del self._iopub_window_byte_queue[0]
-                else:
-                    # This part of the queue hasn't be reached yet, so we can
-                    # abort the loop.
-                    break
-
-            # Increment the bytes and message count
-            self._iopub_window_msg_count += 1
+            if msg is not None:
+                msg['content'] = dict(msg['content'])
+                self._on_error(msg)
+            elif not self.kernel_manager.allow_tracebacks:
+                error_msg = {'content': dict(kernel_msg.content)}
+                self._on_error(error_msg)
+                # the parts are shared with the other connections
+                parts = list(parts)
+                parts[3] = self.session.pack(error_msg['content'])
+
+        if channel == 'iopub' and self._paused and msg_type in self.slow_client_drop_msg_types:
+            KERNEL_WS_BACKPRESSURE_DROPPED_MESSAGES_TOTAL.labels(type=msg_type).inc()
+            return
+
+        if channel == 'iopub' and self._iopub_rate_limiter is not None:
+            if msg_type == 'status':
+                execution_state = kernel_msg.content.get('execution_state')
+            else:
+                execution_state = None
             if msg_type == 'stream':
-                byte_count = sum([len(x) for x in msg_list])
+                byte_count = kernel_msg.nbytes
             else:
                 byte_count = 0
-            self._iopub_window_byte_count += byte_count
-
-            # Queue a removal of the byte and message count for a time in the
-            # future, when we are no longer interested in it.
-            self._iopub_window_byte_queue.append((now + self.rate_limit_window, byte_count))
-
-            # Check the limits, set the limit flags, and reset the
-            # message and data counts.
-            msg_rate = float(self._iopub_window_msg_count) / self.rate_limit_window
-            data_rate = float(self._iopub_window_byte_count) / self.rate_limit_window
-
-            # Check the msg rate
-            if self.iopub_msg_rate_limit > 0 and msg_rate > self.iopub_msg_rate_limit:
-                if not self._iopub_msgs_exceeded:
-                    self._iopub_msgs_exceeded = True
-                    write_stderr(dedent("""\
-                    IOPub message rate exceeded.
-                    The Jupyter server will temporarily stop sending output
-                    to the client in order to avoid crashing it.
-                    To change this limit, set the config variable
-                    `--ServerApp.iopub_msg_rate_limit`.
-
-                    Current values:
-                    ServerApp.iopub_msg_rate_limit={} (msgs/sec)
-                    ServerApp.rate_limit_window={} (secs)
-                    """.format(self.iopub_msg_rate_limit, self.rate_limit_window)))
-            else:
-                # resume once we've got some headroom below the limit
-                if self._iopub_msgs_exceeded and msg_rate < (0.8 * self.iopub_msg_rate_limit):
-                    self._iopub_msgs_exceeded = False
-                    if not self._iopub_data_exceeded:
-                        self.log.warning("iopub messages resumed")
-
-            # Check the data rate
-            if self.iopub_data_rate_limit > 0 and data_rate > self.iopub_data_rate_limit:
-                if not self._iopub_data_exceeded:
-                    self._iopub_data_exceeded = True
-                    write_stderr(dedent("""\
-                    IOPub data rate exceeded.
-                    The Jupyter server will temporarily stop sending output
-                    to the client in order to avoid crashing it.
-                    To change this limit, set the config variable
-                    `--ServerApp.iopub_data_rate_limit`.
-
-                    Current values:
-                    ServerApp.iopub_data_rate_limit={} (bytes/sec)
-                    ServerApp.rate_limit_window={} (secs)
-                    """.format(self.iopub_data_rate_limit, self.rate_limit_window)))
-            else:
-                # resume once we've got some headroom below the limit
-                if self._iopub_data_exceeded and data_rate < (0.8 * self.iopub_data_rate_limit):
-                    self._iopub_data_exceeded = False
-                    if not self._iopub_msgs_exceeded:
-                        self.log.warning("iopub messages resumed")
-
-            # If either of the limit flags are set, do not send the message.
-            if self._iopub_msgs_exceeded or self._iopub_data_exceeded:
-                # we didn't send it, remove the current message from the calculus
-                self._iopub_window_msg_count -= 1
-                self._iopub_window_byte_count -= byte_count
-                self._iopub_window_byte_queue.pop(-1)
+            send, notices = self._iopub_rate_limiter.check(
+                kernel_msg.msg_id, msg_type, byte_count, execution_state,
+            )
+            for notice in notices:
+                write_stderr(notice)
+            if not send:
                 return
-        super(ZMQChannelsHandler, self)._on_zmq_reply(stream, msg)
+        super(ZMQChannelsHandler, self)._on_zmq_reply(
+            stream, msg if msg is not None else parts,
+            compress=self._should_compress(kernel_msg),
+        )
+
+    def _should_compress(self, kernel_msg):
+        """Whether a kernel message is worth compressing
+
+        Returns False for outputs of already compressed data, such as PNG images,
+        and None to let the size of the message decide.
+        """
+        if kernel_msg.msg_type not in ('display_data', 'execute_result', 'update_display_data'):
+            return None
+        protocol = self.ws_connection
+        if not getattr(protocol, 'compressing', False) or kernel_msg.nbytes < protocol.threshold:
+            return None
+        mimetypes = set(kernel_msg.content.get('data', {}))
+        mimetypes.discard('text/plain')
+        if mimetypes and mimetypes <= INCOMPRESSIBLE_MIMETYPES:
+            return False
+        return None
+
+    def write_message(self, message, binary=False, compress=None):
+        """Send a message to the client, keeping track of the data not sent yet
+
+        If websocket compression is enabled, ``compress`` overrides the
+        decision to compress the message, which is based on its size by default.
+        """
+        if isinstance(message, dict):
+            message = json_encode(message)
+        # encoded once here, so that the data waiting to be sent is counted in bytes
+        message = utf8(message)
+        protocol = self.ws_connection
+        if isinstance(protocol, AdaptiveCompressionProtocol) and not protocol.is_closing():
+            future = protocol.write_message(message, binary=binary, compress=compress)
+        else:
+            future = super(ZMQChannelsHandler, self).write_message(message, binary=binary)
+        if self.high_watermark <= 0 and self.max_buffer_size <= 0:
+            return future
+        nbytes = len(message)
+        self._unsent_bytes += nbytes
+        future.add_done_callback(lambda f: self._on_message_sent(f, nbytes))
+        if 0 < self.max_buffer_size < self._unsent_bytes:
+            self.log.warning(
+                "Closing connection to kernel %s, %s bytes are waiting to be sent to the client",
+                self.kernel_id, self._unsent_bytes,
+            )
+            KERNEL_WS_BACKPRESSURE_EVENTS_TOTAL.labels(event='closed').inc()
+            self.close()
+        elif 0 < self.high_watermark < self._unsent_bytes and not self._paused:
+            self._pause()
+        return future
+
+    def _on_message_sent(self, future, nbytes):
+        if not future.cancelled():
+            # the connection may be closed, which is handled in on_close
+            future.exception()
+        self._unsent_bytes -= nbytes
+        if self._paused and self._unsent_bytes < self.high_watermark / 2:
+            self._resume()
+
+    def _pause(self):
+        """Stop reading messages for a slow client, and drop its outputs"""
+        self.log.warning("Client of kernel %s is slow, pausing its connection", self.kernel_id)
+        KERNEL_WS_BACKPRESSURE_EVENTS_TOTAL.labels(event='paused').inc()
+        self._paused = True
+        for channel, stream in self.channels.items():
+            stream.stop_on_recv()
+        msg = self.session.msg("stream", content={
+            "text": "Output is not sent while the client is not receiving it fast enough.\n",
+            "name": "stderr",
+        })
+        self._write_msg(msg, 'iopub')
+
+    def _resume(self):
+        self.log.info("Resuming connection to kernel %s", self.kernel_id)
+        KERNEL_WS_BACKPRESSURE_EVENTS_TOTAL.labels(event='resumed').inc()
+        self._paused = False
+        if self._subscribed and self.ws_connection is not None:
+            for channel, stream in self.channels.items():
+                stream.on_recv_stream(self._on_zmq_reply)
+
+    def _write_msg(self, msg, channel):
+        """Write a message created by the server to the websocket."""
+        msg['channel'] = channel
+        if self.ws_protocol == KERNEL_WS_PROTOCOL_V1:
+            self.write_message(self._reserialize_reply(msg, channel=channel), binary=True)
+        else:
+            self.write_message(self.json_serializer.dumps(msg))
 
     def close(self):
         super(ZMQChannelsHandler, self).close()
@@ -557,10 +806,14 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
 
     def on_close(self):
         self.log.debug("Websocket closed %s", self.session_key)
+        self._remove_kernel_info_timeout()
         # unregister myself as an open session (only if it's really me)
         if self._open_sessions.get(self.session_key) is self:
             self._open_sessions.pop(self.session_key)
 
+        if self._iopub_hub is not None:
+            self._iopub_hub.unsubscribe(self._on_iopub_msg)
+
         km = self.kernel_manager
         if self.kernel_id in km:
             km.notify_disconnect(self.kernel_id)
@@ -589,17 +842,17 @@ class ZMQChannelsHandler(AuthenticatedZMQStreamHandler):
         self._close_future.set_result(None)
 
     def _send_status_message(self, status):
-        iopub = self.channels.get('iopub', None)
+        iopub = self._iopub_hub.stream if self._iopub_hub is not None else None
         if iopub and not iopub.closed():
             # flush IOPub before sending a restarting/dead status message
             # ensures proper ordering on the IOPub channel
             # that all messages from the stopped kernel have been delivered
             iopub.flush()
+            self._iopub_hub.flush_pending()
         msg = self.session.msg("status",
             {'execution_state': status}
         )
-        msg['channel'] = 'iopub'
-        self.write_message(json.dumps(msg, default=date_default))
+        self._write_msg(msg, 'iopub')
 
     def on_kernel_restarted(self):
         logging.warn("kernel %s restarted", self.kernel_id)
@@ -626,6 +879,7 @@ _kernel_action_regex = r"(?P<action>restart|interrupt)"
 
 default_handlers = [
     (r"/api/kernels", MainKernelHandler),
+    (r"/api/kernels/batch", KernelBatchHandler),
     (r"/api/kernels/%s" % _kernel_id_regex, KernelHandler),
     (r"/api/kernels/%s/%s" % (_kernel_id_regex, _kernel_action_regex), KernelActionHandler),
     (r"/api/kernels/%s/channels" % _kernel_id_regex, ZMQChannelsHandler),
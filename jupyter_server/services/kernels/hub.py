@@ -0,0 +1,229 @@
+"""Per-kernel hub receiving IOPub messages once for all of their consumers."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import hmac
+
+from jupyter_client.adapter import adapt
+from jupyter_client.jsonutil import extract_dates
+from jupyter_client.session import Session
+from tornado.ioloop import IOLoop
+
+
+class KernelMessage(object):
+    """A message received from a kernel, verified once and parsed on demand.
+
+    The signature is checked and the header unpacked on creation.
+    The other parts are only unpacked when they are accessed,
+    and at most once, so that every consumer of the message
+    shares the same parsing work.
+
+    Parameters
+    ----------
+    session : jupyter_client.session.Session
+        The session used to verify and unpack the message.
+    msg_list : list of bytes
+        The zmq frames of the message, including the routing identities.
+    """
+
+    def __init__(self, session, msg_list):
+        self.session = session
+        self.msg_list = msg_list
+        self.idents, fed_msg_list = session.feed_identities(msg_list)
+        if len(fed_msg_list) < 5:
+            raise ValueError("malformed message, must have at least 5 elements")
+        if session.auth is not None:
+            signature = fed_msg_list[0]
+            if not signature:
+                raise ValueError("Unsigned Message")
+            check = session.sign(fed_msg_list[1:5])
+            if not hmac.compare_digest(signature, check):
+                raise ValueError("Invalid Signature: %r" % signature)
+        # header, parent_header, metadata, content and buffers
+        self.parts = fed_msg_list[1:]
+        self.header = session.unpack(self.parts[0])
+        self._parent_header = None
+        self._content = None
+        self._msg = None
+
+    @property
+    def msg_id(self):
+        return self.header['msg_id']
+
+    @property
+    def msg_type(self):
+        return self.header['msg_type']
+
+    @property
+    def nbytes(self):
+        """The size of the message frames"""
+        return sum(len(part) for part in self.msg_list)
+
+    @property
+    def parent_header(self):
+        if self._parent_header is None:
+            self._parent_header = self.session.unpack(self.parts[1])
+        return self._parent_header
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = self.session.unpack(self.parts[3])
+        return self._content
+
+    @property
+    def msg(self):
+        """The message dict, as returned by Session.deserialize"""
+        if self._msg is None:
+            self._msg = adapt({
+                'header': extract_dates(self.header),
+                'msg_id': self.msg_id,
+                'msg_type': self.msg_type,
+                'parent_header': extract_dates(self.parent_header),
+                'metadata': self.session.unpack(self.parts[2]),
+                'content': self.content,
+                'buffers': [memoryview(b) for b in self.parts[4:]],
+            })
+        return self._msg
+
+
+class KernelIOPubHub(object):
+    """Receives the IOPub messages of a kernel once, for all of their consumers.
+
+    A single IOPub stream is connected to the kernel. Each message is
+    verified and wrapped in a :class:`KernelMessage` before being
+    dispatched to every subscriber: activity tracking, offline message
+    buffering and the websocket connections to the kernel.
+
+    Consecutive ``stream`` messages with the same parent and stream name
+    can be coalesced into a single message, to send fewer and larger
+    messages when a kernel prints in a loop. Other messages flush the
+    pending stream output first, so the order of messages is preserved.
+
+    Parameters
+    ----------
+    kernel : KernelManager
+        The manager of the kernel to receive messages from.
+    log : logging.Logger, optional
+    coalesce_window : float
+        Seconds during which stream messages are coalesced. 0 disables coalescing.
+    """
+
+    def __init__(self, kernel, log=None, coalesce_window=0):
+        self.kernel = kernel
+        self.log = log
+        self.coalesce_window = coalesce_window
+        # stream messages being coalesced, and the timeout flushing them
+        self._pending_stream = []
+        self._flush_handle = None
+        self.session = Session(
+            config=kernel.session.config,
+            key=kernel.session.key,
+        )
+        self.stream = None
+        # whether a message was received since the stream was connected,
+        # i.e. the subscription to the kernel is established
+        self.receiving = False
+        self._subscribers = []
+        self.connect()
+
+    def connect(self):
+        """Connect the IOPub stream, replacing the current one if any.
+
+        Used to reconnect when the kernel's ports have changed on restart.
+        """
+        self.flush_pending()
+        self._close_stream()
+        self.receiving = False
+        self.stream = self.kernel.connect_iopub()
+        self.stream.channel = 'iopub'
+        self.stream.on_recv(self._on_recv)
+
+    def subscribe(self, callback):
+        """Call ``callback(kernel_msg)`` for each IOPub message."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Stop calling a subscribed callback."""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _on_recv(self, msg_list):
+        try:
+            kernel_msg = KernelMessage(self.session, msg_list)
+        except Exception:
+            if self.log:
+                self.log.error("Bad IOPub message", exc_info=True)
+            return
+        self.receiving = True
+        if self.coalesce_window > 0 and kernel_msg.msg_type == 'stream':
+            self._coalesce(kernel_msg)
+        else:
+            self.flush_pending()
+            self._dispatch(kernel_msg)
+
+    def _coalesce(self, kernel_msg):
+        pending = self._pending_stream
+        if pending and not self._same_stream(pending[0], kernel_msg):
+            self.flush_pending()
+        self._pending_stream.append(kernel_msg)
+        if self._flush_handle is None:
+            self._flush_handle = IOLoop.current().call_later(
+                self.coalesce_window, self.flush_pending,
+            )
+
+    @staticmethod
+    def _same_stream(a, b):
+        return (
+            a.parent_header.get('msg_id') == b.parent_header.get('msg_id')
+            and a.content.get('name') == b.content.get('name')
+        )
+
+    def flush_pending(self):
+        """Dispatch the stream messages being coalesced, as a single message"""
+        if self._flush_handle is not None:
+            IOLoop.current().remove_timeout(self._flush_handle)
+            self._flush_handle = None
+        pending, self._pending_stream = self._pending_stream, []
+        if len(pending) == 1:
+            self._dispatch(pending[0])
+        elif pending:
+            self._dispatch(self._merge(pending))
+
+    def _merge(self, kernel_msgs):
+        """Merge stream messages into one, with the header of the first one"""
+        first = kernel_msgs[0]
+        content = dict(first.content)
+        content['text'] = ''.join(kernel_msg.content.get('text', '') for kernel_msg in kernel_msgs)
+        msg_list = self.session.serialize({
+            'header': first.header,
+            'parent_header': first.parent_header,
+            'metadata': self.session.unpack(first.parts[2]),
+            'content': content,
+        })
+        return KernelMessage(self.session, first.idents + msg_list)
+
+    def _dispatch(self, kernel_msg):
+        # copy, since subscribers may unsubscribe while handling the message
+        for callback in list(self._subscribers):
+            try:
+                callback(kernel_msg)
+            except Exception:
+                if self.log:
+                    self.log.error("Error handling IOPub message", exc_info=True)
+
+    def _close_stream(self):
+        if self.stream is not None and not self.stream.closed():
+            self.stream.on_recv(None)
+            self.stream.close()
+
+    def close(self):
+        """Close the IOPub stream and drop all subscribers."""
+        if self._flush_handle is not None:
+            IOLoop.current().remove_timeout(self._flush_handle)
+            self._flush_handle = None
+        self._pending_stream = []
+        self._close_stream()
+        self._subscribers = []
@@ -7,26 +7,40 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 
-from collections import defaultdict
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from functools import partial
 import os
+import signal
+import time
 
-from tornado import web
+from tornado import gen, web
 from tornado.concurrent import Future
-from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.ioloop import IOLoop
 
-from jupyter_client.session import Session
 from jupyter_client.multikernelmanager import MultiKernelManager, AsyncMultiKernelManager
 from jupyter_core.paths import exists
 from traitlets import (Any, Bool, Dict, List, Unicode, TraitError, Integer,
        Float, Instance, default, validate
 )
 
-from jupyter_server.utils import to_os_path, ensure_async
+from jupyter_server.culler import IdleCuller
+from jupyter_server.utils import to_os_path, ensure_async, run_sync, shutdown_concurrently
 from jupyter_server._tz import utcnow, isoformat
 
-from jupyter_server.prometheus.metrics import KERNEL_CURRENTLY_RUNNING_TOTAL
+from jupyter_server.prometheus.metrics import (
+    KERNEL_CURRENTLY_RUNNING_TOTAL,
+    KERNEL_START_DURATION_SECONDS,
+    KERNEL_RESTART_DURATION_SECONDS,
+    KERNEL_INTERRUPT_DURATION_SECONDS,
+    KERNEL_SHUTDOWN_DURATION_SECONDS,
+)
+from jupyter_server.services.events.emitter import EventEmitter
+from jupyter_server.services.kernels.admission import KernelAdmission
+from jupyter_server.services.kernels.buffer import MessageBuffer
+from jupyter_server.services.kernels.hub import KernelIOPubHub
+from jupyter_server.services.kernels.pool import KernelPool
+from jupyter_server.services.kernels.ratelimiter import IOPubRateLimiter
 
 
 class MappingKernelManager(MultiKernelManager):
@@ -48,7 +62,13 @@ class MappingKernelManager(MultiKernelManager):
 
     _kernel_ports = Dict()
 
-    _culler_callback = None
+    _iopub_rate_limiters = Dict()
+
+    _iopub_hubs = Dict()
+
+    _kernel_info_futures = Dict()
+
+    _culler = None
 
     _initialized_culler = False
 
@@ -91,6 +111,11 @@ class MappingKernelManager(MultiKernelManager):
         Only effective if cull_idle_timeout > 0."""
     )
 
+    cull_concurrency = Integer(10, config=True,
+        help="""The maximum number of idle kernels shut down concurrently by the culler.
+        Values of 0 or lower disable the limit."""
+    )
+
     buffer_offline_messages = Bool(True, config=True,
         help="""Whether messages from kernels whose frontends have disconnected should be buffered in-memory.
 
@@ -102,6 +127,128 @@ class MappingKernelManager(MultiKernelManager):
         """
     )
 
+    buffer_max_bytes = Integer(100 * 1024 * 1024, config=True,
+        help="""Maximum number of bytes of offline messages to hold in memory per kernel.
+
+        When exceeded, the oldest messages are spilled to disk (see buffer_spill_dir)
+        or dropped, starting with the message types in buffer_drop_msg_types.
+        Values of 0 or lower disable the limit.
+        """
+    )
+
+    buffer_max_messages = Integer(0, config=True,
+        help="""Maximum number of offline messages to hold in memory per kernel.
+        Values of 0 or lower disable the limit.
+        """
+    )
+
+    buffer_drop_msg_types = List(Unicode(), ['stream', 'display_data', 'update_display_data'], config=True,
+        help="""IOPub message types that are dropped first when the offline message buffer is full.
+
+        Other messages (e.g. status and execute_reply) are only dropped
+        once no messages of these types remain in the buffer.
+        """
+    )
+
+    buffer_spill_dir = Unicode('', config=True,
+        help="""Directory in which offline messages exceeding the in-memory limits are stored.
+
+        Spilled messages are replayed on reconnect along with the in-memory ones.
+        The spill file is removed when buffering stops.
+        The default ('') disables spilling, so messages exceeding the limits are dropped.
+        """
+    )
+
+    buffer_spill_max_bytes = Integer(1024 * 1024 * 1024, config=True,
+        help="""Maximum number of bytes of offline messages to spill to disk per kernel.
+        Values of 0 or lower disable the limit.
+        """
+    )
+
+    iopub_coalesce_window = Float(0, config=True,
+        help="""(sec) Time window during which consecutive IOPub stream messages are coalesced.
+
+        Stream messages with the same parent and stream name received within
+        this window are merged into a single message, before rate limiting and
+        sending to clients. This reduces the number of websocket messages when
+        a kernel prints in a loop, e.g. with a window of 0.02.
+        0 (default) disables coalescing.
+        """
+    )
+
+    shutdown_all_concurrency = Integer(50, config=True,
+        help="""The maximum number of kernels shut down concurrently when shutting down all kernels,
+        e.g. when the server stops. Values of 0 or lower disable the limit.
+
+        Only used by the AsyncMappingKernelManager, the MappingKernelManager
+        shuts kernels down one at a time."""
+    )
+
+    shutdown_all_timeout = Float(30, config=True,
+        help="""Timeout (in seconds) for shutting down all kernels, e.g. when the server stops.
+
+        Kernels still shutting down after this timeout are killed, and the kernels
+        that are not shutting down yet are shut down without waiting for them to
+        exit gracefully. Values of 0 or lower disable the timeout.
+        Only used by the AsyncMappingKernelManager."""
+    )
+
+    batch_concurrency = Integer(10, config=True,
+        help="""The maximum number of operations of a POST /api/kernels/batch request run concurrently.
+        Values of 0 or lower disable the limit."""
+    )
+
+    batch_max_operations = Integer(100, config=True,
+        help="""The maximum number of operations in a POST /api/kernels/batch request.
+        Values of 0 or lower disable the limit."""
+    )
+
+    kernel_pool = Dict(Integer(), config=True,
+        help="""The number of started kernels to keep ready, by kernel name, e.g. {"python3": 4}.
+
+        New kernels are taken from this pool when available, and a replacement
+        is started in the background. Pooled kernels are started in root_dir;
+        they are only used for other directories if their working directory can
+        be changed, which is only supported for Python kernels.
+        Pooled kernels are not listed, and are not culled until they are used.
+        """
+    )
+
+    max_kernels = Integer(0, config=True,
+        help="""The maximum number of kernels, including the kernels being started.
+
+        Further starts wait until a kernel is shut down (see start_queue_timeout).
+        Kernels of the kernel pool are not counted. Values of 0 or lower disable the limit."""
+    )
+
+    max_kernels_per_name = Dict(Integer(), config=True,
+        help="""The maximum number of kernels by kernel name, e.g. {"python3": 20},
+        including the kernels being started."""
+    )
+
+    max_concurrent_starts = Integer(0, config=True,
+        help="""The maximum number of kernels being started at once.
+
+        Further starts wait until a start completes. Values of 0 or lower disable the limit."""
+    )
+
+    max_queued_starts = Integer(100, config=True,
+        help="""The maximum number of kernel starts waiting for the limits on kernels
+        (see max_kernels, max_kernels_per_name and max_concurrent_starts).
+
+        Further starts are rejected with 503 Service Unavailable.
+        Values of 0 or lower disable the limit."""
+    )
+
+    start_queue_timeout = Float(60, config=True,
+        help="""Timeout (in seconds) after which waiting kernel starts are rejected
+        with 503 Service Unavailable. Values of 0 or lower disable the timeout."""
+    )
+
+    start_retry_after = Integer(10, config=True,
+        help="""The Retry-After delay (in seconds) sent to clients whose kernel start was rejected."""
+    )
+
     kernel_info_timeout = Float(60, config=True,
         help="""Timeout for giving up on a kernel (in seconds).
 
@@ -114,6 +261,34 @@ class MappingKernelManager(MultiKernelManager):
         """
     )
 
+    _kernel_pool = Any()
+    @default('_kernel_pool')
+    def _default_kernel_pool(self):
+        return KernelPool(self.kernel_pool, self._start_pooled_kernel, log=self.log)
+
+    events = Any(help="The EventEmitter notifying the kernels added, removed or changed")
+    @default('events')
+    def _default_events(self):
+        return EventEmitter('kernels', log=self.log)
+
+    _admission = Any()
+    @default('_admission')
+    def _default_admission(self):
+        return KernelAdmission(
+            self._count_kernels,
+            max_kernels=self.max_kernels,
+            max_kernels_per_name=self.max_kernels_per_name,
+            max_starts=self.max_concurrent_starts,
+            max_queued=self.max_queued_starts,
+            timeout=self.start_queue_timeout,
+            retry_after=self.start_retry_after,
+            log=self.log,
+        )
+
+    def _count_kernels(self):
+        """Count the running kernels by kernel name, excluding the kernel pool"""
+        return Counter(self._kernels[kernel_id].kernel_name for kernel_id in self.list_kernel_ids())
+
     _kernel_buffers = Any()
     @default('_kernel_buffers')
     def _default_kernel_buffers(self):
@@ -152,7 +327,15 @@ class MappingKernelManager(MultiKernelManager):
     def _handle_kernel_died(self, kernel_id):
         """notice that a kernel died"""
         self.log.warning("Kernel %s died, removing from map.", kernel_id)
+        pooled = kernel_id in self._kernel_pool
+        self._kernel_pool.discard(kernel_id)
+        self._close_iopub_rate_limiter(kernel_id)
+        self._close_iopub_hub(kernel_id)
+        self._kernel_info_futures.pop(kernel_id, None)
         self.remove_kernel(kernel_id)
+        if not pooled:
+            self.events.emit('removed', kernel_id)
+        self._admission.wake()
 
     def cwd_for_path(self, path):
         """Turn API path into absolute OS path."""
@@ -182,23 +365,49 @@ class MappingKernelManager(MultiKernelManager):
         if kernel_id is None:
             if path is not None:
                 kwargs['cwd'] = self.cwd_for_path(path)
-            kernel_id = await ensure_async(self.pinned_superclass.start_kernel(self, **kwargs))
+            self.fill_kernel_pool()
+            kernel_name = kwargs.get('kernel_name') or self.default_kernel_name
+            admission = self._admission
+            if admission.enabled:
+                await admission.acquire(kernel_name)
+            started = time.monotonic()
+            try:
+                kernel_id = await self._take_pooled_kernel(**kwargs)
+                pooled = kernel_id is not None
+                if pooled:
+                    phase = 'pool'
+                else:
+                    kernel_id = await ensure_async(self.pinned_superclass.start_kernel(self, **kwargs))
+                    phase = 'launch'
+                    IOLoop.current().add_callback(self._observe_kernel_startup, kernel_id, started)
+            finally:
+                if admission.enabled:
+                    admission.release(kernel_name)
+            KERNEL_START_DURATION_SECONDS.labels(
+                type=self._kernels[kernel_id].kernel_name, phase=phase,
+            ).observe(time.monotonic() - started)
             self._kernel_connections[kernel_id] = 0
             self._kernel_ports[kernel_id] = self._kernels[kernel_id].ports
             self.start_watching_activity(kernel_id)
-            self.log.info("Kernel started: %s" % kernel_id)
+            if pooled:
+                self._kernels[kernel_id].execution_state = 'idle'
+                self.log.info("Kernel started from pool: %s" % kernel_id)
+            else:
+                self.log.info("Kernel started: %s" % kernel_id)
+                # register callback for failed auto-restart,
+                # pooled kernels registered it when they were started
+                self.add_restart_callback(kernel_id,
+                    lambda : self._handle_kernel_died(kernel_id),
+                    'dead',
+                )
             self.log.debug("Kernel args: %r" % kwargs)
-            # register callback for failed auto-restart
-            self.add_restart_callback(kernel_id,
-                lambda : self._handle_kernel_died(kernel_id),
-                'dead',
-            )
 
             # Increase the metric of number of kernels running
             # for the relevant kernel type by 1
             KERNEL_CURRENTLY_RUNNING_TOTAL.labels(
                 type=self._kernels[kernel_id].kernel_name
             ).inc()
+            self.events.emit('added', kernel_id, self.kernel_model(kernel_id))
 
         else:
             self._check_kernel_id(kernel_id)
@@ -207,9 +416,129 @@ class MappingKernelManager(MultiKernelManager):
         # Initialize culling if not already
         if not self._initialized_culler:
             self.initialize_culler()
+        if self._culler is not None:
+            self._culler.add(kernel_id)
+
+        return kernel_id
 
+    async def _observe_kernel_startup(self, kernel_id, started):
+        """Record when a new kernel first replies to a heartbeat and to a kernel_info_request"""
+        kernel = self._kernels.get(kernel_id)
+        if kernel is None:
+            return
+        try:
+            await self._ping_heartbeat(kernel)
+            KERNEL_START_DURATION_SECONDS.labels(
+                type=kernel.kernel_name, phase='heartbeat',
+            ).observe(time.monotonic() - started)
+            # cached for the first connection to the kernel
+            info = await self.request_kernel_info(kernel_id)
+            if info:
+                KERNEL_START_DURATION_SECONDS.labels(
+                    type=kernel.kernel_name, phase='kernel_info',
+                ).observe(time.monotonic() - started)
+        except Exception as e:
+            self.log.debug("Could not time the startup of kernel %s: %s", kernel_id, e)
+
+    async def _ping_heartbeat(self, kernel):
+        """Wait for a kernel to reply to a heartbeat"""
+        stream = kernel.connect_hb()
+        future = Future()
+        stream.on_recv(lambda msg: future.done() or future.set_result(msg))
+        try:
+            stream.send(b'ping')
+            await gen.with_timeout(timedelta(seconds=self.kernel_info_timeout), future)
+        finally:
+            stream.close()
+
+    def fill_kernel_pool(self):
+        """Start the kernels of the pool (see kernel_pool) that are not started yet"""
+        self._kernel_pool.fill()
+
+    async def _start_pooled_kernel(self, kernel_name):
+        """Start a kernel for the pool, and wait for it to be ready"""
+        kernel_id = self.new_kernel_id(kernel_name=kernel_name)
+        # reserved before the start, so that the kernel is not listed or counted while warming up
+        self._kernel_pool.reserve(kernel_id)
+        try:
+            await ensure_async(self.pinned_superclass.start_kernel(
+                self, kernel_id=kernel_id, kernel_name=kernel_name, cwd=self.root_dir,
+            ))
+        except Exception:
+            self._kernel_pool.discard(kernel_id)
+            raise
+        self.add_restart_callback(kernel_id,
+            lambda : self._handle_kernel_died(kernel_id),
+            'dead',
+        )
+        try:
+            await self._shell_request(kernel_id, 'kernel_info_request')
+        except Exception:
+            self._kernel_pool.discard(kernel_id)
+            await ensure_async(self.pinned_superclass.shutdown_kernel(self, kernel_id, now=True))
+            raise
+        return kernel_id
+
+    async def _take_pooled_kernel(self, kernel_name=None, cwd=None, **kwargs):
+        """Take a kernel from the pool, if possible, and set its working directory.
+
+        Returns None if no pooled kernel can be used.
+        """
+        if kwargs or not self._kernel_pool.sizes:
+            # other arguments cannot be applied to a started kernel
+            return None
+        kernel_name = kernel_name or self.default_kernel_name
+        chdir = cwd is not None and os.path.abspath(cwd) != self.root_dir
+        if chdir:
+            try:
+                language = self.kernel_spec_manager.get_kernel_spec(kernel_name).language
+            except Exception:
+                return None
+            if language != 'python':
+                return None
+
+        kernel_id = self._kernel_pool.take(kernel_name)
+        if kernel_id is None or not chdir:
+            return kernel_id
+        code = "import os as __os; __os.chdir(%r); del __os" % cwd
+        try:
+            reply = await self._shell_request(kernel_id, 'execute_request', {
+                'code': code,
+                'silent': True,
+                'store_history': False,
+                'user_expressions': {},
+                'allow_stdin': False,
+            })
+            if reply['content']['status'] != 'ok':
+                raise RuntimeError(reply['content'].get('evalue', 'execute_request failed'))
+        except Exception as e:
+            self.log.warning("Could not change the directory of pooled kernel %s: %s", kernel_id, e)
+            await ensure_async(self.pinned_superclass.shutdown_kernel(self, kernel_id, now=True))
+            return None
+        # restarts launch the kernel in its new directory
+        launch_args = getattr(self._kernels[kernel_id], '_launch_args', None)
+        if launch_args is not None:
+            launch_args['cwd'] = cwd
         return kernel_id
 
+    async def _shell_request(self, kernel_id, msg_type, content=None):
+        """Send a request to a kernel on a transient shell channel and return the reply"""
+        kernel = self.get_kernel(kernel_id)
+        channel = kernel.connect_shell()
+        future = Future()
+
+        def on_reply(msg_list):
+            if not future.done():
+                idents, msg_list = kernel.session.feed_identities(msg_list)
+                future.set_result(kernel.session.deserialize(msg_list))
+
+        channel.on_recv(on_reply)
+        try:
+            kernel.session.send(channel, msg_type, content)
+            return await gen.with_timeout(timedelta(seconds=self.kernel_info_timeout), future)
+        finally:
+            channel.close()
+
     def ports_changed(self, kernel_id):
         """Used by ZMQChannelsHandler to determine how to coordinate nudge and replays.
 
@@ -256,7 +585,8 @@ class MappingKernelManager(MultiKernelManager):
             If the session_key matches the current buffered session_key,
             the buffer will be returned.
         channels : dict({'channel': ZMQStream})
-            The zmq channels whose messages should be buffered.
+            The zmq channels whose messages should be buffered,
+            in addition to the IOPub messages received by the kernel's hub.
         """
 
         if not self.buffer_offline_messages:
@@ -271,18 +601,30 @@ class MappingKernelManager(MultiKernelManager):
         buffer_info = self._kernel_buffers[kernel_id]
         # record the session key because only one session can buffer
         buffer_info['session_key'] = session_key
-        # TODO: the buffer should likely be a memory bounded queue, we're starting with a list to keep it simple
-        buffer_info['buffer'] = []
+        buffer_info['buffer'] = MessageBuffer(
+            max_bytes=max(self.buffer_max_bytes, 0),
+            max_messages=max(self.buffer_max_messages, 0),
+            drop_msg_types=self.buffer_drop_msg_types,
+            spill_dir=self.buffer_spill_dir,
+            spill_max_bytes=max(self.buffer_spill_max_bytes, 0),
+            log=self.log,
+        )
         buffer_info['channels'] = channels
 
         # forward any future messages to the internal buffer
         def buffer_msg(channel, msg_parts):
             self.log.debug("Buffering msg on %s:%s", kernel_id, channel)
-            buffer_info['buffer'].append((channel, msg_parts))
+            buffer_info['buffer'].append(channel, msg_parts)
 
         for channel, stream in channels.items():
             stream.on_recv(partial(buffer_msg, channel))
 
+        def buffer_iopub_msg(kernel_msg):
+            buffer_msg('iopub', kernel_msg.msg_list)
+
+        buffer_info['iopub_callback'] = buffer_iopub_msg
+        self.get_iopub_hub(kernel_id).subscribe(buffer_iopub_msg)
+
     def get_buffer(self, kernel_id, session_key):
         """Get the buffer for a given kernel
 
@@ -303,6 +645,9 @@ class MappingKernelManager(MultiKernelManager):
         if buffer_info['session_key'] == session_key:
             # remove buffer
             self._kernel_buffers.pop(kernel_id)
+            # the buffered channels are handed over with the buffer,
+            # but IOPub messages are no longer buffered
+            self._unsubscribe_iopub_buffer(kernel_id, buffer_info)
             # only return buffer_info if it's a match
             return buffer_info
         else:
@@ -322,6 +667,7 @@ class MappingKernelManager(MultiKernelManager):
         if kernel_id not in self._kernel_buffers:
             return
         buffer_info = self._kernel_buffers.pop(kernel_id)
+        self._unsubscribe_iopub_buffer(kernel_id, buffer_info)
         # close buffering streams
         for stream in buffer_info['channels'].values():
             if not stream.closed():
@@ -332,37 +678,187 @@ class MappingKernelManager(MultiKernelManager):
         if msg_buffer:
             self.log.info("Discarding %s buffered messages for %s",
                 len(msg_buffer), buffer_info['session_key'])
+        if hasattr(msg_buffer, 'close'):
+            msg_buffer.close()
+
+    def _unsubscribe_iopub_buffer(self, kernel_id, buffer_info):
+        callback = buffer_info.pop('iopub_callback', None)
+        hub = self._iopub_hubs.get(kernel_id)
+        if callback is not None and hub is not None:
+            hub.unsubscribe(callback)
+
+    def get_iopub_hub(self, kernel_id):
+        """Get the hub receiving the IOPub messages of a kernel
+
+        A single IOPub stream is connected to each kernel, and its messages
+        are dispatched to activity tracking, offline message buffering
+        and every websocket connection to the kernel.
+
+        Parameters
+        ----------
+        kernel_id : str
+            The id of the kernel.
+        """
+        self._check_kernel_id(kernel_id)
+        hub = self._iopub_hubs.get(kernel_id)
+        if hub is None:
+            hub = self._iopub_hubs[kernel_id] = KernelIOPubHub(
+                self.get_kernel(kernel_id),
+                log=self.log,
+                coalesce_window=max(self.iopub_coalesce_window, 0),
+            )
+        return hub
+
+    def _close_iopub_hub(self, kernel_id):
+        hub = self._iopub_hubs.pop(kernel_id, None)
+        if hub is not None:
+            hub.close()
+
+    def request_kernel_info(self, kernel_id):
+        """Get the content of the kernel_info reply of a kernel
+
+        Returns a Future. The reply is cached until the kernel is restarted,
+        and concurrent calls share a single request. If the kernel does not
+        reply within kernel_info_timeout, the Future resolves to an empty dict
+        and the next call sends a new request.
+        """
+        self._check_kernel_id(kernel_id)
+        future = self._kernel_info_futures.get(kernel_id)
+        if future is None:
+            self.log.debug("Requesting kernel info from %s", kernel_id)
+            future = self._kernel_info_futures[kernel_id] = Future()
+            IOLoop.current().add_callback(self._request_kernel_info, kernel_id, future)
+        elif not future.done():
+            self.log.debug("Waiting for pending kernel_info request")
+        return future
+
+    async def _request_kernel_info(self, kernel_id, future):
+        info = {}
+        try:
+            reply = await self._shell_request(kernel_id, 'kernel_info_request')
+        except Exception as e:
+            self.log.warning("Kernel info request failed for %s: %s", kernel_id, e)
+        else:
+            info = reply['content']
+            self.log.debug("Received kernel info: %s", info)
+            if reply['msg_type'] != 'kernel_info_reply' or 'protocol_version' not in info:
+                self.log.error("Kernel info request failed, assuming current %s", info)
+                info = {}
+        if not info and self._kernel_info_futures.get(kernel_id) is future:
+            # not cached, the next connection tries again
+            del self._kernel_info_futures[kernel_id]
+        future.set_result(info)
+
+    def get_iopub_rate_limiter(self, kernel_id, msg_rate_limit=0, data_rate_limit=0, window=1.0):
+        """Get the IOPub rate limiter shared by all connections to a kernel
+
+        Parameters
+        ----------
+        kernel_id : str
+            The id of the kernel.
+        msg_rate_limit : float
+            Maximum messages per second. 0 disables the limit.
+        data_rate_limit : float
+            Maximum bytes of stream output per second. 0 disables the limit.
+        window : float
+            Time window in seconds over which the rates are measured.
+        """
+        self._check_kernel_id(kernel_id)
+        limiter = self._iopub_rate_limiters.get(kernel_id)
+        if limiter is None:
+            limiter = self._iopub_rate_limiters[kernel_id] = IOPubRateLimiter(
+                kernel_name=self.get_kernel(kernel_id).kernel_name,
+                log=self.log,
+            )
+        limiter.msg_rate_limit = msg_rate_limit
+        limiter.data_rate_limit = data_rate_limit
+        limiter.window = window
+        return limiter
+
+    def _close_iopub_rate_limiter(self, kernel_id):
+        limiter = self._iopub_rate_limiters.pop(kernel_id, None)
+        if limiter is not None:
+            limiter.close()
 
     def shutdown_kernel(self, kernel_id, now=False, restart=False):
         """Shutdown a kernel by kernel_id"""
         self._check_kernel_id(kernel_id)
+        kernel_name = self._kernels[kernel_id].kernel_name
+        started = time.monotonic()
         self.stop_watching_activity(kernel_id)
         self.stop_buffering(kernel_id)
+        self._close_iopub_rate_limiter(kernel_id)
+        self._close_iopub_hub(kernel_id)
+        self._kernel_info_futures.pop(kernel_id, None)
         self._kernel_connections.pop(kernel_id, None)
 
-        # Decrease the metric of number of kernels
-        # running for the relevant kernel type by 1
-        KERNEL_CURRENTLY_RUNNING_TOTAL.labels(
-            type=self._kernels[kernel_id].kernel_name
-        ).dec()
+        pooled = kernel_id in self._kernel_pool
+        if pooled:
+            self._kernel_pool.discard(kernel_id)
+        else:
+            # Decrease the metric of number of kernels
+            # running for the relevant kernel type by 1
+            KERNEL_CURRENTLY_RUNNING_TOTAL.labels(
+                type=self._kernels[kernel_id].kernel_name
+            ).dec()
 
         self.pinned_superclass.shutdown_kernel(self, kernel_id, now=now, restart=restart)
+        KERNEL_SHUTDOWN_DURATION_SECONDS.labels(type=kernel_name).observe(time.monotonic() - started)
         # Unlike its async sibling method in AsyncMappingKernelManager, removing the kernel_id
         # from the connections dictionary isn't as problematic before the shutdown since the
         # method is synchronous.  However, we'll keep the relative call orders the same from
         # a maintenance perspective.
         self._kernel_connections.pop(kernel_id, None)
         self._kernel_ports.pop(kernel_id, None)
+        if not pooled:
+            self.events.emit('removed', kernel_id)
+        self._admission.wake()
+
+    def shutdown_all(self, now=False):
+        """Shutdown all kernels, one at a time
+
+        Each shutdown blocks, see AsyncMappingKernelManager for concurrent
+        shutdowns within a deadline.
+        """
+        # including the kernel pool, once the kernels being started are registered
+        run_sync(self._kernel_pool.close())
+        for kernel_id in list(self._kernels):
+            self.shutdown_kernel(kernel_id, now=now)
+
+    async def _kill_kernel_process(self, kernel_id):
+        """Kill a kernel whose graceful shutdown is taking too long
+
+        The pending shutdown then completes as soon as the process has exited.
+        """
+        kernel = self._kernels.get(kernel_id)
+        if kernel is not None and kernel.has_kernel:
+            self.log.warning("Killing kernel %s", kernel_id)
+            await ensure_async(kernel.signal_kernel(getattr(signal, 'SIGKILL', signal.SIGTERM)))
 
     async def restart_kernel(self, kernel_id, now=False):
         """Restart a kernel by kernel_id"""
         self._check_kernel_id(kernel_id)
+        started = time.monotonic()
         await ensure_async(self.pinned_superclass.restart_kernel(self, kernel_id, now=now))
+        # requests sent during the restart may not be answered
+        self._kernel_info_futures.pop(kernel_id, None)
+        hub = self._iopub_hubs.get(kernel_id)
+        if hub is not None:
+            # connections nudge the new kernel until it is publishing
+            hub.receiving = False
         kernel = self.get_kernel(kernel_id)
         # return a Future that will resolve when the kernel has successfully restarted
         channel = kernel.connect_shell()
         future = Future()
 
+        def observe_duration(future):
+            if not future.cancelled() and future.exception() is None:
+                KERNEL_RESTART_DURATION_SECONDS.labels(
+                    type=kernel.kernel_name,
+                ).observe(time.monotonic() - started)
+
+        future.add_done_callback(observe_duration)
+
         def finish():
             """Common cleanup when restart finishes/fails for any reason."""
             if not channel.closed():
@@ -396,18 +892,30 @@ class MappingKernelManager(MultiKernelManager):
         # Re-establish activity watching if ports have changed...
         if self._get_changed_ports(kernel_id) is not None:
             self.stop_watching_activity(kernel_id)
+            self.get_iopub_hub(kernel_id).connect()
             self.start_watching_activity(kernel_id)
         return future
 
+    def interrupt_kernel(self, kernel_id):
+        """Interrupt a kernel by kernel_id"""
+        self._check_kernel_id(kernel_id)
+        started = time.monotonic()
+        self.pinned_superclass.interrupt_kernel(self, kernel_id)
+        KERNEL_INTERRUPT_DURATION_SECONDS.labels(
+            type=self._kernels[kernel_id].kernel_name,
+        ).observe(time.monotonic() - started)
+
     def notify_connect(self, kernel_id):
         """Notice a new connection to a kernel"""
         if kernel_id in self._kernel_connections:
             self._kernel_connections[kernel_id] += 1
+            self.events.emit('connections', kernel_id, self.kernel_model(kernel_id))
 
     def notify_disconnect(self, kernel_id):
         """Notice a disconnection from a kernel"""
         if kernel_id in self._kernel_connections:
             self._kernel_connections[kernel_id] -= 1
+            self.events.emit('connections', kernel_id, self.kernel_model(kernel_id))
 
     def kernel_model(self, kernel_id):
         """Return a JSON-safe dict representing a kernel
@@ -426,10 +934,24 @@ class MappingKernelManager(MultiKernelManager):
         }
         return model
 
+    def list_version(self):
+        """Return a version of the list of kernels, which changes whenever the list changes.
+
+        Returns None if it is not known.
+        """
+        return '%s-%s' % (self.events.version, self.last_kernel_activity.timestamp())
+
+    def list_kernel_ids(self):
+        """Return a list of the ids of the running kernels, excluding the kernel pool."""
+        return [
+            kernel_id for kernel_id in self.pinned_superclass.list_kernel_ids(self)
+            if kernel_id not in self._kernel_pool
+        ]
+
     def list_kernels(self):
         """Returns a list of kernel_id's of kernels running."""
         kernels = []
-        kernel_ids = self.pinned_superclass.list_kernel_ids(self)
+        kernel_ids = self.list_kernel_ids()
         for kernel_id in kernel_ids:
             try:
                 model = self.kernel_model(kernel_id)
@@ -456,34 +978,37 @@ class MappingKernelManager(MultiKernelManager):
         # add busy/activity markers:
         kernel.execution_state = 'starting'
         kernel.last_activity = utcnow()
-        kernel._activity_stream = kernel.connect_iopub()
-        session = Session(
-            config=kernel.session.config,
-            key=kernel.session.key,
-        )
 
-        def record_activity(msg_list):
-            """Record an IOPub message arriving from a kernel"""
-            self.last_kernel_activity = kernel.last_activity = utcnow()
+        def record_activity(kernel_msg):
+            """Record an IOPub message arriving from a kernel
 
-            idents, fed_msg_list = session.feed_identities(msg_list)
-            msg = session.deserialize(fed_msg_list)
+            Only the header is parsed, and the content of status messages,
+            so that large outputs are not decoded just to track activity.
+            """
+            self.last_kernel_activity = kernel.last_activity = utcnow()
 
-            msg_type = msg['header']['msg_type']
+            msg_type = kernel_msg.msg_type
             if msg_type == 'status':
-                kernel.execution_state = msg['content']['execution_state']
+                execution_state = kernel_msg.content['execution_state']
+                changed = execution_state != kernel.execution_state
+                kernel.execution_state = execution_state
                 self.log.debug("activity on %s: %s (%s)", kernel_id, msg_type, kernel.execution_state)
+                if changed:
+                    self.events.emit('execution_state', kernel_id, self.kernel_model(kernel_id))
             else:
                 self.log.debug("activity on %s: %s", kernel_id, msg_type)
 
-        kernel._activity_stream.on_recv(record_activity)
+        kernel._activity_callback = record_activity
+        self.get_iopub_hub(kernel_id).subscribe(record_activity)
 
     def stop_watching_activity(self, kernel_id):
         """Stop watching IOPub messages on a kernel for activity."""
         kernel = self._kernels[kernel_id]
-        if kernel._activity_stream:
-            kernel._activity_stream.close()
-            kernel._activity_stream = None
+        hub = self._iopub_hubs.get(kernel_id)
+        if getattr(kernel, '_activity_callback', None):
+            if hub is not None:
+                hub.unsubscribe(kernel._activity_callback)
+            kernel._activity_callback = None
 
     def initialize_culler(self):
         """Start idle culler if 'cull_idle_timeout' is greater than zero.
@@ -491,34 +1016,45 @@ class MappingKernelManager(MultiKernelManager):
         Regardless of that value, set flag that we've been here.
         """
         if not self._initialized_culler and self.cull_idle_timeout > 0:
-            if self._culler_callback is None:
-                loop = IOLoop.current()
+            if self._culler is None:
                 if self.cull_interval <= 0: #handle case where user set invalid value
                     self.log.warning("Invalid value for 'cull_interval' detected (%s) - using default value (%s).",
                         self.cull_interval, self.cull_interval_default)
                     self.cull_interval = self.cull_interval_default
-                self._culler_callback = PeriodicCallback(
-                    self.cull_kernels, 1000*self.cull_interval)
+                self._culler = IdleCuller(
+                    timeout=self.cull_idle_timeout,
+                    interval=self.cull_interval,
+                    get_last_activity=self._get_kernel_last_activity,
+                    cull=self.cull_kernel_if_idle,
+                    callback=self.cull_kernels,
+                    concurrency=max(self.cull_concurrency, 0),
+                    log=self.log,
+                )
+                for kernel_id in self.list_kernel_ids():
+                    self._culler.add(kernel_id)
                 self.log.info("Culling kernels with idle durations > %s seconds at %s second intervals ...",
                     self.cull_idle_timeout, self.cull_interval)
                 if self.cull_busy:
                     self.log.info("Culling kernels even if busy")
                 if self.cull_connected:
                     self.log.info("Culling kernels even with connected clients")
-                self._culler_callback.start()
+                self._culler.start()
 
         self._initialized_culler = True
 
+    def _get_kernel_last_activity(self, kernel_id):
+        return getattr(self._kernels[kernel_id], 'last_activity', None)
+
     async def cull_kernels(self):
-        self.log.debug("Polling every %s seconds for kernels idle > %s seconds...",
-            self.cull_interval, self.cull_idle_timeout)
-        """Create a separate list of kernels to avoid conflicting updates while iterating"""
-        for kernel_id in list(self._kernels):
-            try:
-                await self.cull_kernel_if_idle(kernel_id)
-            except Exception as e:
-                self.log.exception("The following exception was encountered while checking the idle duration of kernel %s: %s",
-                    kernel_id, e)
+        """Cull the kernels whose idle duration may exceed the cull timeout.
+
+        Only the kernels that have not been active since the timeout
+        are checked, the culler is woken up when the next one expires.
+        """
+        self.log.debug("Checking kernels idle > %s seconds, at most every %s seconds...",
+            self.cull_idle_timeout, self.cull_interval)
+        if self._culler is not None:
+            await self._culler.cull_expired()
 
     async def cull_kernel_if_idle(self, kernel_id):
         kernel = self._kernels[kernel_id]
@@ -556,17 +1092,58 @@ class AsyncMappingKernelManager(MappingKernelManager, AsyncMultiKernelManager):
     async def shutdown_kernel(self, kernel_id, now=False, restart=False):
         """Shutdown a kernel by kernel_id"""
         self._check_kernel_id(kernel_id)
+        kernel_name = self._kernels[kernel_id].kernel_name
+        started = time.monotonic()
         self.stop_watching_activity(kernel_id)
         self.stop_buffering(kernel_id)
+        self._close_iopub_rate_limiter(kernel_id)
+        self._close_iopub_hub(kernel_id)
+        self._kernel_info_futures.pop(kernel_id, None)
 
-        # Decrease the metric of number of kernels
-        # running for the relevant kernel type by 1
-        KERNEL_CURRENTLY_RUNNING_TOTAL.labels(
-            type=self._kernels[kernel_id].kernel_name
-        ).dec()
+        pooled = kernel_id in self._kernel_pool
+        if pooled:
+            self._kernel_pool.discard(kernel_id)
+        else:
+            # Decrease the metric of number of kernels
+            # running for the relevant kernel type by 1
+            KERNEL_CURRENTLY_RUNNING_TOTAL.labels(
+                type=self._kernels[kernel_id].kernel_name
+            ).dec()
 
         # Finish shutting down the kernel before clearing state to avoid a race condition.
         ret = await self.pinned_superclass.shutdown_kernel(self, kernel_id, now=now, restart=restart)
+        KERNEL_SHUTDOWN_DURATION_SECONDS.labels(type=kernel_name).observe(time.monotonic() - started)
         self._kernel_connections.pop(kernel_id, None)
         self._kernel_ports.pop(kernel_id, None)
+        if not pooled:
+            self.events.emit('removed', kernel_id)
+        self._admission.wake()
         return ret
+
+    async def interrupt_kernel(self, kernel_id):
+        """Interrupt a kernel by kernel_id"""
+        self._check_kernel_id(kernel_id)
+        started = time.monotonic()
+        await ensure_async(self.pinned_superclass.interrupt_kernel(self, kernel_id))
+        KERNEL_INTERRUPT_DURATION_SECONDS.labels(
+            type=self._kernels[kernel_id].kernel_name,
+        ).observe(time.monotonic() - started)
+
+    async def shutdown_all(self, now=False):
+        """Shutdown all kernels, concurrently
+
+        See shutdown_all_concurrency and shutdown_all_timeout.
+        """
+        # including the kernel pool
+        await self._kernel_pool.close()
+        await shutdown_concurrently(
+            list(self._kernels),
+            shutdown=lambda kernel_id, past_deadline: self.shutdown_kernel(
+                kernel_id, now=now or past_deadline,
+            ),
+            kill=self._kill_kernel_process,
+            concurrency=self.shutdown_all_concurrency,
+            timeout=self.shutdown_all_timeout,
+            log=self.log,
+            kind='kernel',
+        )
@@ -0,0 +1,126 @@
+"""A pool of pre-started kernels."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from jupyter_server.prometheus.metrics import (
+    KERNEL_POOL_REQUESTS_TOTAL,
+    KERNEL_POOL_READY_TOTAL,
+    KERNEL_POOL_REFILL_DURATION_SECONDS,
+)
+
+
+class KernelPool(object):
+    """Started kernels ready to be handed out, per kernel name.
+
+    Kernels are started in the background, and a replacement is started
+    each time a kernel is taken out of the pool.
+
+    Parameters
+    ----------
+    sizes : dict
+        The number of kernels to keep ready, by kernel name.
+    start : coroutine function
+        ``start(kernel_name)`` starts a kernel, waits for it to be ready
+        and returns its id. It should reserve the id before the kernel
+        is started, see reserve.
+    log : logging.Logger, optional
+    """
+
+    def __init__(self, sizes, start, log=None):
+        self.sizes = {name: size for name, size in sizes.items() if size > 0}
+        self.start = start
+        self.log = log
+        self._ready = defaultdict(deque)
+        self._kernel_ids = set()
+        self._starting = defaultdict(int)
+        self._tasks = set()
+        self._closed = False
+
+    def __contains__(self, kernel_id):
+        return kernel_id in self._kernel_ids
+
+    def __len__(self):
+        return len(self._kernel_ids)
+
+    def fill(self):
+        """Start kernels in the background until the pool is full."""
+        if self._closed:
+            return
+        for name, size in self.sizes.items():
+            missing = size - len(self._ready[name]) - self._starting[name]
+            for i in range(missing):
+                self._starting[name] += 1
+                task = asyncio.ensure_future(self._start_kernel(name))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _start_kernel(self, name):
+        start = time.monotonic()
+        try:
+            kernel_id = await self.start(name)
+        except Exception as e:
+            # not retried until a kernel is taken, to avoid a start loop
+            if self.log:
+                self.log.error("Failed to start a %s kernel for the pool: %s", name, e)
+            return
+        finally:
+            self._starting[name] -= 1
+        duration = time.monotonic() - start
+        KERNEL_POOL_REFILL_DURATION_SECONDS.labels(type=name).observe(duration)
+        self._ready[name].append(kernel_id)
+        self._kernel_ids.add(kernel_id)
+        KERNEL_POOL_READY_TOTAL.labels(type=name).inc()
+        if self.log:
+            self.log.debug("Pooled %s kernel %s ready in %.2fs", name, kernel_id, duration)
+
+    def reserve(self, kernel_id):
+        """Count a kernel being started for the pool as part of it, before it is ready."""
+        self._kernel_ids.add(kernel_id)
+
+    def take(self, name):
+        """Take a ready kernel out of the pool, and start its replacement.
+
+        Returns the kernel id, or None if no kernel is ready.
+        """
+        if name not in self.sizes:
+            return None
+        ready = self._ready[name]
+        if ready:
+            kernel_id = ready.popleft()
+            self._kernel_ids.discard(kernel_id)
+            KERNEL_POOL_READY_TOTAL.labels(type=name).dec()
+            KERNEL_POOL_REQUESTS_TOTAL.labels(type=name, result='hit').inc()
+        else:
+            kernel_id = None
+            KERNEL_POOL_REQUESTS_TOTAL.labels(type=name, result='miss').inc()
+        self.fill()
+        return kernel_id
+
+    def discard(self, kernel_id):
+        """Remove a kernel from the pool, e.g. when it is shut down or dies.
+
+        A ready kernel is replaced. A kernel still being started is not,
+        its start then fails and is not retried until a kernel is taken.
+        """
+        if kernel_id not in self._kernel_ids:
+            return
+        self._kernel_ids.discard(kernel_id)
+        for name, ready in self._ready.items():
+            if kernel_id in ready:
+                ready.remove(kernel_id)
+                KERNEL_POOL_READY_TOTAL.labels(type=name).dec()
+                self.fill()
+
+    async def close(self):
+        """Stop filling the pool, and wait for the kernels being started.
+
+        The kernels of the pool are not shut down.
+        """
+        self._closed = True
+        if self._tasks:
+            await asyncio.wait(list(self._tasks))
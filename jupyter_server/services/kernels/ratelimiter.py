@@ -0,0 +1,203 @@
+"""Sliding-window rate limiting of kernel IOPub output."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import time
+from collections import OrderedDict, deque
+from textwrap import dedent
+
+from jupyter_server.prometheus.metrics import (
+    KERNEL_IOPUB_DROPPED_MESSAGES_TOTAL,
+    KERNEL_IOPUB_DROPPED_BYTES_TOTAL,
+    KERNEL_IOPUB_THROTTLED_SECONDS_TOTAL,
+)
+
+# message types that are never rate limited
+UNLIMITED_MSG_TYPES = {'status', 'comm_open', 'execute_input'}
+
+MSG_RATE_EXCEEDED = dedent("""\
+    IOPub message rate exceeded.
+    The Jupyter server will temporarily stop sending output
+    to the client in order to avoid crashing it.
+    To change this limit, set the config variable
+    `--ServerApp.iopub_msg_rate_limit`.
+
+    Current values:
+    ServerApp.iopub_msg_rate_limit={} (msgs/sec)
+    ServerApp.rate_limit_window={} (secs)
+    """)
+
+DATA_RATE_EXCEEDED = dedent("""\
+    IOPub data rate exceeded.
+    The Jupyter server will temporarily stop sending output
+    to the client in order to avoid crashing it.
+    To change this limit, set the config variable
+    `--ServerApp.iopub_data_rate_limit`.
+
+    Current values:
+    ServerApp.iopub_data_rate_limit={} (bytes/sec)
+    ServerApp.rate_limit_window={} (secs)
+    """)
+
+
+class IOPubRateLimiter(object):
+    """Limits the rate of IOPub messages and stream data sent to clients of a kernel.
+
+    Rates are measured over a sliding window of ``window`` seconds.
+    Once a limit is exceeded, messages are dropped until the rate falls
+    below 80% of the limit.  Counts are reset when the kernel becomes idle,
+    to avoid 'Run All' hitting limits prematurely.
+
+    Each message costs O(1): counts expire from a queue ordered by expiry time.
+
+    All connections to a kernel receive the same IOPub messages, so a single
+    limiter is shared between them and the decision for each message is
+    remembered by msg_id: a message is only counted once, and every
+    connection gets the same outcome.
+
+    Parameters
+    ----------
+    kernel_name : str
+        The kernel name, used to label metrics.
+    msg_rate_limit : float
+        Maximum messages per second. 0 disables the limit.
+    data_rate_limit : float
+        Maximum bytes of stream output per second. 0 disables the limit.
+    window : float
+        Time window in seconds over which the rates are measured.
+    clock : callable, optional
+        Returns the current time in seconds.
+    log : logging.Logger, optional
+    """
+
+    # number of msg_id decisions remembered for other connections
+    max_decisions = 1000
+
+    def __init__(self, kernel_name='', msg_rate_limit=0, data_rate_limit=0,
+                 window=1.0, clock=time.monotonic, log=None):
+        self.kernel_name = kernel_name
+        self.msg_rate_limit = msg_rate_limit
+        self.data_rate_limit = data_rate_limit
+        self.window = window
+        self.clock = clock
+        self.log = log
+
+        self._decisions = OrderedDict()
+        # queue of (expiry time, byte count)
+        self._window_queue = deque()
+        self._msg_count = 0
+        self._byte_count = 0
+        self._msgs_exceeded = False
+        self._data_exceeded = False
+        self._throttled_since = None
+
+    @property
+    def throttled(self):
+        return self._msgs_exceeded or self._data_exceeded
+
+    def reset(self):
+        """Reset counts and resume sending messages."""
+        self._window_queue.clear()
+        self._msg_count = 0
+        self._byte_count = 0
+        self._msgs_exceeded = False
+        self._data_exceeded = False
+        self._update_throttled(self.clock())
+
+    def _update_throttled(self, now):
+        """Record the time spent throttled."""
+        if self.throttled and self._throttled_since is None:
+            self._throttled_since = now
+        elif not self.throttled and self._throttled_since is not None:
+            KERNEL_IOPUB_THROTTLED_SECONDS_TOTAL.labels(
+                type=self.kernel_name
+            ).inc(max(now - self._throttled_since, 0))
+            self._throttled_since = None
+
+    def close(self):
+        """Stop tracking the kernel, recording any ongoing throttling."""
+        self.reset()
+        self._decisions.clear()
+
+    def check(self, msg_id, msg_type, byte_count=0, execution_state=None):
+        """Check whether an IOPub message should be sent.
+
+        Parameters
+        ----------
+        msg_id : str
+        msg_type : str
+        byte_count : int
+            The number of bytes counted against the data rate limit.
+        execution_state : str, optional
+            The execution_state of status messages.
+
+        Returns
+        -------
+        (send, notices): whether to send the message, and a list of messages
+        to show the user because a limit has just been exceeded.
+        """
+        decision = self._decisions.get(msg_id)
+        if decision is None:
+            decision = self._check(msg_type, byte_count, execution_state)
+            self._decisions[msg_id] = decision
+            if len(self._decisions) > self.max_decisions:
+                self._decisions.popitem(last=False)
+        return decision
+
+    def _check(self, msg_type, byte_count, execution_state):
+        if msg_type == 'status' and execution_state == 'idle':
+            self.reset()
+        if msg_type in UNLIMITED_MSG_TYPES:
+            return True, []
+
+        # Remove the counts that have left the window.
+        now = self.clock()
+        queue = self._window_queue
+        while queue and now >= queue[0][0]:
+            self._byte_count -= queue.popleft()[1]
+            self._msg_count -= 1
+
+        # Increment the bytes and message count, and queue their removal
+        # for when they leave the window.
+        self._msg_count += 1
+        self._byte_count += byte_count
+        queue.append((now + self.window, byte_count))
+
+        msg_rate = float(self._msg_count) / self.window
+        data_rate = float(self._byte_count) / self.window
+        notices = []
+
+        # Check the msg rate
+        if self.msg_rate_limit > 0 and msg_rate > self.msg_rate_limit:
+            if not self._msgs_exceeded:
+                self._msgs_exceeded = True
+                notices.append(MSG_RATE_EXCEEDED.format(self.msg_rate_limit, self.window))
+        elif self._msgs_exceeded and msg_rate < (0.8 * self.msg_rate_limit):
+            # resume once we've got some headroom below the limit
+            self._msgs_exceeded = False
+            if not self._data_exceeded and self.log:
+                self.log.warning("iopub messages resumed")
+
+        # Check the data rate
+        if self.data_rate_limit > 0 and data_rate > self.data_rate_limit:
+            if not self._data_exceeded:
+                self._data_exceeded = True
+                notices.append(DATA_RATE_EXCEEDED.format(self.data_rate_limit, self.window))
+        elif self._data_exceeded and data_rate < (0.8 * self.data_rate_limit):
+            self._data_exceeded = False
+            if not self._msgs_exceeded and self.log:
+                self.log.warning("iopub messages resumed")
+
+        self._update_throttled(now)
+
+        # If either of the limit flags are set, do not send the message.
+        if self.throttled:
+            # we didn't send it, remove the current message from the calculus
+            self._msg_count -= 1
+            self._byte_count -= byte_count
+            queue.pop()
+            KERNEL_IOPUB_DROPPED_MESSAGES_TOTAL.labels(type=self.kernel_name).inc()
+            KERNEL_IOPUB_DROPPED_BYTES_TOTAL.labels(type=self.kernel_name).inc(byte_count)
+            return False, notices
+        return True, notices
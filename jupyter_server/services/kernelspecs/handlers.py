@@ -7,7 +7,6 @@ Preliminary documentation at https://github.com/ipython/ipython/wiki/IPEP-25%3A-
 # Distributed under the terms of the Modified BSD License.
 
 import glob
-import json
 import os
 pjoin = os.path.join
 
@@ -74,7 +73,7 @@ class MainKernelSpecHandler(APIHandler):
                 continue
             specs[kernel_name] = d
         self.set_header("Content-Type", 'application/json')
-        self.finish(json.dumps(model))
+        self.finish(self.json_serializer.dumps(model))
 
 
 class KernelSpecHandler(APIHandler):
@@ -92,7 +91,7 @@ class KernelSpecHandler(APIHandler):
         else:
             model = kernelspec_model(self, kernel_name, spec.to_dict(), spec.resource_dir)
         self.set_header("Content-Type", 'application/json')
-        self.finish(json.dumps(model))
+        self.finish(self.json_serializer.dumps(model))
 
 
 # URL to handler mappings
@@ -11,7 +11,6 @@ import json
 from tornado import web
 
 from ...base.handlers import APIHandler
-from jupyter_client.jsonutil import date_default
 from jupyter_server.utils import url_path_join, ensure_async
 from jupyter_client.kernelspec import NoSuchKernel
 
@@ -22,8 +21,10 @@ class SessionRootHandler(APIHandler):
     async def get(self):
         # Return a list of running sessions
         sm = self.session_manager
+        if await self.check_list_version(sm, sm.events, sm.kernel_manager.events):
+            return
         sessions = await ensure_async(sm.list_sessions())
-        self.finish(json.dumps(sessions, default=date_default))
+        self.finish(self.json_serializer.dumps(sessions))
 
     @web.authenticated
     async def post(self):
@@ -80,7 +81,7 @@ class SessionRootHandler(APIHandler):
         location = url_path_join(self.base_url, 'api', 'sessions', model['id'])
         self.set_header('Location', location)
         self.set_status(201)
-        self.finish(json.dumps(model, default=date_default))
+        self.finish(self.json_serializer.dumps(model))
 
 
 class SessionHandler(APIHandler):
@@ -90,7 +91,7 @@ class SessionHandler(APIHandler):
         # Returns the JSON model for a single session
         sm = self.session_manager
         model = await sm.get_session(session_id=session_id)
-        self.finish(json.dumps(model, default=date_default))
+        self.finish(self.json_serializer.dumps(model))
 
     @web.authenticated
     async def patch(self, session_id):
@@ -140,7 +141,7 @@ class SessionHandler(APIHandler):
             # kernel_id changed because we got a new kernel
             # shutdown the old one
             await ensure_async(km.shutdown_kernel(before['kernel']['id']))
-        self.finish(json.dumps(model, default=date_default))
+        self.finish(self.json_serializer.dumps(model))
 
     @web.authenticated
     async def delete(self, session_id):
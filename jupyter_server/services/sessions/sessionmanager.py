@@ -14,10 +14,11 @@ except ImportError:
 from tornado import web
 
 from traitlets.config.configurable import LoggingConfigurable
-from traitlets import Instance
+from traitlets import Any, Instance, default
 
 from jupyter_server.utils import ensure_async
 from jupyter_server.traittypes import InstanceFromClasses
+from jupyter_server.services.events.emitter import EventEmitter
 
 
 class SessionManager(LoggingConfigurable):
@@ -30,6 +31,11 @@ class SessionManager(LoggingConfigurable):
         ]
     )
 
+    events = Any(help="The EventEmitter notifying the sessions added, removed or updated")
+    @default('events')
+    def _default_events(self):
+        return EventEmitter('sessions', log=self.log)
+
     # Session database initialized below
     _cursor = None
     _connection = None
@@ -128,6 +134,7 @@ class SessionManager(LoggingConfigurable):
             (session_id, path, name, type, kernel_id)
         )
         result = await self.get_session(session_id=session_id)
+        self.events.emit('added', session_id, result)
         return result
 
     async def get_session(self, **kwargs):
@@ -204,6 +211,8 @@ class SessionManager(LoggingConfigurable):
             sets.append("%s=?" % column)
         query = "UPDATE session SET %s WHERE session_id=?" % (', '.join(sets))
         self.cursor.execute(query, list(kwargs.values()) + [session_id])
+        model = await self.get_session(session_id=session_id)
+        self.events.emit('updated', session_id, model)
 
     def kernel_culled(self, kernel_id):
         """Checks if the kernel is still considered alive and returns true if its not found. """
@@ -222,6 +231,7 @@ class SessionManager(LoggingConfigurable):
             # message.
             self.cursor.execute("DELETE FROM session WHERE session_id=?",
                                 (row['session_id'],))
+            self.events.emit('removed', row['session_id'])
             msg = "Kernel '{kernel_id}' appears to have been culled or died unexpectedly, " \
                   "invalidating session '{session_id}'. The session has been removed.".\
                 format(kernel_id=row['kernel_id'],session_id=row['session_id'])
@@ -243,6 +253,17 @@ class SessionManager(LoggingConfigurable):
             model['notebook'] = {'path': row['path'], 'name': row['name']}
         return model
 
+    def list_version(self):
+        """Return a version of the list of sessions, which changes whenever the list changes.
+
+        Returns None if it is not known.
+        """
+        # sessions include the model of their kernel
+        kernels_version = self.kernel_manager.list_version()
+        if kernels_version is None:
+            return None
+        return '%s-%s' % (self.events.version, kernels_version)
+
     async def list_sessions(self):
         """Returns a list of dictionaries containing all the information from
         the session database"""
@@ -263,3 +284,4 @@ class SessionManager(LoggingConfigurable):
         session = await self.get_session(session_id=session_id)
         await ensure_async(self.kernel_manager.shutdown_kernel(session['kernel']['id']))
         self.cursor.execute("DELETE FROM session WHERE session_id=?", (session_id,))
+        self.events.emit('removed', session_id)
@@ -1,4 +1,3 @@
-import json
 from tornado import web
 from ..base.handlers import APIHandler
 
@@ -6,9 +5,12 @@ from ..base.handlers import APIHandler
 class TerminalRootHandler(APIHandler):
 
     @web.authenticated
-    def get(self):
-        models = self.terminal_manager.list()
-        self.finish(json.dumps(models))
+    async def get(self):
+        tm = self.terminal_manager
+        if await self.check_list_version(tm, tm.events):
+            return
+        models = tm.list()
+        self.finish(self.json_serializer.dumps(models))
 
     @web.authenticated
     def post(self):
@@ -16,7 +18,7 @@ class TerminalRootHandler(APIHandler):
         data = self.get_json_body() or {}
 
         model = self.terminal_manager.create(**data)
-        self.finish(json.dumps(model))
+        self.finish(self.json_serializer.dumps(model))
 
 
 class TerminalHandler(APIHandler):
@@ -25,7 +27,7 @@ class TerminalHandler(APIHandler):
     @web.authenticated
     def get(self, name):
         model = self.terminal_manager.get(name)
-        self.finish(json.dumps(model))
+        self.finish(self.json_serializer.dumps(model))
 
     @web.authenticated
     async def delete(self, name):
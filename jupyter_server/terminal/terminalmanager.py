@@ -6,21 +6,25 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 
+import signal
+
 import terminado
 
 from datetime import timedelta
 from jupyter_server._tz import utcnow, isoformat
 from tornado import web
-from tornado.ioloop import IOLoop, PeriodicCallback
-from traitlets import Integer
+from traitlets import Any, Float, Integer, default
 from traitlets.config import LoggingConfigurable
+from ..culler import IdleCuller
 from ..prometheus.metrics import TERMINAL_CURRENTLY_RUNNING_TOTAL
+from ..services.events.emitter import EventEmitter
+from ..utils import shutdown_concurrently
 
 
 class TerminalManager(LoggingConfigurable, terminado.NamedTermManager):
     """  """
 
-    _culler_callback = None
+    _culler = None
 
     _initialized_culler = False
 
@@ -34,6 +38,26 @@ class TerminalManager(LoggingConfigurable, terminado.NamedTermManager):
         help="""The interval (in seconds) on which to check for terminals exceeding the inactive timeout value."""
                             )
 
+    cull_concurrency = Integer(10, config=True,
+        help="""The maximum number of inactive terminals terminated concurrently by the culler.
+        Values of 0 or lower disable the limit."""
+                               )
+
+    shutdown_all_concurrency = Integer(50, config=True,
+        help="""The maximum number of terminals terminated concurrently when terminating all terminals,
+        e.g. when the server stops. Values of 0 or lower disable the limit."""
+                                       )
+
+    shutdown_all_timeout = Float(10, config=True,
+        help="""Timeout (in seconds) for terminating all terminals, e.g. when the server stops.
+        Terminals still running after this timeout are killed. Values of 0 or lower disable the timeout."""
+                                 )
+
+    events = Any(help="The EventEmitter notifying the terminals created or terminated")
+    @default('events')
+    def _default_events(self):
+        return EventEmitter('terminals', log=self.log)
+
     # -------------------------------------------------------------------------
     # Methods for managing terminals
     # -------------------------------------------------------------------------
@@ -52,6 +76,9 @@ class TerminalManager(LoggingConfigurable, terminado.NamedTermManager):
         TERMINAL_CURRENTLY_RUNNING_TOTAL.inc()
         # Ensure culler is initialized
         self._initialize_culler()
+        if self._culler is not None:
+            self._culler.add(name)
+        self.events.emit('added', name, model)
         return model
 
     def get(self, name):
@@ -69,6 +96,15 @@ class TerminalManager(LoggingConfigurable, terminado.NamedTermManager):
         )
         return models
 
+    def list_version(self):
+        """Return a version of the list of terminals, which changes whenever the list changes."""
+        last_activity = max(
+            (term.last_activity.timestamp() for term in self.terminals.values()
+             if hasattr(term, 'last_activity')),
+            default=0,
+        )
+        return '%s-%s' % (self.events.version, last_activity)
+
     async def terminate(self, name, force=False):
         """Terminate terminal 'name'."""
         self._check_terminal(name)
@@ -77,12 +113,24 @@ class TerminalManager(LoggingConfigurable, terminado.NamedTermManager):
         # Decrease the metric below by one
         # because a terminal has been shutdown
         TERMINAL_CURRENTLY_RUNNING_TOTAL.dec()
+        self.events.emit('removed', name)
 
     async def terminate_all(self):
-        """Terminate all terminals."""
-        terms = [name for name in self.terminals]
-        for term in terms:
-            await self.terminate(term, force=True)
+        """Terminate all terminals, concurrently."""
+        await shutdown_concurrently(
+            list(self.terminals),
+            shutdown=lambda name, past_deadline: self.terminate(name, force=True),
+            kill=self._kill_terminal,
+            concurrency=self.shutdown_all_concurrency,
+            timeout=self.shutdown_all_timeout,
+            log=self.log,
+            kind='terminal',
+        )
+
+    def _kill_terminal(self, name):
+        """Kill a terminal whose termination is taking too long."""
+        if name in self.terminals:
+            self.terminals[name].kill(getattr(signal, 'SIGKILL', signal.SIGTERM))
 
     def get_terminal_model(self, name):
         """Return a JSON-safe dict representing a terminal.
@@ -106,30 +154,37 @@ class TerminalManager(LoggingConfigurable, terminado.NamedTermManager):
         Regardless of that value, set flag that we've been here.
         """
         if not self._initialized_culler and self.cull_inactive_timeout > 0:
-            if self._culler_callback is None:
-                loop = IOLoop.current()
+            if self._culler is None:
                 if self.cull_interval <= 0:  # handle case where user set invalid value
                     self.log.warning("Invalid value for 'cull_interval' detected (%s) - using default value (%s).",
                                      self.cull_interval, self.cull_interval_default)
                     self.cull_interval = self.cull_interval_default
-                self._culler_callback = PeriodicCallback(
-                    self._cull_terminals, 1000 * self.cull_interval)
+                self._culler = IdleCuller(
+                    timeout=self.cull_inactive_timeout,
+                    interval=self.cull_interval,
+                    get_last_activity=self._get_terminal_last_activity,
+                    cull=self._cull_inactive_terminal,
+                    callback=self._cull_terminals,
+                    concurrency=max(self.cull_concurrency, 0),
+                    log=self.log,
+                )
+                for name in list(self.terminals):
+                    self._culler.add(name)
                 self.log.info("Culling terminals with inactivity > %s seconds at %s second intervals ...",
                               self.cull_inactive_timeout, self.cull_interval)
-                self._culler_callback.start()
+                self._culler.start()
 
         self._initialized_culler = True
 
+    def _get_terminal_last_activity(self, name):
+        return getattr(self.terminals[name], 'last_activity', None)
+
     async def _cull_terminals(self):
-        self.log.debug("Polling every %s seconds for terminals inactive for > %s seconds...",
-                       self.cull_interval, self.cull_inactive_timeout)
-        # Create a separate list of terminals to avoid conflicting updates while iterating
-        for name in list(self.terminals):
-            try:
-                await self._cull_inactive_terminal(name)
-            except Exception as e:
-                self.log.exception("The following exception was encountered while checking the "
-                                   "activity of terminal {}: {}".format(name, e))
+        self.log.debug("Checking terminals inactive for > %s seconds, at most every %s seconds...",
+                       self.cull_inactive_timeout, self.cull_interval)
+        # only the terminals that have not been active since the timeout are checked
+        if self._culler is not None:
+            await self._culler.cull_expired()
 
     async def _cull_inactive_terminal(self, name):
         try:
@@ -118,6 +118,43 @@ async def test_get_dir_no_contents(jp_fetch, contents, path, name):
     assert model['content'] is None
 
 
+async def test_list_dir_pages(jp_fetch, contents):
+    response = await jp_fetch('api', 'contents', 'foo', method='GET')
+    names = sorted(model['name'] for model in json.loads(response.body.decode())['content'])
+
+    listed = []
+    params = dict(limit='5')
+    while True:
+        response = await jp_fetch('api', 'contents', 'foo', method='GET', params=params)
+        model = json.loads(response.body.decode())
+        assert model['total'] == len(names)
+        listed.extend(m['name'] for m in model['content'])
+        if model['next_cursor'] is None:
+            break
+        params = dict(limit='5', cursor=model['next_cursor'])
+    assert listed == names
+
+    response = await jp_fetch(
+        'api', 'contents', 'foo', method='GET',
+        params=dict(child_type='notebook', sort='-name', offset='1'),
+    )
+    model = json.loads(response.body.decode())
+    notebooks = sorted((n for n in names if n.endswith('.ipynb')), reverse=True)
+    assert model['total'] == len(notebooks)
+    assert [m['name'] for m in model['content']] == notebooks[1:]
+
+    for params in (
+        dict(limit='many'),
+        dict(offset='-1'),
+        dict(sort='owner'),
+        dict(child_type='link'),
+        dict(cursor='nope'),
+    ):
+        with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+            await jp_fetch('api', 'contents', 'foo', method='GET', params=params)
+        assert expected_http_error(e, 400)
+
+
 async def test_list_nonexistant_dir(jp_fetch, contents):
     with pytest.raises(tornado.httpclient.HTTPClientError):
         await jp_fetch(
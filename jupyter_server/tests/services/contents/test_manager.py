@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 import time
 import pytest
 from traitlets import TraitError
@@ -211,6 +212,224 @@ async def test_good_symlink(jp_file_contents_manager_class, tmp_path):
     assert sorted(dir_model['content'], key=lambda x: x['name']) == [symlink_model, file_model]
 
 
+async def test_dir_listing_models(jp_file_contents_manager_class, tmp_path):
+    td = str(tmp_path)
+    cm = jp_file_contents_manager_class(root_dir=td)
+    parent = 'test listing'
+    await make_populated_dir(cm, parent)
+    _make_dir(cm, parent + '/sub dir')
+    _make_dir(cm, parent + '/.hidden dir')
+    await ensure_async(cm.new(path=parent + '/data.csv'))
+    await ensure_async(cm.new(path=parent + '/.hidden.txt'))
+    if not sys.platform.startswith('win'):
+        symlink(cm, parent + '/sub dir', parent + '/dir link')
+        symlink(cm, parent + '/nb.ipynb', parent + '/nb link.ipynb')
+
+    # the listing has the same models as getting each entry
+    dir_model = await ensure_async(cm.get(parent))
+    contents = sorted(dir_model['content'], key=lambda x: x['name'])
+    names = sorted(
+        name for name in os.listdir(cm._get_os_path(parent)) if not name.startswith('.')
+    )
+    assert [model['name'] for model in contents] == names
+    for model in contents:
+        assert model == await ensure_async(cm.get(model['path'], content=False))
+
+    # at the root as well
+    dir_model = await ensure_async(cm.get(''))
+    assert dir_model['content'] == [await ensure_async(cm.get(parent, content=False))]
+
+
+async def test_dir_listing_pages(jp_file_contents_manager_class, tmp_path):
+    td = str(tmp_path)
+    cm = jp_file_contents_manager_class(root_dir=td)
+    parent = 'pages'
+    _make_dir(cm, parent)
+    for i in range(5):
+        _make_dir(cm, '%s/dir%d' % (parent, i))
+        await ensure_async(cm.new(path='%s/file%d.txt' % (parent, i)))
+        await ensure_async(cm.new(path='%s/nb%d.ipynb' % (parent, i)))
+        with open(cm._get_os_path('%s/file%d.txt' % (parent, i)), 'w') as f:
+            f.write('x' * (10 - i))
+    full = await ensure_async(cm.get(parent))
+    assert 'total' not in full
+    names = sorted(model['name'] for model in full['content'])
+
+    # walk the listing page by page with the cursor
+    models = []
+    cursor = None
+    while True:
+        page = await ensure_async(cm.get(parent, limit=4, cursor=cursor))
+        assert page['total'] == 15
+        assert len(page['content']) <= 4
+        models.extend(page['content'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert [model['name'] for model in models] == names
+    for model in models:
+        assert model == await ensure_async(cm.get(model['path'], content=False))
+
+    # offset, sort and type filter
+    page = await ensure_async(cm.get(parent, offset=13, sort='-name'))
+    assert [model['name'] for model in page['content']] == names[1::-1]
+    assert page['next_cursor'] is None
+    page = await ensure_async(cm.get(parent, sort='size', child_type='file'))
+    assert page['total'] == 5
+    assert [model['name'] for model in page['content']] == ['file%d.txt' % i for i in range(4, -1, -1)]
+    page = await ensure_async(cm.get(parent, limit=2, child_type='directory,notebook', sort='last_modified'))
+    assert page['total'] == 10
+    assert all(model['type'] in ('directory', 'notebook') for model in page['content'])
+
+    # entries added before the cursor do not shift the next page
+    page = await ensure_async(cm.get(parent, limit=5))
+    await ensure_async(cm.new(path=parent + '/a new file.txt'))
+    page = await ensure_async(cm.get(parent, limit=5, cursor=page['next_cursor']))
+    assert [model['name'] for model in page['content']] == names[5:10]
+    assert page['total'] == 16
+
+    for kwargs in (
+        dict(limit=0),
+        dict(offset=-1),
+        dict(sort='owner'),
+        dict(child_type='link'),
+        dict(cursor='nope'),
+        dict(cursor=page['next_cursor'], sort='size'),
+        dict(cursor=page['next_cursor'], offset=1),
+    ):
+        with pytest.raises(HTTPError) as e:
+            await ensure_async(cm.get(parent, **kwargs))
+        assert expected_http_error(e, 400)
+
+
+@pytest.mark.parametrize('inotify', [True, False])
+async def test_metadata_cache(jp_file_contents_manager_class, tmp_path, inotify):
+    td = str(tmp_path)
+    cm = jp_file_contents_manager_class(
+        root_dir=td, metadata_cache_size=100, metadata_cache_inotify=inotify,
+    )
+    uncached = jp_file_contents_manager_class(root_dir=td)
+    cache = cm._metadata_cache
+    await make_populated_dir(cm, 'foo')
+    _make_dir(cm, 'foo/bar')
+
+    async def check(path):
+        for content in (True, False):
+            model = await ensure_async(cm.get(path, content=content))
+            expected = await ensure_async(uncached.get(path, content=content))
+            if content and model['type'] == 'directory':
+                model['content'].sort(key=lambda m: m['name'])
+                expected['content'].sort(key=lambda m: m['name'])
+            assert model == expected
+
+    async def listed(path):
+        model = await ensure_async(cm.get(path))
+        return {m['name']: m for m in model['content']}
+
+    await check('foo')
+    await check('foo/file.txt')
+    os_dir = cm._get_os_path('foo')
+    assert cache.get_listing(os_dir) is not None
+    assert cache.get_model(os_dir) is not None
+
+    # models are copies
+    model = await ensure_async(cm.get('foo/file.txt', content=False))
+    model['size'] = -1
+    await check('foo/file.txt')
+
+    # its own changes are seen at once
+    await ensure_async(cm.save({'type': 'file', 'format': 'text', 'content': 'data'}, 'foo/file.txt'))
+    await check('foo/file.txt')
+    await ensure_async(cm.rename('foo/file.txt', 'foo/bar/moved.txt'))
+    await check('foo')
+    await check('foo/bar')
+    await ensure_async(cm.delete('foo/bar/moved.txt'))
+    await check('foo/bar')
+
+    # so are changes made by others to models, and to the entries of listings
+    await check('foo/nb.ipynb')
+    time.sleep(0.01)
+    with open(cm._get_os_path('foo/nb.ipynb'), 'a') as f:
+        f.write(' ')
+    with open(cm._get_os_path('foo/other.txt'), 'w') as f:
+        f.write('other')
+    await check('foo/nb.ipynb')
+    await check('foo')
+    if cache.uses_inotify:
+        # only inotify reports changes to listed files
+        with open(cm._get_os_path('foo/other.txt'), 'a') as f:
+            f.write('more')
+        await check('foo')
+
+    # external creates, modifications, renames and deletes invalidate the cached entries
+    os_dir = cm._get_os_path('foo')
+    names = await listed('foo')
+    assert cache.get_listing(os_dir) is not None
+    time.sleep(0.01)
+    with open(os.path.join(os_dir, 'created.txt'), 'w') as f:
+        f.write('created')
+    names = await listed('foo')
+    assert names['created.txt']['size'] == 7
+
+    model = await ensure_async(cm.get('foo/created.txt', content=False))
+    assert cache.get_model(os.path.join(os_dir, 'created.txt')) is not None
+    time.sleep(0.01)
+    with open(os.path.join(os_dir, 'created.txt'), 'a') as f:
+        f.write(' and modified')
+    model = await ensure_async(cm.get('foo/created.txt', content=False))
+    assert model['size'] == 20
+
+    time.sleep(0.01)
+    os.rename(os.path.join(os_dir, 'created.txt'), os.path.join(os_dir, 'renamed.txt'))
+    names = await listed('foo')
+    assert 'created.txt' not in names
+    assert names['renamed.txt']['size'] == 20
+    with pytest.raises(HTTPError) as e:
+        await ensure_async(cm.get('foo/created.txt', content=False))
+    assert expected_http_error(e, 404)
+    model = await ensure_async(cm.get('foo/renamed.txt', content=False))
+    assert model['size'] == 20
+
+    time.sleep(0.01)
+    os.remove(os.path.join(os_dir, 'renamed.txt'))
+    names = await listed('foo')
+    assert 'renamed.txt' not in names
+    with pytest.raises(HTTPError) as e:
+        await ensure_async(cm.get('foo/renamed.txt', content=False))
+    assert expected_http_error(e, 404)
+    await check('foo')
+
+    # bounded size
+    for i in range(120):
+        await ensure_async(cm.new(path='foo/bar/f%d.txt' % i))
+    await ensure_async(cm.get('foo/bar'))
+    assert cache.get_listing(cm._get_os_path('foo/bar')) is None
+    for i in range(120):
+        await ensure_async(cm.get('foo/bar/f%d.txt' % i, content=False))
+    assert cache.size <= 100
+    cm.close()
+    assert not cache.uses_inotify
+
+
+async def test_async_dir_listing_thread(tmp_path):
+    cm = AsyncFileContentsManager(root_dir=str(tmp_path), dir_listing_threads=2)
+    await make_populated_dir(cm, 'foo')
+    main_thread = threading.get_ident()
+    threads = []
+    list_dir = cm._list_dir
+
+    def record_thread(path, os_dir):
+        threads.append(threading.get_ident())
+        return list_dir(path, os_dir)
+
+    cm._list_dir = record_thread
+    await check_populated_dir_files(cm, 'foo')
+    # listed at once, off the event loop
+    assert len(threads) == 1
+    assert threads[0] != main_thread
+    assert cm._dir_listing_limiter.total_tokens == 2
+
+
 @pytest.mark.skipif(
     sys.platform.startswith('win'),
     reason="Can't test permissions on Windows"
@@ -620,3 +839,56 @@ async def test_check_and_sign(jp_contents_manager):
     cm.mark_trusted_cells(nb, path)
     cm.check_and_sign(nb, path)
     assert cm.notary.check_signature(nb)
+
+
+async def test_notebook_cache(jp_file_contents_manager_class, tmp_path):
+    td = str(tmp_path)
+    cm = jp_file_contents_manager_class(root_dir=td, notebook_cache_size=1024 * 1024)
+    uncached = jp_file_contents_manager_class(root_dir=td, notary=cm.notary)
+    nb, name, path = await new_notebook(cm)
+    reads = []
+    read_notebook = cm._read_notebook
+
+    def count_reads(os_path, as_version=4):
+        reads.append(os_path)
+        return read_notebook(os_path, as_version=as_version)
+
+    cm._read_notebook = count_reads
+
+    async def check():
+        model = await ensure_async(cm.get(path))
+        assert model == await ensure_async(uncached.get(path))
+        return model
+
+    model = await check()
+    assert len(reads) == 1
+    # repeated gets are served from the cache, as copies
+    model['content'].cells[0].source = 'changed'
+    model['content'].metadata['changed'] = True
+    await check()
+    await check()
+    assert len(reads) == 1
+
+    # trust is checked on each get
+    await ensure_async(cm.trust_notebook(path))
+    model = await check()
+    assert all(cell.metadata.trusted for cell in model['content'].cells if cell.cell_type == 'code')
+    assert len(reads) == 1
+
+    # a changed file is read again
+    add_code_cell(model['content'])
+    await ensure_async(uncached.save(model, path))
+    model = await check()
+    assert len(model['content'].cells) == 2
+    assert len(reads) == 2
+
+    # only the latest version of a file is kept, within the size limit
+    assert len(cm._notebook_cache._entries) == 1
+    assert cm._notebook_cache.size == os.stat(cm._get_os_path(path)).st_size
+    cm._notebook_cache.max_size = 1
+    add_code_cell(model['content'])
+    await ensure_async(uncached.save(model, path))
+    await check()
+    await check()
+    assert len(reads) == 4
+    assert cm._notebook_cache.size == 0
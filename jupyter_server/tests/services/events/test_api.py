@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+from tornado.httpclient import HTTPClientError
+
+from jupyter_client.kernelspec import NATIVE_KERNEL_NAME
+
+
+@pytest.fixture
+def jp_argv():
+    return ["--ServerApp.kernel_manager_class=jupyter_server.services.kernels.kernelmanager.AsyncMappingKernelManager"]
+
+
+def open_event_stream(jp_fetch):
+    """Open /api/events, returning the request and a queue of the received events"""
+    events = asyncio.Queue()
+    received = [b'']
+
+    def on_chunk(chunk):
+        received[0] += chunk
+        while b'\n\n' in received[0]:
+            raw, received[0] = received[0].split(b'\n\n', 1)
+            fields = dict(line.split(b': ', 1) for line in raw.splitlines())
+            if b'data' in fields:
+                events.put_nowait((fields[b'event'].decode(), json.loads(fields[b'data'])))
+
+    request = asyncio.ensure_future(jp_fetch('api', 'events', streaming_callback=on_chunk))
+    return request, events
+
+
+async def next_event(events, source, event):
+    while True:
+        name, data = await asyncio.wait_for(events.get(), 10)
+        if name == source and data['event'] == event:
+            return data
+
+
+async def test_kernel_events(jp_fetch):
+    request, events = open_event_stream(jp_fetch)
+    snapshot = await next_event(events, 'kernels', 'snapshot')
+    assert snapshot['models'] == []
+
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+    added = await next_event(events, 'kernels', 'added')
+    assert added['id'] == kid
+    assert added['model']['name'] == NATIVE_KERNEL_NAME
+    assert added['version'] > snapshot['version']
+
+    await jp_fetch('api', 'kernels', kid, method='DELETE')
+    removed = await next_event(events, 'kernels', 'removed')
+    assert removed['id'] == kid
+    assert removed['model'] is None
+
+    request.cancel()
+    with pytest.raises((asyncio.CancelledError, HTTPClientError)):
+        await request
+
+
+async def test_session_events(jp_fetch):
+    request, events = open_event_stream(jp_fetch)
+    snapshot = await next_event(events, 'sessions', 'snapshot')
+    assert snapshot['models'] == []
+
+    r = await jp_fetch(
+        'api', 'sessions',
+        method='POST',
+        body=json.dumps({
+            'path': 'foo/nb1.ipynb',
+            'type': 'notebook',
+            'kernel': {'name': NATIVE_KERNEL_NAME},
+        })
+    )
+    sid = json.loads(r.body.decode())['id']
+    added = await next_event(events, 'sessions', 'added')
+    assert added['id'] == sid
+    assert added['model']['path'] == 'foo/nb1.ipynb'
+
+    await jp_fetch(
+        'api', 'sessions', sid,
+        method='PATCH',
+        body=json.dumps({'path': 'foo/nb2.ipynb'})
+    )
+    updated = await next_event(events, 'sessions', 'updated')
+    assert updated['model']['path'] == 'foo/nb2.ipynb'
+
+    await jp_fetch('api', 'sessions', sid, method='DELETE')
+    removed = await next_event(events, 'sessions', 'removed')
+    assert removed['id'] == sid
+
+    request.cancel()
+    with pytest.raises((asyncio.CancelledError, HTTPClientError)):
+        await request
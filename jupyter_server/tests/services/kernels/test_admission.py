@@ -0,0 +1,140 @@
+import asyncio
+import json
+from collections import Counter
+
+import pytest
+import tornado
+from traitlets.config import Config
+
+from jupyter_client.kernelspec import NATIVE_KERNEL_NAME
+
+from jupyter_server.services.kernels.admission import KernelAdmission, KernelStartRejected
+from ...utils import expected_http_error
+
+
+async def test_admission_queue():
+    kernels = Counter()
+    admission = KernelAdmission(lambda: kernels, max_kernels=2, max_starts=1)
+    assert admission.enabled
+
+    await admission.acquire('a')
+    # a second start waits for the first one
+    second = asyncio.ensure_future(admission.acquire('a'))
+    await asyncio.sleep(0.01)
+    assert not second.done()
+    kernels['a'] += 1
+    admission.release('a')
+    await asyncio.wait_for(second, 1)
+
+    # the limit on kernels includes the ones being started
+    third = asyncio.ensure_future(admission.acquire('b'))
+    kernels['a'] += 1
+    admission.release('a')
+    await asyncio.sleep(0.01)
+    assert not third.done()
+    # shutting down a kernel admits the waiting start
+    kernels['a'] -= 1
+    admission.wake()
+    await asyncio.wait_for(third, 1)
+    admission.release('b')
+
+
+async def test_admission_per_name():
+    kernels = Counter({'a': 1})
+    admission = KernelAdmission(lambda: kernels, max_kernels_per_name={'a': 1, 'b': 0})
+    assert admission.max_kernels_per_name == {'a': 1}
+
+    waiting = asyncio.ensure_future(admission.acquire('a'))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+    # other kernels are not blocked by a waiting start
+    await asyncio.wait_for(admission.acquire('b'), 1)
+    admission.release('b')
+    assert not waiting.done()
+    waiting.cancel()
+    await asyncio.sleep(0.01)
+    assert not admission._queue
+    # the cancelled start was never admitted
+    assert not admission._starting
+    kernels['a'] -= 1
+    admission.wake()
+    await asyncio.wait_for(admission.acquire('a'), 1)
+    assert admission._starting == Counter({'a': 1})
+
+
+async def test_admission_cancelled_after_admission():
+    kernels = Counter()
+    admission = KernelAdmission(lambda: kernels, max_starts=1)
+    await admission.acquire('a')
+    waiting = asyncio.ensure_future(admission.acquire('a'))
+    await asyncio.sleep(0.01)
+    # admitted, then cancelled before it resumes
+    admission.release('a')
+    assert admission._starting == Counter({'a': 1})
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert not admission._starting
+    assert not admission._queue
+
+
+async def test_admission_rejected():
+    kernels = Counter()
+    admission = KernelAdmission(
+        lambda: kernels, max_starts=1, max_queued=1, timeout=0.05, retry_after=3,
+    )
+    await admission.acquire('a')
+    waiting = asyncio.ensure_future(admission.acquire('a'))
+    await asyncio.sleep(0.01)
+
+    # the queue is full
+    with pytest.raises(KernelStartRejected) as e:
+        await admission.acquire('a')
+    assert e.value.status_code == 503
+    assert e.value.retry_after == 3
+
+    # the wait timed out
+    with pytest.raises(KernelStartRejected):
+        await waiting
+    assert not admission._queue
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config({
+        'MappingKernelManager': {
+            'max_kernels': 1,
+            'max_queued_starts': 1,
+            'start_queue_timeout': 10,
+            'start_retry_after': 5,
+        }
+    })
+
+
+async def test_max_kernels(jp_fetch):
+    def start_kernel():
+        return jp_fetch(
+            'api', 'kernels',
+            method='POST',
+            body=json.dumps({
+                'name': NATIVE_KERNEL_NAME
+            })
+        )
+
+    r = await start_kernel()
+    kid = json.loads(r.body.decode())['id']
+
+    # waits for a kernel to be shut down
+    waiting = asyncio.ensure_future(start_kernel())
+    await asyncio.sleep(0.1)
+    assert not waiting.done()
+
+    # the queue is full
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await start_kernel()
+    assert expected_http_error(e, 503)
+    assert e.value.response.headers['Retry-After'] == '5'
+
+    await jp_fetch('api', 'kernels', kid, method='DELETE')
+    r = await waiting
+    assert r.code == 201
@@ -1,3 +1,4 @@
+import asyncio
 import sys
 import time
 import json
@@ -11,6 +12,14 @@ from tornado.escape import url_escape
 
 from jupyter_client.kernelspec import NATIVE_KERNEL_NAME
 from jupyter_client.multikernelmanager import AsyncMultiKernelManager
+from jupyter_client.session import Session
+from prometheus_client import REGISTRY
+
+from jupyter_server.base.zmqhandlers import (
+    KERNEL_WS_PROTOCOL_V1,
+    serialize_msg_to_ws_v1,
+    deserialize_msg_from_ws_v1,
+)
 
 from jupyter_server.utils import url_path_join
 from ...utils import expected_http_error
@@ -243,3 +252,407 @@ async def test_connection(jp_fetch, jp_ws_fetch, jp_http_port, jp_auth_header):
     model = json.loads(r.body.decode())
     assert model['connections'] == 0
 
+
+
+async def test_connection_v1_protocol(jp_fetch, jp_ws_fetch):
+    # Create kernel
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+
+    # Open a websocket connection with the v1 protocol.
+    ws = await jp_ws_fetch(
+        'api', 'kernels', kid, 'channels',
+        subprotocols=[KERNEL_WS_PROTOCOL_V1]
+    )
+    assert ws.selected_subprotocol == KERNEL_WS_PROTOCOL_V1
+
+    session = Session()
+    msg = session.msg('kernel_info_request')
+    msg_list = [
+        session.pack(msg['header']),
+        session.pack(msg['parent_header']),
+        session.pack(msg['metadata']),
+        session.pack(msg['content']),
+    ]
+    ws.write_message(serialize_msg_to_ws_v1(msg_list, 'shell'), binary=True)
+    while True:
+        reply = await ws.read_message()
+        assert isinstance(reply, bytes)
+        channel, reply_list = deserialize_msg_from_ws_v1(reply)
+        header = session.unpack(reply_list[0])
+        if channel == 'shell':
+            break
+    assert header['msg_type'] == 'kernel_info_reply'
+    parent_header = session.unpack(reply_list[1])
+    assert parent_header['msg_id'] == msg['header']['msg_id']
+    assert 'protocol_version' in session.unpack(reply_list[3])
+    ws.close()
+
+
+async def test_connection_v1_protocol_allowed_message_types(jp_fetch, jp_ws_fetch, jp_serverapp):
+    jp_serverapp.kernel_manager.allowed_message_types = ['kernel_info_request']
+    # Create kernel
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+
+    ws = await jp_ws_fetch(
+        'api', 'kernels', kid, 'channels',
+        subprotocols=[KERNEL_WS_PROTOCOL_V1]
+    )
+    session = Session()
+
+    def serialize(msg):
+        msg_list = [
+            session.pack(msg['header']),
+            session.pack(msg['parent_header']),
+            session.pack(msg['metadata']),
+            session.pack(msg['content']),
+        ]
+        return serialize_msg_to_ws_v1(msg_list, 'shell')
+
+    # The disallowed request is dropped, the allowed one gets the first shell reply.
+    ws.write_message(serialize(session.msg('comm_info_request')), binary=True)
+    msg = session.msg('kernel_info_request')
+    ws.write_message(serialize(msg), binary=True)
+    while True:
+        reply = await ws.read_message()
+        channel, reply_list = deserialize_msg_from_ws_v1(reply)
+        if channel == 'shell':
+            break
+    assert session.unpack(reply_list[0])['msg_type'] == 'kernel_info_reply'
+    assert session.unpack(reply_list[1])['msg_id'] == msg['header']['msg_id']
+    ws.close()
+
+
+async def test_connections_share_iopub_hub(jp_fetch, jp_ws_fetch, jp_serverapp):
+    # Create kernel
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+
+    ws1 = await jp_ws_fetch('api', 'kernels', kid, 'channels')
+    ws2 = await jp_ws_fetch('api', 'kernels', kid, 'channels')
+
+    hub = jp_serverapp.kernel_manager.get_iopub_hub(kid)
+    # wait for both connections to subscribe, once nudged
+    for i in range(50):
+        if len(hub._subscribers) == 3:
+            break
+        await asyncio.sleep(0.1)
+    # activity tracking and both connections
+    assert len(hub._subscribers) == 3
+
+    session = Session()
+    msg = session.msg('kernel_info_request')
+    msg['channel'] = 'shell'
+    ws1.write_message(json.dumps(msg, default=str))
+
+    async def read_idle(ws):
+        while True:
+            reply = json.loads(await ws.read_message())
+            if (reply['channel'] == 'iopub'
+                    and reply['parent_header'].get('msg_id') == msg['header']['msg_id']
+                    and reply['content'].get('execution_state') == 'idle'):
+                return reply
+
+    # both connections receive the IOPub messages of the request
+    await read_idle(ws1)
+    await read_idle(ws2)
+
+    ws1.close()
+    ws2.close()
+
+
+async def test_connections_do_not_change_shared_messages(jp_fetch, jp_ws_fetch, jp_serverapp):
+    jp_serverapp.kernel_manager.allow_tracebacks = False
+    # Create kernel
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels')
+    hub = jp_serverapp.kernel_manager.get_iopub_hub(kid)
+    for i in range(50):
+        if len(hub._subscribers) == 2:
+            break
+        await asyncio.sleep(0.1)
+    # parsed before the connection handles the messages
+    errors = []
+    hub._subscribers.insert(0, lambda kernel_msg: kernel_msg.msg_type == 'error' and errors.append(kernel_msg.msg))
+
+    session = Session()
+    msg = session.msg('execute_request', {'code': '1/0', 'silent': False})
+    msg['channel'] = 'shell'
+    ws.write_message(json.dumps(msg, default=str))
+    while True:
+        reply = json.loads(await ws.read_message())
+        if reply['msg_type'] == 'error':
+            break
+    # the traceback is masked for the connection only
+    assert reply['content']['ename'] == 'ExecutionError'
+    assert reply['channel'] == 'iopub'
+    assert errors[0]['content']['ename'] == 'ZeroDivisionError'
+    assert 'channel' not in errors[0]
+    ws.close()
+
+
+async def test_reconnect_replays_output_without_gap(jp_fetch, jp_ws_fetch):
+    # Create kernel
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+    params = {'session_id': 'replay-session'}
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels', params=params)
+
+    session = Session(session='replay-session')
+    code = "import time\nfor i in range(30):\n    print(i, flush=True)\n    time.sleep(0.05)"
+    msg = session.msg('execute_request', {'code': code, 'silent': False})
+    msg['channel'] = 'shell'
+    ws.write_message(json.dumps(msg, default=str))
+
+    async def read_output(ws, until):
+        numbers = []
+        while not until(numbers):
+            reply = json.loads(await ws.read_message())
+            if reply['parent_header'].get('msg_id') != msg['header']['msg_id']:
+                continue
+            if reply['msg_type'] == 'stream':
+                numbers.extend(int(line) for line in reply['content']['text'].split())
+            elif reply['msg_type'] == 'status' and reply['content']['execution_state'] == 'idle':
+                break
+        return numbers
+
+    first = await read_output(ws, lambda numbers: len(numbers) >= 3)
+    ws.close()
+    await asyncio.sleep(0.3)
+
+    # the output buffered while disconnected, and the output published while
+    # the connection is restored, are all received
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels', params=params)
+    second = await read_output(ws, lambda numbers: False)
+    assert second
+    assert second[0] <= first[-1] + 1
+    assert second == list(range(second[0], 30))
+    ws.close()
+
+
+def sample_count(metric, **labels):
+    return REGISTRY.get_sample_value(metric + '_count', labels) or 0
+
+
+async def test_lifecycle_metrics(jp_fetch, jp_ws_fetch, jp_serverapp):
+    labels = {'type': NATIVE_KERNEL_NAME}
+    before = {
+        metric: sample_count(metric, **labels) for metric in [
+            'kernel_restart_duration_seconds',
+            'kernel_interrupt_duration_seconds',
+            'kernel_shutdown_duration_seconds',
+            'kernel_nudge_duration_seconds',
+        ]
+    }
+
+    def skipped_nudges():
+        return sum(
+            REGISTRY.get_sample_value('kernel_nudges_skipped_total', dict(labels, reason=reason)) or 0
+            for reason in ['receiving', 'busy']
+        )
+
+    skipped = skipped_nudges()
+    launched = sample_count('kernel_start_duration_seconds', phase='launch', **labels)
+    ready = sample_count('kernel_start_duration_seconds', phase='kernel_info', **labels)
+
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+    assert sample_count('kernel_start_duration_seconds', phase='launch', **labels) > launched
+
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels')
+    # the startup phases are recorded in the background
+    for i in range(100):
+        if sample_count('kernel_start_duration_seconds', phase='kernel_info', **labels) > ready:
+            break
+        await asyncio.sleep(0.1)
+    assert sample_count('kernel_start_duration_seconds', phase='heartbeat', **labels) > 0
+    assert sample_count('kernel_start_duration_seconds', phase='kernel_info', **labels) > ready
+    ws.close()
+
+    for action in ['interrupt', 'restart']:
+        await jp_fetch(
+            'api', 'kernels', kid, action,
+            method='POST',
+            allow_nonstandard_methods=True
+        )
+    # the restart is timed until the kernel replies
+    for i in range(100):
+        if sample_count('kernel_restart_duration_seconds', **labels) > before['kernel_restart_duration_seconds']:
+            break
+        await asyncio.sleep(0.1)
+    await jp_fetch('api', 'kernels', kid, method='DELETE')
+
+    for metric, count in before.items():
+        if metric == 'kernel_nudge_duration_seconds':
+            continue
+        assert sample_count(metric, **labels) > count, metric
+    # the connection either nudged the kernel, or skipped the nudge without timing it
+    nudges = sample_count('kernel_nudge_duration_seconds', **labels)
+    assert nudges + skipped_nudges() > before['kernel_nudge_duration_seconds'] + skipped
+
+
+async def test_kernel_info_cached(jp_fetch, jp_serverapp):
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+    km = jp_serverapp.kernel_manager
+
+    # concurrent requests share the same request
+    futures = [km.request_kernel_info(kid) for i in range(3)]
+    info = await futures[0]
+    assert 'protocol_version' in info
+    assert all(f is futures[0] for f in futures)
+    # and the reply is cached
+    assert km.request_kernel_info(kid) is futures[0]
+
+    # until the kernel is restarted
+    await jp_fetch(
+        'api', 'kernels', kid, 'restart',
+        method='POST',
+        allow_nonstandard_methods=True
+    )
+    future = km.request_kernel_info(kid)
+    assert future is not futures[0]
+    assert 'protocol_version' in await future
+
+
+async def test_list_kernels_etag(jp_fetch):
+    r = await jp_fetch('api', 'kernels', method='GET')
+    etag = r.headers['ETag']
+
+    # unchanged
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch('api', 'kernels', method='GET', headers={'If-None-Match': etag})
+    assert expected_http_error(e, 304)
+
+    # waiting for a change
+    poll = asyncio.ensure_future(jp_fetch(
+        'api', 'kernels', method='GET',
+        params={'wait': '10'},
+        headers={'If-None-Match': etag},
+    ))
+    await asyncio.sleep(0.1)
+    assert not poll.done()
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kernel = json.loads(r.body.decode())
+    r = await poll
+    assert r.code == 200
+    assert r.headers['ETag'] != etag
+    assert [k['id'] for k in json.loads(r.body.decode())] == [kernel['id']]
+
+
+async def test_list_kernels_etag_bad_wait(jp_fetch):
+    r = await jp_fetch('api', 'kernels', method='GET')
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch(
+            'api', 'kernels', method='GET',
+            params={'wait': 'soon'},
+            headers={'If-None-Match': r.headers['ETag']},
+        )
+    assert expected_http_error(e, 400)
+
+
+async def test_kernel_batch(jp_fetch):
+    r = await jp_fetch(
+        'api', 'kernels', 'batch',
+        method='POST',
+        body=json.dumps([
+            {'action': 'start', 'name': NATIVE_KERNEL_NAME},
+            {'action': 'start'},
+        ])
+    )
+    results = json.loads(r.body.decode())
+    assert [result['status'] for result in results] == [201, 201]
+    assert all(result['duration'] >= 0 for result in results)
+    kids = [result['id'] for result in results]
+    assert [result['model']['id'] for result in results] == kids
+
+    r = await jp_fetch('api', 'kernels', method='GET')
+    assert sorted(k['id'] for k in json.loads(r.body.decode())) == sorted(kids)
+
+    # operations of a batch run concurrently
+    r = await jp_fetch(
+        'api', 'kernels', 'batch',
+        method='POST',
+        body=json.dumps([{'action': 'interrupt', 'id': kid} for kid in kids])
+    )
+    results = json.loads(r.body.decode())
+    assert [result['status'] for result in results] == [204, 204]
+
+    r = await jp_fetch(
+        'api', 'kernels', 'batch',
+        method='POST',
+        body=json.dumps([
+            {'action': 'shutdown', 'id': kids[0]},
+            {'action': 'shutdown', 'id': kids[1]},
+            {'action': 'shutdown', 'id': '00000000-0000-0000-0000-000000000000'},
+            {'action': 'upgrade', 'id': kids[1]},
+            {'action': 'restart'},
+        ])
+    )
+    results = json.loads(r.body.decode())
+    assert [result['status'] for result in results] == [204, 204, 404, 400, 400]
+    assert 'message' in results[2]
+
+    r = await jp_fetch('api', 'kernels', method='GET')
+    assert json.loads(r.body.decode()) == []
+
+
+async def test_kernel_batch_bad_body(jp_fetch):
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch(
+            'api', 'kernels', 'batch',
+            method='POST',
+            body=json.dumps({'action': 'start'})
+        )
+    assert expected_http_error(e, 400)
@@ -0,0 +1,94 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+from traitlets.config import Config
+
+from jupyter_client.kernelspec import NATIVE_KERNEL_NAME
+from jupyter_client.session import Session
+
+from jupyter_server.base.zmqhandlers import AdaptiveCompressionProtocol
+from jupyter_server.services.kernels.handlers import ZMQChannelsHandler
+
+
+@pytest.fixture
+def jp_argv():
+    return ["--ServerApp.kernel_manager_class=jupyter_server.services.kernels.kernelmanager.AsyncMappingKernelManager"]
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config({
+        'ServerApp': {
+            'kernel_ws_high_watermark': 100,
+        }
+    })
+
+
+def event_count(event):
+    return REGISTRY.get_sample_value('kernel_ws_backpressure_events_total', {'event': event}) or 0
+
+
+async def test_slow_client_is_paused(jp_fetch, jp_ws_fetch):
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+    paused = event_count('paused')
+    resumed = event_count('resumed')
+
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels')
+    session = Session()
+    msg = session.msg('kernel_info_request')
+    msg['channel'] = 'shell'
+    ws.write_message(json.dumps(msg, default=str))
+
+    # every message exceeds the high watermark, and the connection
+    # resumes once it has been sent: replies are still received
+    while True:
+        reply = json.loads(await ws.read_message())
+        if reply['msg_type'] == 'kernel_info_reply':
+            break
+    assert reply['parent_header']['msg_id'] == msg['header']['msg_id']
+    assert event_count('paused') > paused
+    assert event_count('resumed') > resumed
+    ws.close()
+
+
+class RecordingProtocol(AdaptiveCompressionProtocol):
+    """Keeps the messages written, until they are sent"""
+
+    def __init__(self):
+        self.futures = []
+
+    def is_closing(self):
+        return False
+
+    def write_message(self, message, binary=False, compress=None):
+        future = asyncio.get_event_loop().create_future()
+        self.futures.append(future)
+        return future
+
+
+async def test_unsent_data_is_counted_in_bytes():
+    handler = object.__new__(ZMQChannelsHandler)
+    handler.application = SimpleNamespace(settings={'kernel_ws_high_watermark': 10000})
+    handler.ws_connection = RecordingProtocol()
+    handler._unsent_bytes = 0
+    handler._paused = False
+
+    # 3 bytes per character in UTF-8
+    handler.write_message('€' * 1000)
+    handler.write_message(b'\x00' * 10, binary=True)
+    assert handler._unsent_bytes == 3010
+
+    for future in handler.ws_connection.futures:
+        future.set_result(None)
+    await asyncio.sleep(0)
+    assert handler._unsent_bytes == 0
@@ -0,0 +1,90 @@
+import json
+
+from jupyter_client.session import Session
+
+from jupyter_server.services.kernels.buffer import MessageBuffer, msg_type_from_parts
+
+
+def make_msg(session, msg_type, content):
+    msg = session.msg(msg_type, content=content)
+    return session.serialize(msg)
+
+
+def test_msg_type_from_parts():
+    s = Session()
+    parts = make_msg(s, 'stream', {'name': 'stdout', 'text': 'hi'})
+    assert msg_type_from_parts(parts) == 'stream'
+    assert msg_type_from_parts([b'garbage']) is None
+
+
+def test_unbounded_buffer_keeps_order():
+    s = Session()
+    buf = MessageBuffer()
+    msgs = [('iopub', make_msg(s, 'stream', {'text': str(i)})) for i in range(5)]
+    msgs.append(('shell', make_msg(s, 'execute_reply', {'status': 'ok'})))
+    for channel, parts in msgs:
+        buf.append(channel, parts)
+    assert len(buf) == 6
+    assert list(buf) == msgs
+    buf.close()
+    assert len(buf) == 0
+
+
+def test_buffer_drops_stream_output_first():
+    s = Session()
+    buf = MessageBuffer(max_messages=3, drop_msg_types={'stream'})
+    status = make_msg(s, 'status', {'execution_state': 'busy'})
+    reply = make_msg(s, 'execute_reply', {'status': 'ok'})
+    buf.append('iopub', status)
+    for i in range(5):
+        buf.append('iopub', make_msg(s, 'stream', {'text': str(i)}))
+    buf.append('shell', reply)
+
+    replayed = list(buf)
+    assert len(replayed) == 3
+    assert buf.dropped == 4
+    assert replayed[0] == ('iopub', status)
+    assert msg_type_from_parts(replayed[1][1]) == 'stream'
+    assert replayed[2] == ('shell', reply)
+
+
+def test_buffer_byte_limit():
+    s = Session()
+    parts = make_msg(s, 'stream', {'text': 'x' * 1000})
+    size = sum(len(p) for p in parts)
+    buf = MessageBuffer(max_bytes=3 * size + size // 2, drop_msg_types={'stream'})
+    for i in range(10):
+        buf.append('iopub', make_msg(s, 'stream', {'text': 'x' * 1000}))
+    assert buf.nbytes <= 3 * size + size // 2
+    assert len(buf) == 3
+
+
+def test_buffer_spills_to_disk(tmp_path):
+    s = Session()
+    buf = MessageBuffer(max_messages=2, drop_msg_types={'stream'}, spill_dir=str(tmp_path))
+    msgs = [('iopub', make_msg(s, 'stream', {'text': str(i)})) for i in range(10)]
+    for channel, parts in msgs:
+        buf.append(channel, parts)
+    assert buf.dropped == 0
+    assert buf.spilled == 8
+    assert len(buf) == 10
+    assert [(c, list(p)) for c, p in buf] == [(c, list(p)) for c, p in msgs]
+    buf.close()
+    assert len(buf) == 0
+
+
+def test_buffer_spill_limit(tmp_path):
+    s = Session()
+    msgs = [('iopub', make_msg(s, 'stream', {'text': str(i)})) for i in range(10)]
+    size = sum(len(p) for p in msgs[0][1])
+    buf = MessageBuffer(
+        max_messages=2, drop_msg_types={'stream'},
+        spill_dir=str(tmp_path), spill_max_bytes=3 * size + size // 2,
+    )
+    for channel, parts in msgs:
+        buf.append(channel, parts)
+    assert buf.spilled == 3
+    assert len(buf) == 5
+    replayed = [json.loads(p[-1])['text'] for c, p in buf]
+    assert replayed == ['0', '1', '2', '8', '9']
+    buf.close()
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+from traitlets.config import Config
+
+from tornado.websocket import WebSocketHandler, WebSocketProtocol13, _WebSocketParams
+
+from jupyter_client.kernelspec import NATIVE_KERNEL_NAME
+from jupyter_client.session import Session
+
+from jupyter_server.base.zmqhandlers import AdaptiveCompressionProtocol
+from jupyter_server.terminal.handlers import TermSocket
+
+
+@pytest.fixture
+def jp_argv():
+    return ["--ServerApp.kernel_manager_class=jupyter_server.services.kernels.kernelmanager.AsyncMappingKernelManager"]
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config({
+        'ServerApp': {
+            'websocket_compression_options': {},
+            'websocket_compression_threshold': 2000,
+        }
+    })
+
+
+def sample_value(metric, **labels):
+    labels['handler'] = 'ZMQChannelsHandler'
+    return REGISTRY.get_sample_value(metric, labels) or 0
+
+
+async def execute(ws, code):
+    session = Session()
+    msg = session.msg('execute_request', {'code': code, 'silent': False})
+    msg['channel'] = 'shell'
+    ws.write_message(json.dumps(msg, default=str))
+    outputs = []
+    while True:
+        reply = json.loads(await ws.read_message())
+        if reply['parent_header'].get('msg_id') != msg['header']['msg_id']:
+            continue
+        if reply['msg_type'] in ('stream', 'display_data'):
+            outputs.append(reply)
+        if reply['msg_type'] == 'status' and reply['content']['execution_state'] == 'idle':
+            return outputs
+
+
+def test_tornado_internals():
+    # the private parts of tornado's websocket protocol used for adaptive compression,
+    # this fails when tornado changes them
+    protocol = AdaptiveCompressionProtocol(None, False, _WebSocketParams(compression_options={}))
+    assert protocol.adaptive
+    assert protocol._compressor is None
+    assert protocol._message_bytes_out == 0
+
+
+def test_tornado_internals_missing(monkeypatch):
+    # without the private parts of tornado, every message is left to tornado
+    class Protocol(AdaptiveCompressionProtocol):
+        tornado_internals = AdaptiveCompressionProtocol.tornado_internals + ('_missing',)
+
+    written = []
+    monkeypatch.setattr(
+        WebSocketProtocol13, 'write_message',
+        lambda self, message, binary=False: written.append((message, binary)),
+    )
+    protocol = Protocol(None, False, _WebSocketParams(compression_options={}), threshold=10)
+    protocol._compressor = object()
+    assert not protocol.adaptive
+    assert not protocol.compressing
+    protocol.write_message('x' * 100, compress=False)
+    protocol.write_message(b'y', binary=True, compress=True)
+    assert written == [('x' * 100, False), (b'y', True)]
+
+
+def test_terminal_compression():
+    # websocket_compression_options only applies to kernel websockets
+    assert TermSocket.get_compression_options is WebSocketHandler.get_compression_options
+    assert TermSocket.get_websocket_protocol is WebSocketHandler.get_websocket_protocol
+
+
+async def test_adaptive_compression(jp_fetch, jp_ws_fetch):
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels', compression_options={})
+
+    # small messages are not compressed
+    compressed = sample_value('websocket_compression_messages_total', result='compressed')
+    await execute(ws, 'x = 1')
+    assert sample_value('websocket_compression_messages_total', result='compressed') == compressed
+    assert sample_value('websocket_compression_messages_total', result='raw') > 0
+
+    # large text outputs are compressed
+    saved = sample_value('websocket_compression_saved_bytes_total')
+    outputs = await execute(ws, "print('a' * 10000)")
+    assert outputs[0]['content']['text'] == 'a' * 10000 + '\n'
+    assert sample_value('websocket_compression_messages_total', result='compressed') == compressed + 1
+    assert sample_value('websocket_compression_saved_bytes_total') > saved + 9000
+    assert sample_value('websocket_compression_cpu_seconds_total') > 0
+
+    # images are not compressed again
+    outputs = await execute(ws, "\n".join([
+        "from IPython.display import display",
+        "display({'image/png': 'iVBORw0KGgo' * 1000, 'text/plain': '<image>'}, raw=True)",
+    ]))
+    assert outputs[0]['content']['data']['image/png'] == 'iVBORw0KGgo' * 1000
+    assert sample_value('websocket_compression_messages_total', result='compressed') == compressed + 1
+    ws.close()
@@ -0,0 +1,182 @@
+import asyncio
+
+import pytest
+
+from jupyter_client.session import Session
+
+from jupyter_server.services.kernels.hub import KernelIOPubHub, KernelMessage
+from jupyter_server.services.kernels.kernelmanager import MappingKernelManager
+
+
+class FakeStream:
+    def __init__(self):
+        self.callback = None
+        self._closed = False
+
+    def on_recv(self, callback):
+        self.callback = callback
+
+    def close(self):
+        self._closed = True
+
+    def closed(self):
+        return self._closed
+
+
+class FakeKernel:
+    kernel_name = 'fake'
+
+    def __init__(self, session):
+        self.session = session
+        self.streams = []
+
+    def connect_iopub(self):
+        stream = FakeStream()
+        self.streams.append(stream)
+        return stream
+
+
+def make_msg(session, msg_type, content):
+    msg = session.msg(msg_type, content=content)
+    return [b'topic'] + session.serialize(msg)
+
+
+def test_kernel_message():
+    s = Session(key=b'secret')
+    msg_list = make_msg(s, 'status', {'execution_state': 'busy'})
+    kernel_msg = KernelMessage(s, msg_list)
+    assert kernel_msg.idents == [b'topic']
+    assert kernel_msg.msg_type == 'status'
+    assert kernel_msg.content == {'execution_state': 'busy'}
+    assert kernel_msg.nbytes == sum(len(part) for part in msg_list)
+
+    expected = s.deserialize(s.feed_identities(msg_list)[1])
+    msg = kernel_msg.msg
+    assert msg == expected
+    # parsed at most once
+    assert kernel_msg.msg is msg
+    assert msg['content'] is kernel_msg.content
+
+
+def test_kernel_message_signature():
+    s = Session(key=b'secret')
+    msg_list = make_msg(s, 'status', {'execution_state': 'busy'})
+    with pytest.raises(ValueError):
+        KernelMessage(Session(key=b'other'), msg_list)
+    with pytest.raises(ValueError):
+        KernelMessage(s, msg_list[:3])
+
+
+def test_hub_dispatch():
+    s = Session(key=b'secret')
+    kernel = FakeKernel(s)
+    hub = KernelIOPubHub(kernel)
+    received = []
+
+    def first(kernel_msg):
+        received.append(('first', kernel_msg))
+
+    def second(kernel_msg):
+        received.append(('second', kernel_msg))
+        hub.unsubscribe(second)
+
+    hub.subscribe(first)
+    hub.subscribe(second)
+    hub.subscribe(first)
+
+    stream = kernel.streams[0]
+    assert stream.channel == 'iopub'
+    assert not hub.receiving
+    stream.callback(make_msg(s, 'stream', {'name': 'stdout', 'text': 'hi'}))
+    assert hub.receiving
+    assert [name for name, kernel_msg in received] == ['first', 'second']
+    # every subscriber gets the same message object
+    assert received[0][1] is received[1][1]
+
+    # bad messages are not dispatched
+    stream.callback(make_msg(Session(key=b'other'), 'stream', {}))
+    assert len(received) == 2
+
+    stream.callback(make_msg(s, 'stream', {'name': 'stdout', 'text': 'again'}))
+    assert [name for name, kernel_msg in received] == ['first', 'second', 'first']
+
+    # reconnecting keeps the subscribers
+    hub.connect()
+    assert stream.closed()
+    assert not hub.receiving
+    kernel.streams[1].callback(make_msg(s, 'stream', {'name': 'stdout', 'text': 'new'}))
+    assert len(received) == 4
+
+    hub.close()
+    assert kernel.streams[1].closed()
+
+
+async def test_hub_coalesces_stream_messages():
+    s = Session(key=b'secret')
+    kernel = FakeKernel(s)
+    hub = KernelIOPubHub(kernel, coalesce_window=0.05)
+    received = []
+    hub.subscribe(received.append)
+    stream = kernel.streams[0]
+
+    parent = s.msg('execute_request')
+    other_parent = s.msg('execute_request')
+
+    def send(msg_type, content, parent=parent):
+        msg = s.msg(msg_type, content=content, parent=parent)
+        stream.callback([b'topic'] + s.serialize(msg))
+        return msg['header']['msg_id']
+
+    first_id = send('stream', {'name': 'stdout', 'text': '1\n'})
+    send('stream', {'name': 'stdout', 'text': '2\n'})
+    send('stream', {'name': 'stdout', 'text': '3\n'})
+    assert received == []
+    # other streams and other messages flush the pending output, in order
+    send('stream', {'name': 'stderr', 'text': 'err\n'})
+    send('stream', {'name': 'stderr', 'text': 'other\n'}, parent=other_parent)
+    send('status', {'execution_state': 'idle'})
+    assert [(m.msg_type, m.content.get('text')) for m in received] == [
+        ('stream', '1\n2\n3\n'),
+        ('stream', 'err\n'),
+        ('stream', 'other\n'),
+        ('status', None),
+    ]
+    merged = received[0]
+    assert merged.msg_id == first_id
+    assert merged.parent_header['msg_id'] == parent['header']['msg_id']
+    # the merged message is signed, for the consumers of the raw frames
+    assert KernelMessage(s, merged.msg_list).content == merged.content
+
+    # pending output is flushed after the window
+    send('stream', {'name': 'stdout', 'text': 'late\n'})
+    assert len(received) == 4
+    await asyncio.sleep(0.1)
+    assert received[-1].content['text'] == 'late\n'
+    hub.close()
+
+
+def test_activity_tracking_parses_header_only():
+    s = Session(key=b'secret')
+    kernel = FakeKernel(s)
+    km = MappingKernelManager()
+    km._kernels['kid'] = kernel
+    km.start_watching_activity('kid')
+    assert kernel.execution_state == 'starting'
+
+    received = []
+    km.get_iopub_hub('kid').subscribe(received.append)
+    stream = kernel.streams[0]
+
+    stream.callback(make_msg(s, 'status', {'execution_state': 'busy'}))
+    assert kernel.execution_state == 'busy'
+
+    last_activity = kernel.last_activity
+    stream.callback(make_msg(s, 'display_data', {'data': {'image/png': 'x' * 1000}}))
+    assert kernel.last_activity >= last_activity
+    # the content of outputs was not parsed
+    assert received[-1]._content is None
+    assert received[-1]._msg is None
+
+    km.stop_watching_activity('kid')
+    stream.callback(make_msg(s, 'status', {'execution_state': 'idle'}))
+    assert kernel.execution_state == 'busy'
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+from tornado.concurrent import Future
+from traitlets.config import Config
+
+from jupyter_client.kernelspec import NATIVE_KERNEL_NAME
+from jupyter_client.session import Session
+
+from jupyter_server.services.kernels.handlers import ZMQChannelsHandler
+
+
+@pytest.fixture
+def jp_argv():
+    return ["--ServerApp.kernel_manager_class=jupyter_server.services.kernels.kernelmanager.AsyncMappingKernelManager"]
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config({
+        'ServerApp': {
+            'kernel_ws_pending_messages_limit': 2,
+        }
+    })
+
+
+async def read_message(ws, msg_type):
+    while True:
+        msg = json.loads(await ws.read_message())
+        if msg['msg_type'] == msg_type:
+            return msg
+
+
+async def test_open_before_kernel_is_ready(jp_fetch, jp_ws_fetch, jp_serverapp):
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+    km = jp_serverapp.kernel_manager
+    info = await km.request_kernel_info(kid)
+
+    # the kernel_info reply is not known yet
+    pending = km._kernel_info_futures[kid] = Future()
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels')
+    status = await read_message(ws, 'status')
+    assert status['content']['execution_state'] == 'starting'
+
+    session = Session()
+    msg_ids = []
+    for i in range(3):
+        msg = session.msg('kernel_info_request')
+        msg['channel'] = 'shell'
+        msg_ids.append(msg['header']['msg_id'])
+        ws.write_message(json.dumps(msg, default=str))
+
+    await asyncio.sleep(0.5)
+    pending.set_result(info)
+    # the queued messages are sent once the kernel is ready,
+    # and the messages over the limit are dropped
+    for msg_id in msg_ids[:2]:
+        reply = await read_message(ws, 'kernel_info_reply')
+        assert reply['parent_header']['msg_id'] == msg_id
+    ws.close()
+
+
+async def test_kernel_info_timeout_removed(jp_fetch, jp_ws_fetch, jp_serverapp):
+    r = await jp_fetch(
+        'api', 'kernels',
+        method='POST',
+        body=json.dumps({
+            'name': NATIVE_KERNEL_NAME
+        })
+    )
+    kid = json.loads(r.body.decode())['id']
+    km = jp_serverapp.kernel_manager
+    info = await km.request_kernel_info(kid)
+
+    def handlers():
+        return [h for h in ZMQChannelsHandler._open_sessions.values() if h.kernel_id == kid]
+
+    # removed when the kernel becomes ready
+    pending = km._kernel_info_futures[kid] = Future()
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels')
+    await read_message(ws, 'status')
+    handler, = handlers()
+    assert handler._kernel_info_timeout is not None
+    pending.set_result(info)
+    await asyncio.sleep(0.1)
+    assert handler._kernel_info_timeout is None
+    ws.close()
+    for i in range(50):
+        if not handlers():
+            break
+        await asyncio.sleep(0.1)
+
+    # removed when the connection closes first
+    km._kernel_info_futures[kid] = Future()
+    ws = await jp_ws_fetch('api', 'kernels', kid, 'channels')
+    await read_message(ws, 'status')
+    handler, = handlers()
+    assert handler._kernel_info_timeout is not None
+    ws.close()
+    for i in range(50):
+        if handler._kernel_info_timeout is None:
+            break
+        await asyncio.sleep(0.1)
+    assert handler._kernel_info_timeout is None
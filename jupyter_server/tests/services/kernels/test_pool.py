@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+
+import pytest
+from traitlets.config import Config
+
+from jupyter_client.kernelspec import NATIVE_KERNEL_NAME
+
+from jupyter_server.services.kernels.pool import KernelPool
+
+
+async def test_pool_take_and_refill():
+    started = []
+
+    async def start(name):
+        await asyncio.sleep(0.01)
+        kernel_id = '%s-%i' % (name, len(started))
+        started.append(kernel_id)
+        return kernel_id
+
+    pool = KernelPool({'python3': 2, 'other': 0}, start)
+    assert pool.sizes == {'python3': 2}
+    # nothing is ready before the pool is filled
+    assert pool.take('python3') is None
+    await asyncio.sleep(0.1)
+    assert len(pool) == 2
+    assert 'python3-0' in pool
+
+    # kernels which are not pooled
+    assert pool.take('other') is None
+
+    assert pool.take('python3') == 'python3-0'
+    assert 'python3-0' not in pool
+    await asyncio.sleep(0.1)
+    assert len(pool) == 2
+    assert len(started) == 3
+
+    pool.discard('python3-1')
+    await pool.close()
+    assert sorted(pool._ready['python3']) == ['python3-2', 'python3-3']
+    # no refill once closed
+    assert pool.take('python3') == 'python3-2'
+    assert len(started) == 4
+
+
+async def test_pool_start_failure():
+    calls = []
+
+    async def start(name):
+        calls.append(name)
+        raise RuntimeError('no kernel')
+
+    pool = KernelPool({'python3': 1}, start)
+    pool.fill()
+    await asyncio.sleep(0.05)
+    assert len(pool) == 0
+    # not retried in a loop
+    assert calls == ['python3']
+    assert pool.take('python3') is None
+    await pool.close()
+    assert calls == ['python3', 'python3']
+
+
+@pytest.fixture
+def jp_argv():
+    return ["--ServerApp.kernel_manager_class=jupyter_server.services.kernels.kernelmanager.AsyncMappingKernelManager"]
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config({
+        'ServerApp': {
+            'MappingKernelManager': {
+                'kernel_pool': {NATIVE_KERNEL_NAME: 1},
+            }
+        }
+    })
+
+
+async def wait_for_pool(km):
+    for _ in range(300):
+        if any(km._kernel_pool._ready.values()):
+            return
+        await asyncio.sleep(0.1)
+    raise TimeoutError("kernel pool not filled")
+
+
+async def test_pooled_kernel(jp_fetch, jp_serverapp, jp_root_dir):
+    km = jp_serverapp.kernel_manager
+    km.fill_kernel_pool()
+    await wait_for_pool(km)
+    pooled_id = list(km._kernel_pool._kernel_ids)[0]
+
+    # pooled kernels are not listed
+    r = await jp_fetch('api', 'kernels', method='GET')
+    assert json.loads(r.body.decode()) == []
+
+    subdir = jp_root_dir / 'sub'
+    subdir.mkdir()
+    kernel_id = await km.start_kernel(path='sub')
+    assert kernel_id == pooled_id
+    assert km.list_kernel_ids() == [kernel_id]
+
+    # the working directory was changed
+    reply = await km._shell_request(kernel_id, 'execute_request', {
+        'code': '',
+        'silent': True,
+        'user_expressions': {'cwd': '__import__("os").getcwd()'},
+    })
+    cwd = reply['content']['user_expressions']['cwd']['data']['text/plain']
+    assert os.path.samefile(cwd.strip("'"), str(subdir))
+
+    # restarts keep the working directory
+    launch_cwd = km.get_kernel(kernel_id)._launch_args['cwd']
+    assert os.path.samefile(launch_cwd, str(subdir))
+
+    # a replacement is started, and not listed or counted while it warms up
+    for _ in range(300):
+        if len(km._kernels) == 2:
+            break
+        await asyncio.sleep(0.01)
+    assert len(km._kernels) == 2
+    assert km.list_kernel_ids() == [kernel_id]
+    assert sum(km._count_kernels().values()) == 1
+    r = await jp_fetch('api', 'kernels', method='GET')
+    assert [k['id'] for k in json.loads(r.body.decode())] == [kernel_id]
+    await wait_for_pool(km)
+    await km.shutdown_all()
+    assert len(km._kernels) == 0
@@ -0,0 +1,79 @@
+from jupyter_server.services.kernels.ratelimiter import IOPubRateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_msg_rate_limit():
+    clock = Clock()
+    limiter = IOPubRateLimiter(msg_rate_limit=10, window=1.0, clock=clock)
+    results = [limiter.check('msg-%i' % i, 'display_data') for i in range(20)]
+    sent = [send for send, notices in results]
+    assert sent == [True] * 10 + [False] * 10
+    # the notice is only emitted once, when the limit is first exceeded
+    notices = [n for send, notices in results for n in notices]
+    assert len(notices) == 1
+    assert 'iopub_msg_rate_limit' in notices[0]
+    assert limiter.throttled
+
+    # messages resume once the window has passed
+    clock.now = 1.5
+    send, notices = limiter.check('msg-late', 'display_data')
+    assert send
+    assert not limiter.throttled
+
+
+def test_data_rate_limit():
+    clock = Clock()
+    limiter = IOPubRateLimiter(data_rate_limit=1000, window=1.0, clock=clock)
+    assert limiter.check('a', 'stream', 600) == (True, [])
+    send, notices = limiter.check('b', 'stream', 600)
+    assert not send
+    assert 'iopub_data_rate_limit' in notices[0]
+    # the dropped message was not counted
+    clock.now = 0.5
+    assert limiter.check('c', 'stream', 300) == (False, [])
+    # until the rate falls below 80% of the limit
+    assert limiter.check('d', 'stream', 100) == (True, [])
+
+
+def test_unlimited_msg_types_and_idle_reset():
+    clock = Clock()
+    limiter = IOPubRateLimiter(msg_rate_limit=1, window=1.0, clock=clock)
+    assert limiter.check('a', 'stream')[0]
+    assert not limiter.check('b', 'stream')[0]
+    assert limiter.check('c', 'execute_input')[0]
+    assert limiter.check('d', 'status', execution_state='busy')[0]
+    assert not limiter.check('e', 'stream')[0]
+    # idle status resets the counts
+    assert limiter.check('f', 'status', execution_state='idle')[0]
+    assert not limiter.throttled
+    assert limiter.check('g', 'stream')[0]
+
+
+def test_decisions_shared_between_connections():
+    clock = Clock()
+    limiter = IOPubRateLimiter(msg_rate_limit=2, window=1.0, clock=clock)
+    # two connections receiving the same messages
+    for i in range(3):
+        first = limiter.check('msg-%i' % i, 'stream')
+        second = limiter.check('msg-%i' % i, 'stream')
+        assert first == second
+    # each message was counted once
+    assert limiter.check('msg-0', 'stream')[0]
+    assert not limiter.check('msg-2', 'stream')[0]
+
+
+def test_window_expiry_is_incremental():
+    clock = Clock()
+    limiter = IOPubRateLimiter(msg_rate_limit=100, window=1.0, clock=clock)
+    for i in range(1000):
+        clock.now = i * 0.02
+        assert limiter.check(str(i), 'stream')[0]
+    # only the messages of the last window are counted
+    assert len(limiter._window_queue) == 50
@@ -443,3 +443,19 @@ async def test_restart_kernel(session_client, jp_base_url, jp_fetch, jp_ws_fetch
 
     # Need to find a better solution to this.
     await session_client.cleanup()
+
+async def test_list_etag(session_client, jp_fetch):
+    resp = await session_client.list()
+    etag = resp.headers['ETag']
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch('api', 'sessions', method='GET', headers={'If-None-Match': etag})
+    assert expected_http_error(e, 304)
+
+    await session_client.create('foo/nb1.ipynb')
+    resp = await jp_fetch('api', 'sessions', method='GET', headers={'If-None-Match': etag})
+    assert resp.code == 200
+    assert resp.headers['ETag'] != etag
+    assert len(j(resp)) == 1
+    # Need to find a better solution to this.
+    await session_client.cleanup()
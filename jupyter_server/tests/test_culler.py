@@ -0,0 +1,122 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from jupyter_server._tz import utcnow
+from jupyter_server.culler import IdleCuller
+
+
+class Objects:
+    """Objects with a last activity, culled when idle."""
+
+    def __init__(self, **idle_seconds):
+        now = utcnow()
+        self.last_activity = {
+            key: now - timedelta(seconds=seconds) for key, seconds in idle_seconds.items()
+        }
+        self.checked = []
+        self.keep = set()
+
+    def get_last_activity(self, key):
+        return self.last_activity[key]
+
+    def cull(self, key):
+        self.checked.append(key)
+        if key not in self.keep:
+            del self.last_activity[key]
+
+
+def make_culler(objects, **kwargs):
+    culler = IdleCuller(
+        timeout=10,
+        interval=1,
+        get_last_activity=objects.get_last_activity,
+        cull=objects.cull,
+        **kwargs
+    )
+    for key in objects.last_activity:
+        culler.add(key)
+    return culler
+
+
+async def test_only_expired_objects_are_checked():
+    objects = Objects(a=20, b=5, c=15, d=0)
+    culler = make_culler(objects)
+    assert len(culler) == 4
+    await culler.cull_expired()
+    assert sorted(objects.checked) == ['a', 'c']
+    assert sorted(objects.last_activity) == ['b', 'd']
+    assert len(culler) == 2
+    # the next check is when b may expire
+    expected = objects.last_activity['b'].timestamp() + 10
+    assert abs(culler.next_deadline() - expected) < 1e-3
+
+
+async def test_activity_requeues():
+    objects = Objects(a=20)
+    culler = make_culler(objects)
+    objects.last_activity['a'] = utcnow()
+    await culler.cull_expired()
+    assert objects.checked == []
+    assert 'a' in culler
+    assert culler.next_deadline() > time.time() + 9
+
+
+async def test_not_culled_are_checked_after_interval():
+    objects = Objects(a=20, b=20)
+    objects.keep.add('a')
+    culler = make_culler(objects)
+    await culler.cull_expired()
+    assert sorted(objects.checked) == ['a', 'b']
+    assert 'a' in culler
+    assert 'b' not in culler
+    assert 0.5 < culler.next_deadline() - time.time() <= 1
+
+    # removed objects are dropped from the index
+    del objects.last_activity['a']
+    assert culler.pop_expired(time.time() + 2) == []
+    assert len(culler) == 0
+
+
+async def test_concurrency_limit():
+    objects = Objects(**{str(i): 20 for i in range(10)})
+    running = 0
+    max_running = 0
+
+    async def cull(key):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        objects.cull(key)
+
+    culler = IdleCuller(
+        timeout=10,
+        interval=1,
+        get_last_activity=objects.get_last_activity,
+        cull=cull,
+        concurrency=3,
+    )
+    for key in objects.last_activity:
+        culler.add(key)
+    await culler.cull_expired()
+    assert len(objects.checked) == 10
+    assert max_running == 3
+    assert len(culler) == 0
+
+
+async def test_wakes_up_on_expiry():
+    objects = Objects(a=0)
+    culler = IdleCuller(
+        timeout=0.2,
+        interval=0.1,
+        get_last_activity=objects.get_last_activity,
+        cull=objects.cull,
+    )
+    culler.start()
+    culler.add('a')
+    await asyncio.sleep(0.5)
+    assert objects.checked == ['a']
+    assert culler.next_deadline() is None
+    culler.stop()
@@ -0,0 +1,69 @@
+"""Test the pluggable JSON serializers"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+from traitlets.config import Config
+
+from jupyter_server.base.jsonserializer import JSONSerializer, OrjsonSerializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+requires_orjson = pytest.mark.skipif(orjson is None, reason="requires orjson")
+
+
+@pytest.fixture(params=[
+    JSONSerializer,
+    pytest.param(OrjsonSerializer, marks=requires_orjson),
+])
+def serializer(request):
+    return request.param()
+
+
+def test_roundtrip(serializer):
+    model = {
+        'name': 'Untitled.ipynb',
+        'last_modified': datetime(2021, 3, 4, 5, 6, 7, 890123, tzinfo=timezone.utc),
+        'created': datetime(2021, 3, 4, 5, 6, 7, tzinfo=timezone.utc),
+        'size': 12,
+        'content': [{'type': 'file', 'writable': True}, None],
+    }
+    s = serializer.dumps(model)
+    assert isinstance(s, str)
+    assert isinstance(serializer.dumpb(model), bytes)
+    data = serializer.loads(s)
+    assert data['last_modified'] == '2021-03-04T05:06:07.890123Z'
+    assert data['created'] == '2021-03-04T05:06:07Z'
+    assert data == json.loads(JSONSerializer().dumps(model))
+
+
+@requires_orjson
+def test_orjson_fallback():
+    serializer = OrjsonSerializer()
+    # non-str keys and big integers are not supported by orjson
+    model = {1: 'a', 'big': 2 ** 70}
+    assert serializer.loads(serializer.dumps(model)) == {'1': 'a', 'big': 2 ** 70}
+
+
+@pytest.fixture
+def jp_server_config():
+    if orjson is None:
+        return Config()
+    return Config({
+        'ServerApp': {
+            'json_serializer_class': 'jupyter_server.base.jsonserializer.OrjsonSerializer'
+        }
+    })
+
+
+@requires_orjson
+async def test_api_with_orjson(jp_serverapp, jp_fetch):
+    assert isinstance(jp_serverapp.json_serializer, OrjsonSerializer)
+    r = await jp_fetch('api', 'contents', method='GET')
+    model = json.loads(r.body.decode())
+    assert model['type'] == 'directory'
+    assert model['last_modified'].endswith('Z')
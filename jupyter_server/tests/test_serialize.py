@@ -1,11 +1,14 @@
 """Test serialize/deserialize messages with buffers"""
 
 import os
+from array import array
 
 from jupyter_client.session import Session
 from jupyter_server.base.zmqhandlers import (
     serialize_binary_message,
     deserialize_binary_message,
+    serialize_msg_to_ws_v1,
+    deserialize_msg_from_ws_v1,
 )
 
 def test_serialize_binary():
@@ -22,4 +25,44 @@ def test_deserialize_binary():
     msg['buffers'] = [ memoryview(os.urandom(2)) for i in range(3) ]
     bmsg = serialize_binary_message(msg)
     msg2 = deserialize_binary_message(bmsg)
-    assert msg2 == msg
\ No newline at end of file
+    assert msg2 == msg
+
+def test_serialize_binary_non_byte_format():
+    s = Session()
+    msg = s.msg('data_pub', content={'a': 'b'})
+    # buffers whose item size is larger than one byte
+    msg['buffers'] = [ memoryview(array('d', range(i + 2))) for i in range(3) ]
+    bmsg = serialize_binary_message(msg)
+    msg2 = deserialize_binary_message(bmsg)
+    assert [ b.tobytes() for b in msg2['buffers'] ] == [ b.tobytes() for b in msg['buffers'] ]
+
+
+def test_deserialize_binary_zero_copy():
+    s = Session()
+    msg = s.msg('data_pub', content={'a': 'b'})
+    msg['buffers'] = [ memoryview(os.urandom(16)) for i in range(2) ]
+    bmsg = serialize_binary_message(msg)
+    msg2 = deserialize_binary_message(bmsg)
+    for buf in msg2['buffers']:
+        assert isinstance(buf, memoryview)
+        assert buf.obj is bmsg
+
+
+def test_serialize_msg_to_ws_v1():
+    s = Session()
+    msg = s.msg('execute_request', content={'code': '1 + 1'})
+    msg_list = [
+        s.pack(msg['header']),
+        s.pack(msg['parent_header']),
+        s.pack(msg['metadata']),
+        s.pack(msg['content']),
+        os.urandom(5),
+    ]
+    bmsg = serialize_msg_to_ws_v1(msg_list, 'shell')
+    assert isinstance(bmsg, bytes)
+    channel, msg_list2 = deserialize_msg_from_ws_v1(bmsg)
+    assert channel == 'shell'
+    assert [ bytes(part) for part in msg_list2 ] == msg_list
+    # the JSON parts can be unpacked, the buffers are not copied
+    assert s.unpack(msg_list2[0]) == s.unpack(msg_list[0])
+    assert isinstance(msg_list2[4], memoryview)
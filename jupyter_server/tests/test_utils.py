@@ -1,7 +1,10 @@
+import asyncio
+import time
+
 import pytest
 
 from traitlets.tests.utils import check_help_all_output
-from jupyter_server.utils import url_escape, url_unescape
+from jupyter_server.utils import url_escape, url_unescape, shutdown_concurrently
 
 
 def test_help_output():
@@ -37,3 +40,61 @@ def test_url_escaping(unescaped, escaped):
     # Test unescaping.
     path = url_unescape(escaped)
     assert path == unescaped
+
+
+async def test_shutdown_concurrently():
+    running = 0
+    max_running = 0
+    stopped = []
+
+    async def shutdown(key, now):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.1)
+        running -= 1
+        stopped.append((key, now))
+
+    start = time.monotonic()
+    await shutdown_concurrently(range(8), shutdown, concurrency=4)
+    assert time.monotonic() - start < 0.4
+    assert max_running == 4
+    assert sorted(stopped) == [(i, False) for i in range(8)]
+
+
+async def test_shutdown_concurrently_deadline():
+    killed = []
+    stopped = []
+
+    async def shutdown(key, now):
+        if not now:
+            # a slow graceful shutdown, ended by kill
+            while key not in killed:
+                await asyncio.sleep(0.01)
+        stopped.append((key, now))
+
+    start = time.monotonic()
+    await shutdown_concurrently(range(4), shutdown, kill=killed.append, concurrency=2, timeout=0.2)
+    assert time.monotonic() - start < 1
+    # the running shutdowns were killed
+    assert sorted(killed) == [0, 1]
+    # the queued ones were not graceful
+    assert sorted(stopped) == [(0, False), (1, False), (2, True), (3, True)]
+
+
+async def test_shutdown_concurrently_unkillable():
+    cancelled = []
+
+    async def shutdown(key, now):
+        if key == 0:
+            # not stopped by kill
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(key)
+                raise
+
+    start = time.monotonic()
+    await shutdown_concurrently(range(2), shutdown, kill=lambda key: None, timeout=0.2)
+    assert time.monotonic() - start < 1
+    assert cancelled == [0]
@@ -8,6 +8,8 @@ import errno
 import inspect
 import os
 import sys
+import time
+from collections import deque
 from distutils.version import LooseVersion
 
 from urllib.parse import quote, unquote, urlparse, urljoin
@@ -222,3 +224,92 @@ def run_sync(maybe_async):
                 raise e
         return result
     return wrapped()
+
+
+async def shutdown_concurrently(keys, shutdown, kill=None, concurrency=0, timeout=0,
+                                log=None, kind='resource'):
+    """Shut down resources concurrently, within a deadline.
+
+    Resources are shut down gracefully by a pool of ``concurrency`` workers.
+    Once ``timeout`` seconds have passed, the resources still shutting down
+    are killed, and the remaining ones are shut down at once without waiting
+    for a graceful shutdown. The time taken by each phase is logged.
+
+    Parameters
+    ----------
+    keys : iterable
+        The names or ids of the resources.
+    shutdown : callable
+        ``shutdown(key, now)`` shuts down a resource, immediately if now is True.
+        Can be a coroutine function.
+    kill : callable, optional
+        ``kill(key)`` forcibly stops a resource whose graceful shutdown is still
+        running at the deadline. Can be a coroutine function.
+    concurrency : int
+        Maximum number of graceful shutdowns running at once. 0 disables the limit.
+    timeout : float
+        Seconds after which shutdowns are no longer graceful. 0 disables the deadline.
+        The shutdowns that are still running ``timeout`` seconds after the deadline
+        are cancelled.
+    log : logging.Logger, optional
+    kind : str
+        The kind of resources, for logging.
+    """
+    queue = deque(keys)
+    if not queue:
+        return
+    total = len(queue)
+    start = time.monotonic()
+    past_deadline = False
+    # start time of the shutdowns in progress
+    running = {}
+    durations = {}
+
+    async def worker():
+        while queue:
+            key = queue.popleft()
+            running[key] = time.monotonic()
+            try:
+                await ensure_async(shutdown(key, past_deadline))
+            except Exception as e:
+                if log:
+                    log.exception("Error shutting down %s %s: %s", kind, key, e)
+            finally:
+                durations[key] = time.monotonic() - running.pop(key)
+
+    nworkers = min(concurrency, total) if concurrency > 0 else total
+    workers = [asyncio.ensure_future(worker()) for i in range(nworkers)]
+    done, pending = await asyncio.wait(workers, timeout=timeout if timeout > 0 else None)
+
+    if pending:
+        past_deadline = True
+        if log:
+            log.warning("%s %ss still shutting down and %s queued after %.2fs, stopping them now",
+                        len(running), kind, len(queue), time.monotonic() - start)
+        kill_start = time.monotonic()
+        if kill is not None and running:
+            results = await asyncio.gather(
+                *[ensure_async(kill(key)) for key in list(running)], return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception) and log:
+                    log.debug("Error killing %s: %s", kind, result)
+        # stop the queued resources at once
+        workers.extend(asyncio.ensure_future(worker()) for i in range(len(queue)))
+        done, pending = await asyncio.wait(workers, timeout=timeout)
+        if pending:
+            # give up on the resources that could not be stopped
+            if log:
+                log.error("%s %ss could not be stopped in %.2fs: %s", len(running), kind,
+                          time.monotonic() - kill_start, ', '.join(str(key) for key in running))
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending)
+        elif log:
+            log.info("Stopped the remaining %ss in %.2fs", kind, time.monotonic() - kill_start)
+
+    if log and durations:
+        slowest = max(durations, key=durations.get)
+        log.info("Shut down %s %ss in %.2fs (slowest: %s in %.2fs, sum: %.2fs)",
+                 total, kind, time.monotonic() - start,
+                 slowest, durations[slowest], sum(durations.values()))